@@ -1,11 +1,39 @@
 # Criado por Erick Matheus
 # Formare 2025
 
-from flask import Flask, request, jsonify
+from flask import (Flask, request, jsonify, g, has_app_context, has_request_context, make_response, Response,
+                   stream_with_context)
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import sqlite3
-from datetime import datetime, timezone
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+import csv
+import bisect
+import functools
+import heapq
+import io
+import itertools
+import json
+import math
 import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # /analysis/bottleneck responde 503 sem NumPy
+    np = None
+
+try:
+    import orjson
+except ImportError:  # as respostas usam o json da biblioteca padrão
+    orjson = None
 
 app = Flask(__name__)
 CORS(app)
@@ -14,8 +42,101 @@ DATABASE = 'alerts.db'
 VALID_OPERATORS = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6']
 VALID_MODELS = ['313', '314']
 
-def init_db():
-    with sqlite3.connect(DATABASE) as conn:
+# Ajustes do SQLite, lidos uma vez na inicialização
+SQLITE_POOL_SIZE = int(os.environ.get('MDC_SQLITE_POOL_SIZE', 8))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('MDC_SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('MDC_SQLITE_CACHE_KB', 16384))
+SQLITE_MMAP_SIZE = int(os.environ.get('MDC_SQLITE_MMAP_BYTES', 64 * 1024 * 1024))
+SQLITE_STATEMENT_CACHE = int(os.environ.get('MDC_SQLITE_STATEMENT_CACHE', 256))
+
+# Fila de escrita: um único thread grava, agrupando as operações em um commit
+WRITE_BATCH_WINDOW_MS = float(os.environ.get('MDC_WRITE_BATCH_MS', 2))
+WRITE_BATCH_MAX = int(os.environ.get('MDC_WRITE_BATCH_MAX', 64))
+
+# Ajustes do /stream (Server-Sent Events)
+STREAM_MAX_SECONDS = int(os.environ.get('MDC_STREAM_MAX_SECONDS', 300))
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_POLL_SECONDS = 1.0
+EVENT_RETENTION = 10000
+
+# Paginação do /process/times
+PROCESS_TIMES_PAGE_SIZE = 500
+PROCESS_TIMES_MAX_PAGE_SIZE = 5000
+PROCESS_TIMES_FIELDS = ['id', 'model', 'operator', 'part', 'start_time', 'end_time',
+                        'duration', 'carrinho_id', 'sequencia']
+
+# Estatísticas de ciclo por posto (/stats/stations)
+STATS_SKETCH_ACCURACY = 0.01
+STATS_SKETCH_MAX_BUCKETS = 512
+STATS_SKETCH_GAMMA = (1 + STATS_SKETCH_ACCURACY) / (1 - STATS_SKETCH_ACCURACY)
+
+# Série de vazão (/stats/throughput): tamanho de cada balde em segundos
+THROUGHPUT_GRANULARITIES = {'minute': 60, 'hour': 3600}
+THROUGHPUT_DEFAULT_BUCKETS = 60
+
+# Análise de gargalo (/analysis/bottleneck)
+ANALYSIS_DEFAULT_HOURS = 24
+ANALYSIS_WINDOW_STEP = 60  # a janela padrão da análise anda de minuto em minuto (cache e ETag estáveis)
+ANALYSIS_CACHE_SIZE = 32
+
+# Cache de respostas dos GET mais consultados pelos tablets. A invalidação
+# pelas escritas é imediata neste processo; o TTL limita quanto tempo uma
+# resposta pode ficar atrás de escritas feitas por outros workers
+RESPONSE_CACHE_SIZE = int(os.environ.get('MDC_RESPONSE_CACHE_SIZE', 256))
+RESPONSE_CACHE_TTL = float(os.environ.get('MDC_RESPONSE_CACHE_TTL', 2))
+
+# Serialização das respostas ('auto' usa orjson se estiver instalado) e gzip
+# negociado para respostas a partir de RESPONSE_GZIP_MIN_BYTES
+JSON_SERIALIZER = os.environ.get('MDC_JSON_SERIALIZER', 'auto')
+RESPONSE_GZIP_MIN_BYTES = int(os.environ.get('MDC_GZIP_MIN_BYTES', 1024))
+# Nível 1: quase o mesmo tamanho do 6 por uma fração da CPU em respostas montadas a cada pedido
+RESPONSE_GZIP_LEVEL = 1
+RESPONSE_GZIP_TYPES = {'application/json', 'application/x-ndjson', 'text/csv'}
+
+# Métricas do /metrics: MDC_METRICS=0 desliga a instrumentação
+METRICS_ENABLED = os.environ.get('MDC_METRICS', '1') != '0'
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_FETCH_BATCH = 500
+
+# Exportação em streaming (/export/...)
+EXPORT_BATCH_SIZE = 1000
+EXPORT_GZIP_LEVEL = 6
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Arquivo de carrinhos finalizados (banco anexado como "arquivo")
+ARCHIVE_DATABASE = os.environ.get('MDC_ARCHIVE_DATABASE')
+ARCHIVE_AFTER_DAYS = float(os.environ.get('MDC_ARCHIVE_AFTER_DAYS', 7))
+ARCHIVE_BATCH_SIZE = 500
+# Tabelas movidas para o arquivo: (tabela, coluna do carrinho, colunas)
+ARCHIVE_TABLES = [
+    ('carrinho_etapas', 'carrinho_id',
+     'id, carrinho_id, operador, parte, inicio, fim, duracao, status, sequencia'),
+    ('process_times', 'carrinho_id',
+     'id, model, operator, part, start_time, end_time, duration, carrinho_id'),
+    ('carrinhos', 'id',
+     'id, modelo, estado, data_criacao, data_finalizacao, operador_atual, sequencia'),
+]
+HISTORY_SCHEMAS = ('arquivo', 'main')
+
+# Snapshots do banco (/reset e /snapshots)
+SNAPSHOT_DIR = os.environ.get('MDC_SNAPSHOT_DIR')
+SNAPSHOT_KEEP = int(os.environ.get('MDC_SNAPSHOT_KEEP', 20))
+SNAPSHOT_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+SNAPSHOT_AUTOMATICO = re.compile(r'^\d{8}-\d{6}-\d{3}-(reset|antes-restaurar)$')
+
+def sibling_archive(database):
+    raiz, extensao = os.path.splitext(database)
+    return f'{raiz}_arquivo{extensao or ".db"}'
+
+def archive_path(database):
+    """Banco do arquivo: MDC_ARCHIVE_DATABASE ou alerts_arquivo.db ao lado do principal"""
+    return ARCHIVE_DATABASE or sibling_archive(database)
+
+def init_db(database=None, archive=None):
+    """Cria as tabelas e índices que faltarem (por padrão no banco em uso)"""
+    database = database or DATABASE
+    with sqlite3.connect(database) as conn:
+        conn.execute('ATTACH DATABASE ? AS arquivo', (archive or archive_path(database),))
         conn.execute('''
             CREATE TABLE IF NOT EXISTS alerts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -80,14 +201,649 @@ def init_db():
                 FOREIGN KEY (carrinho_id) REFERENCES carrinhos(id)
             )
         ''')
+
+        # Eventos publicados no /stream; o id é o Last-Event-ID dos clientes
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS eventos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                topico TEXT NOT NULL,
+                model TEXT,
+                dados TEXT NOT NULL,
+                criado_em TEXT NOT NULL
+            )
+        ''')
+
+        # Versão de cada tabela por modelo ('*' = todos), usada nos ETags
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS versoes (
+                tabela TEXT NOT NULL,
+                model TEXT NOT NULL,
+                versao INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (tabela, model)
+            ) WITHOUT ROWID
+        ''')
+
+        # Última sequência de carrinho usada por modelo
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sequencias (
+                modelo TEXT PRIMARY KEY,
+                ultima INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+        # Estatísticas de duração por posto, atualizadas a cada /process/end
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS station_stats (
+                model TEXT NOT NULL,
+                operator TEXT NOT NULL,
+                part TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                mean REAL NOT NULL,
+                m2 REAL NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                sketch TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (model, operator, part)
+            ) WITHOUT ROWID
+        ''')
+
+        # Etapas concluídas e carrinhos finalizados por minuto e por hora
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS throughput (
+                granularidade TEXT NOT NULL,
+                model TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                operator TEXT NOT NULL,
+                etapas INTEGER NOT NULL,
+                carrinhos INTEGER NOT NULL,
+                duracao_total REAL NOT NULL,
+                PRIMARY KEY (granularidade, model, bucket, operator)
+            ) WITHOUT ROWID
+        ''')
+
+        # Índices das consultas das rotas (conferidos por verificar_planos.py)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_alerts_model ON alerts (model, started_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_carrinhos_modelo_seq ON carrinhos (modelo, sequencia)')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_carrinhos_wip
+            ON carrinhos (modelo, sequencia, operador_atual)
+            WHERE estado = 'em_producao'
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_etapas_carrinho ON carrinho_etapas (carrinho_id, sequencia)')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_etapas_abertas
+            ON carrinho_etapas (carrinho_id, operador)
+            WHERE fim IS NULL
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_etapas_abertas_operador
+            ON carrinho_etapas (operador, carrinho_id)
+            WHERE fim IS NULL
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_process_times_modelo ON process_times (model, carrinho_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_process_times_carrinho ON process_times (carrinho_id)')
+        # (model) já ordena por rowid dentro do modelo: serve ao cursor after_id
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_process_times_cursor ON process_times (model)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_process_times_fim ON process_times (model, end_time)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_process_times_fim_todos ON process_times (end_time)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_etapas_inicio ON carrinho_etapas (inicio)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_throughput_bucket ON throughput (granularidade, bucket)')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_carrinhos_finalizados
+            ON carrinhos (data_finalizacao)
+            WHERE estado = 'finalizado'
+        ''')
+
+        # Arquivo: mesmas colunas e ids do banco principal, só com os índices
+        # das consultas de histórico
+        conn.execute('PRAGMA arquivo.journal_mode = WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS arquivo.carrinhos (
+                id INTEGER PRIMARY KEY,
+                modelo TEXT NOT NULL,
+                estado TEXT,
+                data_criacao TEXT NOT NULL,
+                data_finalizacao TEXT,
+                operador_atual TEXT,
+                sequencia INTEGER
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS arquivo.carrinho_etapas (
+                id INTEGER PRIMARY KEY,
+                carrinho_id INTEGER NOT NULL,
+                operador TEXT NOT NULL,
+                parte TEXT NOT NULL,
+                inicio TEXT NOT NULL,
+                fim TEXT,
+                duracao REAL,
+                status TEXT,
+                sequencia INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS arquivo.process_times (
+                id INTEGER PRIMARY KEY,
+                model TEXT NOT NULL,
+                operator TEXT NOT NULL,
+                part TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT NOT NULL,
+                duration REAL NOT NULL,
+                carrinho_id INTEGER
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS arquivo.idx_carrinhos_modelo_seq ON carrinhos (modelo, sequencia)')
+        conn.execute('CREATE INDEX IF NOT EXISTS arquivo.idx_etapas_carrinho ON carrinho_etapas (carrinho_id, sequencia)')
+        conn.execute('CREATE INDEX IF NOT EXISTS arquivo.idx_etapas_inicio ON carrinho_etapas (inicio)')
+        conn.execute('CREATE INDEX IF NOT EXISTS arquivo.idx_process_times_cursor ON process_times (model)')
+        conn.execute('CREATE INDEX IF NOT EXISTS arquivo.idx_process_times_fim ON process_times (model, end_time)')
+        conn.execute('CREATE INDEX IF NOT EXISTS arquivo.idx_process_times_fim_todos ON process_times (end_time)')
+
+        # Bancos anteriores às estatísticas incrementais: calcula a partir do histórico
+        if (conn.execute('SELECT 1 FROM process_times LIMIT 1').fetchone()
+                and not conn.execute('SELECT 1 FROM station_stats LIMIT 1').fetchone()):
+            rebuild_station_stats(conn)
+        if (conn.execute('SELECT 1 FROM process_times LIMIT 1').fetchone()
+                and not conn.execute('SELECT 1 FROM throughput LIMIT 1').fetchone()):
+            rebuild_throughput(conn)
+        if not conn.execute('SELECT 1 FROM sequencias LIMIT 1').fetchone():
+            rebuild_cart_sequences(conn)
         
         conn.commit()
 
+# Métricas por rota (/metrics, formato texto do Prometheus)
+class SqlUsage(threading.local):
+    """Comandos SQL e tempo gasto no SQLite pelo thread atual desde o último take()"""
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+    def take(self):
+        uso = (self.statements, self.seconds)
+        self.statements = 0
+        self.seconds = 0.0
+        return uso
+
+sql_usage = SqlUsage()
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor que soma em sql_usage o tempo de execute e dos fetch*.
+
+    A iteração linha a linha (for row in cursor) não é medida, para não
+    pagar uma chamada Python por linha: leituras longas usam iter_rows().
+    """
+
+    def execute(self, sql, parameters=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            sql_usage.statements += 1
+            sql_usage.seconds += time.perf_counter() - inicio
+
+    def executemany(self, sql, seq_of_parameters):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            sql_usage.statements += 1
+            sql_usage.seconds += time.perf_counter() - inicio
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            sql_usage.seconds += time.perf_counter() - inicio
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            sql_usage.seconds += time.perf_counter() - inicio
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            sql_usage.seconds += time.perf_counter() - inicio
+
+def iter_rows(cursor):
+    """Linhas do cursor sob demanda, lidas em lotes (medidos) de SQL_FETCH_BATCH"""
+    return itertools.chain.from_iterable(iter(lambda: cursor.fetchmany(SQL_FETCH_BATCH), []))
+
+def prometheus_labels(**labels):
+    valores = (str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for valor in labels.values())
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in zip(labels, valores)) + '}'
+
+class Metrics:
+    """Contadores por rota: requisições, latência, bytes e SQL; e os lotes do gravador"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.rotas = {}
+        self.lotes = 0
+        self.operacoes = 0
+        self.segundos_lotes = 0.0
+
+    def _rota(self, method, route):
+        rota = self.rotas.get((method, route))
+        if rota is None:
+            rota = self.rotas[(method, route)] = {
+                'status': {}, 'buckets': [0] * (len(self.buckets) + 1), 'soma': 0.0,
+                'bytes': 0, 'sql': 0, 'sql_segundos': 0.0
+            }
+        return rota
+
+    def observe_request(self, method, route, status, seconds, size, statements, sql_seconds):
+        indice = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            rota = self._rota(method, route)
+            rota['status'][status] = rota['status'].get(status, 0) + 1
+            rota['buckets'][indice] += 1
+            rota['soma'] += seconds
+            rota['bytes'] += size
+            rota['sql'] += statements
+            rota['sql_segundos'] += sql_seconds
+
+    def observe_sql(self, method, route, statements, seconds):
+        """SQL que o gravador executou em nome da rota"""
+        with self.lock:
+            rota = self._rota(method, route)
+            rota['sql'] += statements
+            rota['sql_segundos'] += seconds
+
+    def observe_write_batch(self, operacoes, seconds):
+        with self.lock:
+            self.lotes += 1
+            self.operacoes += operacoes
+            self.segundos_lotes += seconds
+
+    def render(self):
+        with self.lock:
+            rotas = sorted((chave, dict(rota, status=dict(rota['status']), buckets=list(rota['buckets'])))
+                           for chave, rota in self.rotas.items())
+            lotes, operacoes, segundos_lotes = self.lotes, self.operacoes, self.segundos_lotes
+
+        linhas = []
+        def metrica(nome, tipo, ajuda):
+            linhas.append(f'# HELP {nome} {ajuda}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+
+        metrica('mdc_http_requests_total', 'counter', 'Requisições por rota e status')
+        for (method, route), rota in rotas:
+            for status, total in sorted(rota['status'].items()):
+                linhas.append(f'mdc_http_requests_total{prometheus_labels(method=method, route=route, status=status)} {total}')
+
+        metrica('mdc_http_request_duration_seconds', 'histogram', 'Tempo de resposta por rota')
+        for (method, route), rota in rotas:
+            acumulado = 0
+            for limite, total in zip(self.buckets + ('+Inf',), rota['buckets']):
+                acumulado += total
+                rotulos = prometheus_labels(method=method, route=route, le=limite)
+                linhas.append(f'mdc_http_request_duration_seconds_bucket{rotulos} {acumulado}')
+            rotulos = prometheus_labels(method=method, route=route)
+            linhas.append(f'mdc_http_request_duration_seconds_sum{rotulos} {rota["soma"]:.6f}')
+            linhas.append(f'mdc_http_request_duration_seconds_count{rotulos} {acumulado}')
+
+        for nome, campo, ajuda in [
+                ('mdc_http_response_bytes_total', 'bytes', 'Bytes enviados por rota (sem as respostas em streaming)'),
+                ('mdc_sql_statements_total', 'sql', 'Comandos SQL executados por rota'),
+                ('mdc_sql_seconds_total', 'sql_segundos', 'Tempo no SQLite (execute e fetch) por rota')]:
+            metrica(nome, 'counter', ajuda)
+            for (method, route), rota in rotas:
+                valor = f'{rota[campo]:.6f}' if isinstance(rota[campo], float) else rota[campo]
+                linhas.append(f'{nome}{prometheus_labels(method=method, route=route)} {valor}')
+
+        metrica('mdc_write_batches_total', 'counter', 'Transações do gravador')
+        linhas.append(f'mdc_write_batches_total {lotes}')
+        metrica('mdc_write_operations_total', 'counter', 'Escritas gravadas pelo gravador')
+        linhas.append(f'mdc_write_operations_total {operacoes}')
+        metrica('mdc_write_batch_seconds_total', 'counter', 'Tempo dos lotes do gravador, do BEGIN ao COMMIT')
+        linhas.append(f'mdc_write_batch_seconds_total {segundos_lotes:.6f}')
+
+        cache = response_cache.stats()
+        for nome, campo, tipo, ajuda in [
+                ('mdc_response_cache_hits_total', 'hits', 'counter', 'Respostas servidas do cache'),
+                ('mdc_response_cache_misses_total', 'misses', 'counter', 'Consultas ao cache sem resposta válida'),
+                ('mdc_response_cache_invalidations_total', 'invalidations', 'counter', 'Invalidações por escrita'),
+                ('mdc_response_cache_entries', 'entries', 'gauge', 'Respostas em cache')]:
+            metrica(nome, tipo, ajuda)
+            linhas.append(f'{nome} {cache[campo]}')
+        return '\n'.join(linhas) + '\n'
+
+metrics = Metrics(METRICS_LATENCY_BUCKETS)
+
+def metrics_route():
+    """(método, rota) da requisição atual; o molde da rota mantém poucos rótulos"""
+    return request.method, request.url_rule.rule if request.url_rule else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    if METRICS_ENABLED:
+        g.metrics_start = time.perf_counter()
+        sql_usage.take()
+
+# Registrado antes do gzip: roda depois dele e conta os bytes enviados de fato
+@app.after_request
+def record_request_metrics(response):
+    if METRICS_ENABLED and 'metrics_start' in g:
+        statements, sql_seconds = sql_usage.take()
+        metrics.observe_request(*metrics_route(), response.status_code, time.perf_counter() - g.metrics_start,
+                                response.content_length or 0, statements, sql_seconds)
+    return response
+
+# Pool de conexões SQLite
+class PooledConnection(sqlite3.Connection):
+    """Conexão do pool: close() devolve a conexão ao pool em vez de fechá-la"""
+
+    pool = None
+    emprestimo = None  # número do empréstimo atual; None quando está no pool
+
+    # Connection.execute do sqlite3 não passa pelo cursor(): redirecionados aqui
+    def cursor(self, factory=None):
+        return super().cursor(factory or (TimedCursor if METRICS_ENABLED else sqlite3.Cursor))
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.emprestimo is None:
+            return
+        self.emprestimo = None
+        if self.in_transaction:
+            self.rollback()
+        self.pool.release(self)
+
+    def fechar_definitivamente(self):
+        sqlite3.Connection.close(self)
+
+class ConnectionPool:
+    """Mantém conexões abertas e configuradas, reaproveitadas entre requisições"""
+
+    def __init__(self, database, max_size):
+        self.database = database
+        self.max_size = max_size
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.idle = []
+        self.emprestimos = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE,
+            factory=PooledConnection
+        )
+        conn.pool = self
+        conn.row_factory = sqlite3.Row
+        conn.execute('ATTACH DATABASE ? AS arquivo', (archive_path(self.database),))
+        configure_connection(conn)
+        return conn
+
+    def acquire(self):
+        with self.lock:
+            # Workers criados por fork não podem herdar conexões do processo pai
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.idle = []
+            conn = self.idle.pop() if self.idle else None
+            self.emprestimos += 1
+            emprestimo = self.emprestimos
+        if conn is None:
+            conn = self._connect()
+        conn.emprestimo = emprestimo
+        return conn
+
+    def release(self, conn):
+        with self.lock:
+            if self.pid == os.getpid() and len(self.idle) < self.max_size:
+                self.idle.append(conn)
+                return
+        conn.fechar_definitivamente()
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.fechar_definitivamente()
+
+def configure_connection(conn):
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)}')
+    conn.execute(f'PRAGMA cache_size = -{int(SQLITE_CACHE_SIZE_KB)}')
+    conn.execute(f'PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+db_pool = ConnectionPool(DATABASE, SQLITE_POOL_SIZE)
+
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.acquire()
+    # Garante a devolução ao pool mesmo em rotas que retornam sem fechar
+    if has_app_context():
+        g.setdefault('db_connections', []).append((conn, conn.emprestimo))
     return conn
 
+@app.teardown_appcontext
+def release_db_connections(exc):
+    # Só devolve o que a requisição ainda tem: depois do close() da rota o
+    # pool pode ter emprestado a mesma conexão a outro thread
+    for conn, emprestimo in g.pop('db_connections', []):
+        if conn.emprestimo == emprestimo:
+            conn.close()
+
+# Fila única de escrita com commit em grupo
+class WriteQueue:
+    """Envia todas as escritas do processo para um único thread gravador.
+
+    O gravador junta o que chegou em uma janela de poucos milissegundos e
+    executa tudo em uma transação só: um fsync por lote em vez de um por
+    requisição, e nenhuma disputa pelo lock de escrita entre os threads do
+    processo. Cada operação roda em um SAVEPOINT próprio, então o erro de uma
+    desfaz só as mudanças dela. Entre processos diferentes o busy_timeout
+    continua valendo.
+    """
+
+    def __init__(self, window_ms, max_batch):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pid = None
+        self.lock = threading.Lock()
+        self.fila = None
+        self.thread = None
+
+    def _ensure_writer(self):
+        with self.lock:
+            # Depois de um fork o thread gravador do processo pai não existe
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.fila = queue.Queue()
+                self.thread = None
+            # Se o gravador morreu, outro assume a mesma fila (nada do que já
+            # estava esperando se perde)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, args=(self.fila,), name='mdc-writer', daemon=True)
+                self.thread.start()
+            return self.fila
+
+    def submit(self, operacao, exclusive=False):
+        """Executa operacao(conn) no gravador e devolve o resultado (ou levanta a exceção dela).
+
+        Com exclusive=True a operação roda sozinha, sem conexão nem transação
+        abertas pelo gravador (usado pelo /reset, que troca o banco inteiro).
+        """
+        futuro = Future()
+        rota = metrics_route() if METRICS_ENABLED and has_request_context() else None
+        self._ensure_writer().put((operacao, exclusive, futuro, rota))
+        return futuro.result()
+
+    def _collect(self, fila):
+        lote = [fila.get()]
+        limite = time.monotonic() + self.window
+        while len(lote) < self.max_batch and not lote[-1][1]:
+            restante = limite - time.monotonic()
+            try:
+                lote.append(fila.get(timeout=restante) if restante > 0 else fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _run(self, fila):
+        while True:
+            lote = self._collect(fila)
+            try:
+                operacao, exclusive, futuro, _ = lote[-1]
+                if exclusive:
+                    lote.pop()
+                if lote:
+                    self._run_batch(lote)
+                if exclusive:
+                    self._run_exclusive(operacao, futuro)
+            except Exception as e:
+                # Um erro fora das operações não pode derrubar o gravador:
+                # quem ainda espera recebe o erro e o thread segue
+                app.logger.exception('Erro no gravador de escritas')
+                for _, _, pendente, _ in lote:
+                    if not pendente.done():
+                        pendente.set_exception(e)
+
+    def _run_exclusive(self, operacao, futuro):
+        try:
+            resultado = operacao()
+        except BaseException as e:
+            futuro.set_exception(e)
+        else:
+            futuro.set_result(resultado)
+        finally:
+            response_cache.flush()
+
+    def _run_batch(self, lote):
+        resultados = []
+        inicio = time.perf_counter()
+        conn = None
+        try:
+            conn = db_pool.acquire()
+            conn.execute('BEGIN IMMEDIATE')
+            for operacao, _, futuro, rota in lote:
+                conn.execute('SAVEPOINT operacao')
+                sql_usage.take()
+                try:
+                    resultados.append((futuro, operacao(conn), None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO operacao')
+                    resultados.append((futuro, None, e))
+                if rota:
+                    metrics.observe_sql(*rota, *sql_usage.take())
+                conn.execute('RELEASE operacao')
+            conn.commit()
+            metrics.observe_write_batch(len(lote), time.perf_counter() - inicio)
+        except BaseException as e:
+            # Sem commit nenhuma operação do lote foi gravada
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            for _, _, futuro, _ in lote:
+                futuro.set_exception(e)
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+            # Antes de responder: quem escreveu já lê os dados novos
+            response_cache.flush()
+
+        for futuro, resultado, erro in resultados:
+            if erro is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(erro)
+        notify_subscribers()
+
+write_queue = WriteQueue(WRITE_BATCH_WINDOW_MS, WRITE_BATCH_MAX)
+
+# Serialização JSON e compressão das respostas
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON do Flask (jsonify, request.get_json) feito pelo orjson.
+
+    Mantém o comportamento do provider padrão: chaves ordenadas, saída
+    compacta e indentada em modo debug. Os argumentos do json.dumps que o
+    resto do código usa (sort_keys, indent) são traduzidos para as opções
+    do orjson; os demais não têm efeito (a saída já é UTF-8).
+    """
+
+    def _options(self, sort_keys=None, indent=None, **kwargs):
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if indent:
+            opcoes |= orjson.OPT_INDENT_2
+        return opcoes
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._options(**kwargs)).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        corpo = orjson.dumps(obj, default=self.default,
+                             option=self._options(indent=indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+def use_json_serializer(nome):
+    """Troca o serializador das respostas ('auto', 'orjson' ou 'json'); devolve o escolhido"""
+    if nome == 'auto':
+        nome = 'orjson' if orjson is not None else 'json'
+    if nome == 'orjson' and orjson is None:
+        raise RuntimeError('orjson não está instalado')
+    if nome not in ('orjson', 'json'):
+        raise ValueError(f'Serializador desconhecido: {nome}')
+    app.json = OrjsonProvider(app) if nome == 'orjson' else DefaultJSONProvider(app)
+    return nome
+
+use_json_serializer(JSON_SERIALIZER)
+
+def accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+def gzip_bytes(data):
+    compressor = zlib.compressobj(RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+@app.after_request
+def compress_response(response):
+    """Comprime com gzip as respostas grandes quando o cliente aceita"""
+    if (response.mimetype not in RESPONSE_GZIP_TYPES or response.is_streamed
+            or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code == 200 and response.content_length
+            and response.content_length >= RESPONSE_GZIP_MIN_BYTES and accepts_gzip()):
+        response.set_data(gzip_bytes(response.get_data()))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def parse_timestamp(value):
+    """Converte um parâmetro ISO 8601 para o formato UTC gravado no banco"""
+    instante = datetime.fromisoformat(value)
+    if instante.tzinfo is None:
+        instante = instante.replace(tzinfo=timezone.utc)
+    return instante.astimezone(timezone.utc).isoformat()
+
 def validate_alert_data(data):
     if not data or 'model' not in data or 'operator' not in data or 'part' not in data:
         return False, "Dados incompletos."
@@ -107,6 +863,218 @@ def validate_alert_data(data):
 
     return True, ""
 
+# Histórico: banco principal + arquivo
+def history_queries(sql):
+    """O mesmo SELECT sobre o arquivo e sobre o banco principal (DB. marca as tabelas)"""
+    return [sql.replace('DB.', f'{schema}.') for schema in HISTORY_SCHEMAS]
+
+def merged_history(conn, sql, params, key):
+    """Linhas das duas bases intercaladas na ordem de key, lidas sob demanda.
+
+    Cada SELECT já vem ordenado pelo índice da sua base; basta intercalar.
+    """
+    return heapq.merge(*(iter_rows(conn.execute(query, params)) for query in history_queries(sql)), key=key)
+
+def next_cart_sequence(conn, model):
+    """Reserva a próxima sequência do modelo na transação da rota.
+
+    O contador é incrementado no mesmo comando que o lê: dois inícios
+    simultâneos nunca recebem o mesmo número, e um rollback devolve o número.
+    """
+    return conn.execute(
+        '''INSERT INTO sequencias (modelo, ultima) VALUES (?, 1)
+           ON CONFLICT (modelo) DO UPDATE SET ultima = ultima + 1
+           RETURNING ultima''',
+        (model,)
+    ).fetchone()[0]
+
+def rebuild_cart_sequences(conn):
+    """Recalcula os contadores a partir dos carrinhos, incluindo os arquivados"""
+    conn.execute('''
+        INSERT INTO sequencias (modelo, ultima)
+        SELECT modelo, MAX(seq) FROM (
+            SELECT modelo, MAX(sequencia) AS seq FROM main.carrinhos GROUP BY modelo
+            UNION ALL
+            SELECT modelo, MAX(sequencia) FROM arquivo.carrinhos GROUP BY modelo
+        )
+        WHERE seq IS NOT NULL
+        GROUP BY modelo
+        ON CONFLICT (modelo) DO UPDATE SET ultima = MAX(ultima, excluded.ultima)
+    ''')
+
+def archive_finished_carts(conn, before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move carrinhos finalizados antes de `before`, com etapas e tempos, para o arquivo.
+
+    Cada lote de batch_size carrinhos é uma transação curta, para não segurar
+    o lock de escrita da linha. Os ids são mantidos e a cópia usa INSERT OR
+    REPLACE, então rodar de novo depois de uma interrupção é seguro.
+    Retorna quantos carrinhos foram arquivados.
+    """
+    total = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        ids = [row[0] for row in conn.execute(
+            '''SELECT id FROM main.carrinhos
+               WHERE estado = 'finalizado' AND data_finalizacao < ?
+               ORDER BY data_finalizacao LIMIT ?''',
+            (before, batch_size)
+        )]
+        if not ids:
+            conn.rollback()
+            return total
+
+        marcadores = ', '.join('?' * len(ids))
+        for tabela, coluna, colunas in ARCHIVE_TABLES:
+            conn.execute(
+                f'INSERT OR REPLACE INTO arquivo.{tabela} ({colunas}) '
+                f'SELECT {colunas} FROM main.{tabela} WHERE {coluna} IN ({marcadores})', ids)
+            conn.execute(f'DELETE FROM main.{tabela} WHERE {coluna} IN ({marcadores})', ids)
+        conn.commit()
+        total += len(ids)
+
+# Snapshots e troca do banco em uso
+swap_lock = threading.Lock()
+
+def snapshot_dir():
+    return SNAPSHOT_DIR or os.path.join(os.path.dirname(os.path.abspath(DATABASE)), 'snapshots')
+
+def snapshot_paths(nome):
+    """Arquivos (principal, arquivo) do snapshot `nome`"""
+    principal = os.path.join(snapshot_dir(), f'{nome}.db')
+    return principal, sibling_archive(principal)
+
+def new_snapshot_name(motivo):
+    agora = datetime.now(timezone.utc)
+    return f'{agora:%Y%m%d-%H%M%S}-{agora.microsecond // 1000:03d}-{motivo}'
+
+def backup_file(origem, destino):
+    """Cópia consistente de um banco SQLite, mesmo em uso, pela API de backup"""
+    fonte = sqlite3.connect(origem, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    alvo = sqlite3.connect(destino, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        fonte.backup(alvo)
+    finally:
+        alvo.close()
+        fonte.close()
+
+def list_snapshots():
+    pasta = snapshot_dir()
+    if not os.path.isdir(pasta):
+        return []
+    snapshots = []
+    for arquivo in os.listdir(pasta):
+        nome, extensao = os.path.splitext(arquivo)
+        if extensao != '.db' or nome.endswith('_arquivo') or not SNAPSHOT_NAME.match(nome):
+            continue
+        tamanho = sum(os.path.getsize(caminho) for caminho in snapshot_paths(nome) if os.path.exists(caminho))
+        snapshots.append({
+            'nome': nome,
+            'criado_em': datetime.fromtimestamp(os.path.getmtime(os.path.join(pasta, arquivo)), timezone.utc).isoformat(),
+            'tamanho': tamanho
+        })
+    return sorted(snapshots, key=lambda snapshot: snapshot['criado_em'], reverse=True)
+
+def take_snapshot(nome):
+    """Grava o estado atual (banco principal e arquivo) como o snapshot `nome`"""
+    os.makedirs(snapshot_dir(), exist_ok=True)
+    for origem, destino in zip((DATABASE, archive_path(DATABASE)), snapshot_paths(nome)):
+        # Só aparece na listagem depois de completo
+        temporario = destino + '.tmp'
+        backup_file(origem, temporario)
+        os.replace(temporario, destino)
+
+def prune_snapshots():
+    """Mantém só os SNAPSHOT_KEEP snapshots automáticos mais recentes; os criados pelo POST /snapshots ficam"""
+    automaticos = [snapshot for snapshot in list_snapshots() if SNAPSHOT_AUTOMATICO.match(snapshot['nome'])]
+    for antigo in automaticos[SNAPSHOT_KEEP:]:
+        for caminho in snapshot_paths(antigo['nome']):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+def swap_database(principal, arquivo, event_type, payload):
+    """Troca o conteúdo do banco em uso pelo dos arquivos preparados, pela API de backup.
+
+    A cópia para o banco em uso é uma única transação de escrita: conexões
+    abertas (de qualquer worker) continuam válidas e passam a ver os dados
+    novos na próxima consulta, sem arquivo renomeado por baixo delas. A versão
+    'reset' e a numeração dos eventos continuam de onde o banco em uso parou,
+    para ETags e Last-Event-ID dos clientes não se confundirem.
+    """
+    atual = sqlite3.connect(DATABASE, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        # fetchall encerra as consultas: o backup exige o destino sem transação aberta
+        reset = atual.execute("SELECT versao FROM versoes WHERE tabela = 'reset' AND model = '*'").fetchall()
+        evento = atual.execute("SELECT seq FROM sqlite_sequence WHERE name = 'eventos'").fetchall()
+
+        preparado = sqlite3.connect(principal)
+        try:
+            preparado.execute('DELETE FROM eventos')
+            preparado.execute(
+                '''INSERT INTO versoes (tabela, model, versao) VALUES ('reset', '*', ?)
+                   ON CONFLICT (tabela, model) DO UPDATE SET versao = MAX(versao, excluded.versao)''',
+                (reset[0][0] if reset else 0,)
+            )
+            bump_version(preparado, ['reset'], None)
+            preparado.execute("DELETE FROM sqlite_sequence WHERE name = 'eventos'")
+            preparado.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('eventos', ?)",
+                              (evento[0][0] if evento else 0,))
+            publish_event(preparado, event_type, None, payload)
+            preparado.commit()
+
+            # O arquivo primeiro: se parar no meio, o banco principal ainda é o antigo
+            backup_file(arquivo, archive_path(DATABASE))
+            preparado.backup(atual)
+        finally:
+            preparado.close()
+    finally:
+        atual.close()
+    notify_subscribers()
+
+def reset_database():
+    """Guarda o estado atual como snapshot e troca por um banco vazio; devolve o nome do snapshot.
+
+    A cópia de segurança e o banco novo são preparados com as escritas
+    correndo; só a troca passa pela fila do gravador, como operação exclusiva,
+    e ela copia apenas o banco vazio. O que for gravado durante a cópia de
+    segurança é apagado pelo reset sem entrar no snapshot.
+    """
+    with swap_lock:
+        nome = new_snapshot_name('reset')
+        take_snapshot(nome)
+        with tempfile.TemporaryDirectory(dir=snapshot_dir()) as pasta:
+            principal = os.path.join(pasta, 'alerts.db')
+            arquivo = sibling_archive(principal)
+            init_db(principal, arquivo)
+            write_queue.submit(lambda: swap_database(principal, arquivo, 'data.reset', {'snapshot': nome}),
+                               exclusive=True)
+        prune_snapshots()
+        return nome
+
+def restore_snapshot(nome):
+    """Volta ao snapshot `nome`, guardando antes o estado atual; devolve o nome dessa cópia.
+
+    Como no reset, a cópia do estado atual e do snapshot são feitas antes de
+    parar o gravador; a pausa das escritas é a da cópia do snapshot para o
+    banco em uso.
+    """
+    with swap_lock:
+        origem_principal, origem_arquivo = snapshot_paths(nome)
+        copia = new_snapshot_name('antes-restaurar')
+        take_snapshot(copia)
+        with tempfile.TemporaryDirectory(dir=snapshot_dir()) as pasta:
+            principal = os.path.join(pasta, 'alerts.db')
+            arquivo = sibling_archive(principal)
+            backup_file(origem_principal, principal)
+            if os.path.exists(origem_arquivo):
+                backup_file(origem_arquivo, arquivo)
+            # Snapshots de versões anteriores ganham as tabelas novas
+            init_db(principal, arquivo)
+            write_queue.submit(lambda: swap_database(principal, arquivo, 'data.reset',
+                                                     {'snapshot': nome, 'restaurado': True}),
+                               exclusive=True)
+        prune_snapshots()
+        return copia
+
 # Funções auxiliares
 def get_previous_operator(operator):
     operators = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6']
@@ -139,35 +1107,569 @@ def get_part_for_operator(operator, model):
         }
     return parts.get(operator, 'Peça não definida')
 
+# Eventos em tempo real
+stream_condition = threading.Condition()
+
+def publish_event(conn, event_type, model, payload):
+    """Registra um evento do /stream na mesma transação da rota que o gerou"""
+    cursor = conn.execute(
+        'INSERT INTO eventos (tipo, topico, model, dados, criado_em) VALUES (?, ?, ?, ?, ?)',
+        (event_type, event_type.split('.')[0], model, json.dumps(payload),
+         datetime.now(timezone.utc).isoformat())
+    )
+    # Mantém só os eventos recentes, suficientes para retomar conexões
+    if cursor.lastrowid % 500 == 0:
+        conn.execute('DELETE FROM eventos WHERE id <= ?', (cursor.lastrowid - EVENT_RETENTION,))
+
+def notify_subscribers():
+    """Acorda os /stream deste processo depois do commit"""
+    with stream_condition:
+        stream_condition.notify_all()
+
+def fetch_events(after_id, model, topics):
+    conn = db_pool.acquire()
+    try:
+        eventos = conn.execute(
+            'SELECT * FROM eventos WHERE id > ? ORDER BY id LIMIT 200',
+            (after_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    selecionados = [
+        evento for evento in eventos
+        if (not model or evento['model'] in (None, model))
+        and (not topics or evento['topico'] in topics)
+    ]
+    return selecionados, (eventos[-1]['id'] if eventos else after_id)
+
+def format_sse(evento):
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {evento['dados']}\n\n"
+
+# Estatísticas de ciclo por posto
+def sketch_add(sketch, value):
+    """Conta value no histograma logarítmico usado para os percentis.
+
+    Cada balde cobre valores com erro relativo de até STATS_SKETCH_ACCURACY.
+    Acima de STATS_SKETCH_MAX_BUCKETS baldes os menores são unidos, o que
+    só afeta a precisão dos tempos mais curtos.
+    """
+    chave = str(math.ceil(math.log(value, STATS_SKETCH_GAMMA))) if value > 0 else 'zero'
+    sketch[chave] = sketch.get(chave, 0) + 1
+    while len(sketch) > STATS_SKETCH_MAX_BUCKETS:
+        menor, seguinte = sorted(int(k) for k in sketch if k != 'zero')[:2]
+        sketch[str(seguinte)] += sketch.pop(str(menor))
+
+def sketch_quantile(sketch, count, q):
+    posicao = q * (count - 1)
+    acumulado = sketch.get('zero', 0)
+    if posicao < acumulado:
+        return 0.0
+    for indice in sorted(int(k) for k in sketch if k != 'zero'):
+        acumulado += sketch[str(indice)]
+        if acumulado > posicao:
+            # Ponto médio do balde: erro relativo <= STATS_SKETCH_ACCURACY
+            return 2 * STATS_SKETCH_GAMMA ** indice / (STATS_SKETCH_GAMMA + 1)
+    return math.inf
+
+def stats_add(stats, duration):
+    """Inclui uma duração nos momentos acumulados (algoritmo de Welford)"""
+    if stats is None:
+        stats = {'count': 0, 'mean': 0.0, 'm2': 0.0, 'min': duration, 'max': duration, 'sketch': {}}
+    stats['count'] += 1
+    delta = duration - stats['mean']
+    stats['mean'] += delta / stats['count']
+    stats['m2'] += delta * (duration - stats['mean'])
+    stats['min'] = min(stats['min'], duration)
+    stats['max'] = max(stats['max'], duration)
+    sketch_add(stats['sketch'], duration)
+    return stats
+
+def save_station_stats(conn, model, operator, part, stats):
+    conn.execute(
+        '''INSERT OR REPLACE INTO station_stats
+           (model, operator, part, count, mean, m2, min, max, sketch, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        (model, operator, part, stats['count'], stats['mean'], stats['m2'], stats['min'],
+         stats['max'], json.dumps(stats['sketch']), datetime.now(timezone.utc).isoformat())
+    )
+
+def update_station_stats(conn, model, operator, part, duration):
+    """Atualiza as estatísticas do posto na transação do /process/end"""
+    row = conn.execute(
+        'SELECT count, mean, m2, min, max, sketch FROM station_stats WHERE model = ? AND operator = ? AND part = ?',
+        (model, operator, part)
+    ).fetchone()
+    stats = None
+    if row:
+        stats = {'count': row[0], 'mean': row[1], 'm2': row[2], 'min': row[3], 'max': row[4],
+                 'sketch': json.loads(row[5])}
+    save_station_stats(conn, model, operator, part, stats_add(stats, duration))
+
+def rebuild_station_stats(conn):
+    """Recalcula station_stats do zero a partir de process_times"""
+    acumulado = {}
+    for query in history_queries('SELECT model, operator, part, duration FROM DB.process_times ORDER BY id'):
+        for model, operator, part, duration in conn.execute(query):
+            chave = (model, operator, part)
+            acumulado[chave] = stats_add(acumulado.get(chave), duration)
+
+    conn.execute('DELETE FROM station_stats')
+    for (model, operator, part), stats in acumulado.items():
+        save_station_stats(conn, model, operator, part, stats)
+
+def format_station_stats(row):
+    sketch = json.loads(row['sketch'])
+    # Os percentis do histograma nunca passam dos extremos observados
+    def percentil(q):
+        return min(max(sketch_quantile(sketch, row['count'], q), row['min']), row['max'])
+
+    return {
+        'model': row['model'],
+        'operator': row['operator'],
+        'part': row['part'],
+        'count': row['count'],
+        'mean': row['mean'],
+        'std': math.sqrt(row['m2'] / (row['count'] - 1)) if row['count'] > 1 else 0.0,
+        'min': row['min'],
+        'max': row['max'],
+        'p50': percentil(0.5),
+        'p95': percentil(0.95),
+        'updated_at': row['updated_at']
+    }
+
+# Série de vazão por posto
+def throughput_bucket(timestamp, granularidade):
+    """Início (UTC, ISO 8601) do balde que contém timestamp"""
+    tamanho = THROUGHPUT_GRANULARITIES[granularidade]
+    segundos = datetime.fromisoformat(parse_timestamp(timestamp)).timestamp()
+    return datetime.fromtimestamp(segundos // tamanho * tamanho, timezone.utc).isoformat()
+
+def update_throughput(conn, model, operator, end_time, duration, etapas=1):
+    """Soma etapas concluídas nos baldes de minuto e hora, na transação do /process/end
+
+    A etapa do A6 é a última: cada uma finaliza um carrinho.
+    """
+    carrinhos = etapas if operator == 'A6' else 0
+    for granularidade in THROUGHPUT_GRANULARITIES:
+        conn.execute(
+            '''INSERT INTO throughput (granularidade, model, bucket, operator, etapas, carrinhos, duracao_total)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (granularidade, model, bucket, operator) DO UPDATE SET
+                   etapas = etapas + excluded.etapas,
+                   carrinhos = carrinhos + excluded.carrinhos,
+                   duracao_total = duracao_total + excluded.duracao_total''',
+            (granularidade, model, throughput_bucket(end_time, granularidade), operator,
+             etapas, carrinhos, duration)
+        )
+
+def rebuild_throughput(conn):
+    """Recalcula a tabela throughput do zero a partir de process_times"""
+    conn.execute('DELETE FROM throughput')
+    # Agrupa por minuto no SQL; cada grupo entra de uma vez nos dois baldes
+    # (um minuto dividido entre arquivo e banco principal soma as duas partes)
+    for query in history_queries('''
+            SELECT model, operator, MIN(end_time), COUNT(*), SUM(duration)
+            FROM DB.process_times
+            GROUP BY model, operator, substr(end_time, 1, 16)'''):
+        for model, operator, minuto, etapas, duracao_total in conn.execute(query).fetchall():
+            update_throughput(conn, model, operator, minuto, duracao_total, etapas)
+
+# Análise de gargalo
+analysis_cache = {}
+analysis_cache_lock = threading.Lock()
+
+def load_columns(conn, sql, params, columns):
+    """Resultado numérico de uma consulta de histórico como matriz NumPy (uma coluna por campo)"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = []
+    for query in history_queries(sql):
+        rows += cursor.execute(query, params).fetchall()
+    return np.array(rows, dtype=float).reshape(len(rows), columns)
+
+def analyze_bottleneck(processos, etapas):
+    """Calcula a análise de gargalo sobre as matrizes carregadas do banco.
+
+    processos: posto, duração (s), início e fim (dias julianos) de cada etapa concluída.
+    etapas: carrinho, sequência, posto, início e fim (dias julianos) das etapas,
+    usadas para a espera entre um posto e o seguinte.
+    """
+    postos = len(VALID_OPERATORS) + 1  # índice = número do posto (A1 -> 1)
+    posto = processos[:, 0].astype(int)
+    duracao = processos[:, 1]
+
+    contagem = np.bincount(posto, minlength=postos)
+    soma = np.bincount(posto, weights=duracao, minlength=postos)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = soma / contagem
+        # Segunda passada sobre os desvios: estável mesmo com durações grandes
+        desvios = np.bincount(posto, weights=(duracao - media[posto]) ** 2, minlength=postos)
+        variancia = np.where(contagem > 1, desvios / (contagem - 1), 0.0)
+
+    # Período observado: do primeiro início ao último fim da janela
+    periodo = (processos[:, 3].max() - processos[:, 2].min()) * 86400 if len(processos) else 0.0
+    utilizacao = soma / periodo if periodo > 0 else np.zeros(postos)
+
+    # Espera entre etapas: fim da etapa N até o início da N+1 do mesmo carrinho
+    ordem = np.lexsort((etapas[:, 1], etapas[:, 0]))
+    etapas = etapas[ordem]
+    mesmo_carrinho = (etapas[1:, 0] == etapas[:-1, 0]) & ~np.isnan(etapas[:-1, 4])
+    espera = np.clip((etapas[1:, 3] - etapas[:-1, 4]) * 86400, 0, None)[mesmo_carrinho]
+    posto_seguinte = etapas[1:, 2].astype(int)[mesmo_carrinho]
+    esperas = np.bincount(posto_seguinte, minlength=postos)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        espera_media = np.bincount(posto_seguinte, weights=espera, minlength=postos) / esperas
+
+    finalizados = int(contagem[len(VALID_OPERATORS)])
+    estacoes = []
+    for indice in np.flatnonzero(contagem):
+        estacoes.append({
+            'operator': f'A{indice}',
+            'count': int(contagem[indice]),
+            'mean': float(media[indice]),
+            'variance': float(variancia[indice]),
+            'busy_seconds': float(soma[indice]),
+            'utilization': float(utilizacao[indice]),
+            'wait_mean': float(espera_media[indice]) if esperas[indice] else None,
+            'wait_count': int(esperas[indice])
+        })
+
+    # Restrição da linha: o posto com maior tempo médio de ciclo
+    restricao = max(estacoes, key=lambda estacao: estacao['mean']) if estacoes else None
+    return {
+        'period_seconds': float(periodo),
+        'carrinhos_finalizados': finalizados,
+        'takt_time': float(periodo / finalizados) if finalizados else None,
+        'stations': estacoes,
+        'constraint': restricao['operator'] if restricao else None
+    }
+
+# Exportação em streaming
+def export_rows(sql, params, columns, order_columns, fmt, compress):
+    """Gera o arquivo exportado direto dos cursores, em lotes de EXPORT_BATCH_SIZE linhas.
+
+    Arquivo e banco principal são intercalados na ordem de order_columns. A
+    conexão fica com o gerador até o fim da resposta, e nunca há mais de
+    um lote em memória, qualquer que seja o tamanho das tabelas.
+    """
+    indices = [columns.index(column) for column in order_columns]
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def encode(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    conn = db_pool.acquire()
+    try:
+        linhas = merged_history(conn, sql, params, key=lambda row: [row[i] for i in indices])
+        if fmt == 'csv':
+            writer.writerow(columns)
+        while True:
+            rows = list(itertools.islice(linhas, EXPORT_BATCH_SIZE))
+            if not rows:
+                break
+            if fmt == 'csv':
+                writer.writerows(tuple(row) for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(app.json.dumps(dict(zip(columns, row)), sort_keys=False, ensure_ascii=False))
+                    buffer.write('\n')
+            chunk = encode(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+        chunk = encode(buffer.getvalue())
+        if compressor:
+            chunk += compressor.flush()
+        if chunk:
+            yield chunk
+    finally:
+        conn.close()
+
+def export_response(name, sql, params, columns, order_columns):
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Formato inválido, use {" ou ".join(EXPORT_FORMATS)}'}), 400
+
+    compress = accepts_gzip()
+    headers = {
+        'Content-Disposition': f'attachment; filename={name}.{fmt}',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+        'X-Accel-Buffering': 'no'
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(
+        export_rows(sql, params, columns, order_columns, fmt, compress),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers=headers
+    )
+
+def export_time_filters():
+    """since/until da requisição, normalizados; ValueError se inválidos"""
+    since = request.args.get('since')
+    until = request.args.get('until')
+    return (parse_timestamp(since) if since else None,
+            parse_timestamp(until) if until else None)
+
+# Cache de respostas dos GET
+class ResponseCache:
+    """LRU das respostas 200 dos GET, por rota e argumentos.
+
+    Cada entrada guarda as tabelas e o modelo do seu ETag e cai com as mesmas
+    escritas que mudariam esse ETag: bump_version anota as tabelas alteradas
+    e o gravador chama flush() depois do commit. Uma consulta que começou
+    antes de uma invalidação não é guardada (contador de gerações), para não
+    voltar ao cache com dados anteriores à escrita.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entradas = OrderedDict()
+        self.geracao = 0
+        self.pendentes = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    @staticmethod
+    def request_key():
+        # Mesmos argumentos em outra ordem são a mesma consulta
+        return request.path, tuple(sorted(request.args.items(multi=True)))
+
+    def get(self, chave):
+        with self.lock:
+            entrada = self.entradas.get(chave)
+            if entrada is not None and entrada['expira'] > time.monotonic():
+                self.entradas.move_to_end(chave)
+                self.hits += 1
+                return entrada
+            if entrada is not None:
+                del self.entradas[chave]
+            self.misses += 1
+            return None
+
+    def put(self, chave, geracao, tables, model, etag, response):
+        if self.max_size <= 0:
+            return
+        entrada = {
+            'expira': time.monotonic() + self.ttl,
+            'tabelas': frozenset(tables),
+            'model': model,
+            'etag': etag,
+            'corpo': response.get_data(),
+            'gzip': None,
+            'mimetype': response.mimetype
+        }
+        with self.lock:
+            if geracao != self.geracao:
+                return
+            self.entradas[chave] = entrada
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.max_size:
+                self.entradas.popitem(last=False)
+
+    def touch(self, tables, model):
+        """Anota uma escrita da transação em andamento neste thread"""
+        if not hasattr(self.pendentes, 'lista'):
+            self.pendentes.lista = []
+        self.pendentes.lista.append((tables, model))
+
+    def flush(self):
+        """Invalida o que as escritas anotadas por este thread alteraram"""
+        pendentes = getattr(self.pendentes, 'lista', None)
+        self.pendentes.lista = []
+        for tables, model in pendentes or []:
+            self.invalidate(tables, model)
+
+    def invalidate(self, tables, model):
+        tabelas = set(tables)
+        with self.lock:
+            self.geracao += 1
+            self.invalidacoes += 1
+            if 'reset' in tabelas:
+                self.entradas.clear()
+                return
+            # Mesma regra do bump_version: escrita sem modelo só muda as versões '*'
+            for chave, entrada in list(self.entradas.items()):
+                if entrada['tabelas'] & tabelas and (entrada['model'] is None or entrada['model'] == model):
+                    del self.entradas[chave]
+
+    def stats(self):
+        with self.lock:
+            consultas = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / consultas, 4) if consultas else None,
+                'invalidations': self.invalidacoes,
+                'entries': len(self.entradas),
+                'max_entries': self.max_size,
+                'ttl_seconds': self.ttl
+            }
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+# Versões dos dados e GET condicional (ETag / 304)
+def bump_version(conn, tables, model):
+    """Incrementa a versão das tabelas alteradas, na transação da rota"""
+    for tabela in tables:
+        for chave in {model or '*', '*'}:
+            conn.execute(
+                '''INSERT INTO versoes (tabela, model, versao) VALUES (?, ?, 1)
+                   ON CONFLICT (tabela, model) DO UPDATE SET versao = versao + 1''',
+                (tabela, chave)
+            )
+    response_cache.touch(tables, model or None)
+
+def current_etag(tables, model):
+    conn = get_db_connection()
+    versoes = {
+        (row['tabela'], row['model']): row['versao']
+        for row in conn.execute('SELECT tabela, model, versao FROM versoes').fetchall()
+    }
+    conn.close()
+
+    chave = model or '*'
+    # 'reset' entra sempre: o /reset invalida tudo, inclusive modelos sem versão
+    partes = [versoes.get(('reset', '*'), 0)]
+    partes += [versoes.get((tabela, chave), 0) for tabela in tables]
+    return f"{chave}-{'.'.join(str(p) for p in partes)}"
+
+def versioned(tables, model_arg='model', cache=False, window=None):
+    """Responde 304 sem consultar as tabelas quando o cliente já tem a versão atual.
+
+    Com cache=True a resposta também fica no response_cache: chamadas
+    repetidas, com ou sem If-None-Match, não vão ao banco até uma escrita
+    nas tabelas (ou o TTL) invalidar a entrada.
+
+    window é para rotas cuja janela padrão anda com o relógio: devolve o
+    balde de tempo atual quando o cliente não fixou a janela (ou None), e
+    esse balde entra no ETag e na chave do cache, para a resposta mudar
+    quando a janela muda mesmo sem escrita.
+
+    O ETag calculado fica em g.etag, para a rota usar a mesma versão sem
+    consultar de novo.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            model = kwargs.get(model_arg) or request.args.get(model_arg)
+            balde = window() if window else None
+            if cache:
+                chave = ResponseCache.request_key() + (balde,)
+                entrada = response_cache.get(chave)
+                if entrada is not None:
+                    if request.if_none_match.contains(entrada['etag']):
+                        response = Response(status=304)
+                    elif len(entrada['corpo']) >= RESPONSE_GZIP_MIN_BYTES and accepts_gzip():
+                        # A versão comprimida também fica na entrada, feita no primeiro pedido
+                        if entrada['gzip'] is None:
+                            entrada['gzip'] = gzip_bytes(entrada['corpo'])
+                        response = Response(entrada['gzip'], mimetype=entrada['mimetype'])
+                        response.headers['Content-Encoding'] = 'gzip'
+                        response.vary.add('Accept-Encoding')
+                    else:
+                        response = Response(entrada['corpo'], mimetype=entrada['mimetype'])
+                    response.set_etag(entrada['etag'])
+                    response.headers['Cache-Control'] = 'no-cache'
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                geracao = response_cache.geracao
+
+            try:
+                etag = current_etag(tables, model)
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
+            if balde:
+                etag = f'{etag}@{balde}'
+            g.etag = etag
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if cache:
+                    response_cache.put(chave, geracao, tables, model or None, etag, response)
+            if cache:
+                response.headers['X-Cache'] = 'MISS'
+            response.set_etag(etag)
+            # Permite ao navegador guardar a resposta, mas sempre revalidando
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
 # Endpoint para resetar dados
 @app.route('/reset', methods=['POST'])
 def reset_all_data():
     try:
-        conn = get_db_connection()
-        
-        # Limpar todas as tabelas
-        conn.execute('DELETE FROM alerts')
-        conn.execute('DELETE FROM process_times')
-        conn.execute('DELETE FROM process_states')
-        conn.execute('DELETE FROM carrinhos')
-        conn.execute('DELETE FROM carrinho_etapas')
-        
-        # Reiniciar as sequências dos IDs autoincrement
-        conn.execute('DELETE FROM sqlite_sequence WHERE name IN ("alerts", "process_times", "process_states", "carrinhos", "carrinho_etapas")')
-        
-        conn.commit()
-        conn.close()
+        # Troca por um banco novo; os dados antigos ficam no snapshot
+        nome = reset_database()
         
         return jsonify({
             'message': 'Todos os dados de produção foram resetados com sucesso',
-            'tables_cleared': ['alerts', 'process_times', 'process_states', 'carrinhos', 'carrinho_etapas']
+            'tables_cleared': ['alerts', 'process_times', 'process_states', 'carrinhos', 'carrinho_etapas',
+                               'station_stats', 'throughput'],
+            'snapshot': nome
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Erro ao resetar dados: {str(e)}'}), 500
 
+# Snapshots do estado de produção
+@app.route('/snapshots', methods=['GET'])
+def get_snapshots():
+    try:
+        return jsonify(list_snapshots())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/snapshots', methods=['POST'])
+def create_snapshot():
+    try:
+        data = request.get_json(silent=True) or {}
+        nome = data.get('nome') or new_snapshot_name('manual')
+        if not isinstance(nome, str) or not SNAPSHOT_NAME.match(nome) or nome.endswith('_arquivo'):
+            return jsonify({'error': 'Nome inválido: use letras, números, - e _'}), 400
+
+        with swap_lock:
+            if os.path.exists(snapshot_paths(nome)[0]):
+                return jsonify({'error': 'Já existe um snapshot com esse nome'}), 409
+            take_snapshot(nome)
+
+        return jsonify({'message': 'Snapshot criado com sucesso', 'nome': nome}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/snapshots/<nome>/restore', methods=['POST'])
+def restore_snapshot_route(nome):
+    try:
+        if not SNAPSHOT_NAME.match(nome) or not os.path.exists(snapshot_paths(nome)[0]):
+            return jsonify({'error': 'Snapshot não encontrado'}), 404
+
+        copia = restore_snapshot(nome)
+        return jsonify({
+            'message': 'Snapshot restaurado com sucesso',
+            'snapshot': nome,
+            'estado_anterior': copia
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Erro ao restaurar snapshot: {str(e)}'}), 500
+
 # Endpoints de Alertas
 @app.route('/alerts', methods=['GET'])
+@versioned(['alerts'], cache=True)
 def get_alerts():
     try:
         model = request.args.get('model')
@@ -211,33 +1713,34 @@ def create_alert():
         part = data['part']
         started_at = datetime.now(timezone.utc).isoformat()
 
-        conn = get_db_connection()
-        existing = conn.execute(
-            'SELECT * FROM alerts WHERE model = ? AND operator = ? AND part = ?',
-            (model, operator, part)
-        ).fetchone()
+        def escrever(conn):
+            existing = conn.execute(
+                'SELECT * FROM alerts WHERE model = ? AND operator = ? AND part = ?',
+                (model, operator, part)
+            ).fetchone()
 
-        if existing:
-            return jsonify({
-                'error': f'Já existe uma solicitação ativa'
-            }), 409
+            if existing:
+                return {'error': f'Já existe uma solicitação ativa'}, 409
 
-        cursor = conn.execute(
-            'INSERT INTO alerts (model, operator, part, started_at) VALUES (?, ?, ?, ?)',
-            (model, operator, part, started_at)
-        )
-        conn.commit()
+            cursor = conn.execute(
+                'INSERT INTO alerts (model, operator, part, started_at) VALUES (?, ?, ?, ?)',
+                (model, operator, part, started_at)
+            )
 
-        new_alert = {
-            'id': cursor.lastrowid,
-            'model': model,
-            'operator': operator,
-            'part': part,
-            'started_at': started_at
-        }
+            new_alert = {
+                'id': cursor.lastrowid,
+                'model': model,
+                'operator': operator,
+                'part': part,
+                'started_at': started_at
+            }
 
-        conn.close()
-        return jsonify(new_alert), 201
+            bump_version(conn, ['alerts'], model)
+            publish_event(conn, 'alert.created', model, new_alert)
+            return new_alert, 201
+
+        body, status = write_queue.submit(escrever)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -254,18 +1757,20 @@ def stop_alert():
         operator = data['operator']
         part = data['part']
 
-        conn = get_db_connection()
-        result = conn.execute(
-            'DELETE FROM alerts WHERE model = ? AND operator = ? AND part = ?',
-            (model, operator, part)
-        )
-        conn.commit()
-        conn.close()
+        def escrever(conn):
+            result = conn.execute(
+                'DELETE FROM alerts WHERE model = ? AND operator = ? AND part = ?',
+                (model, operator, part)
+            )
+            if result.rowcount == 0:
+                return {'error': 'Nenhum alerta ativo encontrado'}, 404
 
-        if result.rowcount == 0:
-            return jsonify({'error': 'Nenhum alerta ativo encontrado'}), 404
+            bump_version(conn, ['alerts'], model)
+            publish_event(conn, 'alert.stopped', model, {'model': model, 'operator': operator, 'part': part})
+            return {'message': 'Solicitação parada com sucesso'}, 200
 
-        return jsonify({'message': 'Solicitação parada com sucesso'})
+        body, status = write_queue.submit(escrever)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -284,36 +1789,39 @@ def criar_carrinho():
             
         data_criacao = datetime.now(timezone.utc).isoformat()
         
-        conn = get_db_connection()
-        
-        # Calcular sequência
-        ultima_sequencia = conn.execute(
-            'SELECT MAX(sequencia) as max_seq FROM carrinhos WHERE modelo = ?',
-            (modelo,)
-        ).fetchone()
-        
-        nova_sequencia = (ultima_sequencia['max_seq'] or 0) + 1
-        
-        cursor = conn.execute(
-            'INSERT INTO carrinhos (modelo, data_criacao, operador_atual, sequencia) VALUES (?, ?, ?, ?)',
-            (modelo, data_criacao, 'A1', nova_sequencia)
-        )
-        carrinho_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
+        def escrever(conn):
+            # Calcular sequência
+            nova_sequencia = next_cart_sequence(conn, modelo)
+            
+            cursor = conn.execute(
+                'INSERT INTO carrinhos (modelo, data_criacao, operador_atual, sequencia) VALUES (?, ?, ?, ?)',
+                (modelo, data_criacao, 'A1', nova_sequencia)
+            )
+            carrinho_id = cursor.lastrowid
+
+            bump_version(conn, ['carrinhos'], modelo)
+            publish_event(conn, 'cart.created', modelo, {
+                'carrinho_id': carrinho_id,
+                'modelo': modelo,
+                'sequencia': nova_sequencia,
+                'operador_atual': 'A1'
+            })
+            
+            return {
+                'message': 'Carrinho criado com sucesso',
+                'carrinho_id': carrinho_id,
+                'modelo': modelo,
+                'sequencia': nova_sequencia
+            }, 201
         
-        return jsonify({
-            'message': 'Carrinho criado com sucesso',
-            'carrinho_id': carrinho_id,
-            'modelo': modelo,
-            'sequencia': nova_sequencia
-        }), 201
+        body, status = write_queue.submit(escrever)
+        return jsonify(body), status
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/carrinhos/disponiveis/<operador>', methods=['GET'])
+@versioned(['carrinhos', 'carrinho_etapas'])
 def get_carrinhos_disponiveis(operador):
     try:
         model = request.args.get('model')
@@ -374,70 +1882,73 @@ def start_process():
         carrinho_id = data.get('carrinho_id')
         start_time = datetime.now(timezone.utc).isoformat()
 
-        conn = get_db_connection()
-        
-        if operator == 'A1':
-            # A1 cria novo carrinho
-            if carrinho_id:
-                return jsonify({'error': 'A1 não pode usar carrinho existente'}), 400
+        # A1 cria novo carrinho; os outros operadores usam um existente
+        if operator == 'A1' and carrinho_id:
+            return jsonify({'error': 'A1 não pode usar carrinho existente'}), 400
+        if operator != 'A1' and not carrinho_id:
+            return jsonify({'error': 'Carrinho não especificado'}), 400
+
+        def escrever(conn):
+            carrinho_id = data.get('carrinho_id')
+            if operator == 'A1':
+                # Calcular sequência
+                nova_sequencia = next_cart_sequence(conn, model)
                 
-            # Calcular sequência
-            ultima_sequencia = conn.execute(
-                'SELECT MAX(sequencia) as max_seq FROM carrinhos WHERE modelo = ?',
-                (model,)
-            ).fetchone()
-            
-            nova_sequencia = (ultima_sequencia['max_seq'] or 0) + 1
-            
-            cursor = conn.execute(
-                'INSERT INTO carrinhos (modelo, data_criacao, operador_atual, sequencia) VALUES (?, ?, ?, ?)',
-                (model, start_time, operator, nova_sequencia)
-            )
-            carrinho_id = cursor.lastrowid
-            
-            # Registrar primeira etapa
-            sequencia_etapa = 1
-            conn.execute(
-                'INSERT INTO carrinho_etapas (carrinho_id, operador, parte, inicio, sequencia) VALUES (?, ?, ?, ?, ?)',
-                (carrinho_id, operator, part, start_time, sequencia_etapa)
-            )
-        else:
-            # Outros operadores usam carrinho existente
-            if not carrinho_id:
-                return jsonify({'error': 'Carrinho não especificado'}), 400
+                cursor = conn.execute(
+                    'INSERT INTO carrinhos (modelo, data_criacao, operador_atual, sequencia) VALUES (?, ?, ?, ?)',
+                    (model, start_time, operator, nova_sequencia)
+                )
+                carrinho_id = cursor.lastrowid
                 
-            # Verificar se carrinho existe e está no operador correto
-            carrinho = conn.execute(
-                'SELECT * FROM carrinhos WHERE id = ? AND modelo = ? AND operador_atual = ?',
-                (carrinho_id, model, operator)
-            ).fetchone()
-            
-            if not carrinho:
-                return jsonify({'error': 'Carrinho não disponível para este operador'}), 404
-            
-            # Registrar nova etapa
-            ultima_etapa = conn.execute(
-                '''SELECT * FROM carrinho_etapas 
-                   WHERE carrinho_id = ? 
-                   ORDER BY sequencia DESC LIMIT 1''',
-                (carrinho_id,)
-            ).fetchone()
-            
-            sequencia_etapa = (ultima_etapa['sequencia'] if ultima_etapa else 0) + 1
-            conn.execute(
-                'INSERT INTO carrinho_etapas (carrinho_id, operador, parte, inicio, sequencia) VALUES (?, ?, ?, ?, ?)',
-                (carrinho_id, operator, part, start_time, sequencia_etapa)
-            )
+                # Registrar primeira etapa
+                sequencia_etapa = 1
+                conn.execute(
+                    'INSERT INTO carrinho_etapas (carrinho_id, operador, parte, inicio, sequencia) VALUES (?, ?, ?, ?, ?)',
+                    (carrinho_id, operator, part, start_time, sequencia_etapa)
+                )
+            else:
+                # Verificar se carrinho existe e está no operador correto
+                carrinho = conn.execute(
+                    'SELECT * FROM carrinhos WHERE id = ? AND modelo = ? AND operador_atual = ?',
+                    (carrinho_id, model, operator)
+                ).fetchone()
+                
+                if not carrinho:
+                    return {'error': 'Carrinho não disponível para este operador'}, 404
+                
+                # Registrar nova etapa
+                ultima_etapa = conn.execute(
+                    '''SELECT * FROM carrinho_etapas 
+                       WHERE carrinho_id = ? 
+                       ORDER BY sequencia DESC LIMIT 1''',
+                    (carrinho_id,)
+                ).fetchone()
+                
+                sequencia_etapa = (ultima_etapa['sequencia'] if ultima_etapa else 0) + 1
+                conn.execute(
+                    'INSERT INTO carrinho_etapas (carrinho_id, operador, parte, inicio, sequencia) VALUES (?, ?, ?, ?, ?)',
+                    (carrinho_id, operator, part, start_time, sequencia_etapa)
+                )
 
-        conn.commit()
-        conn.close()
+            bump_version(conn, ['carrinhos', 'carrinho_etapas'], model)
+            publish_event(conn, 'process.started', model, {
+                'carrinho_id': carrinho_id,
+                'model': model,
+                'operator': operator,
+                'part': part,
+                'start_time': start_time,
+                'sequencia_etapa': sequencia_etapa
+            })
 
-        return jsonify({
-            'message': 'Processo iniciado com sucesso',
-            'start_time': start_time,
-            'carrinho_id': carrinho_id,
-            'sequencia_etapa': sequencia_etapa
-        }), 201
+            return {
+                'message': 'Processo iniciado com sucesso',
+                'start_time': start_time,
+                'carrinho_id': carrinho_id,
+                'sequencia_etapa': sequencia_etapa
+            }, 201
+
+        body, status = write_queue.submit(escrever)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -456,63 +1967,87 @@ def end_process():
         carrinho_id = data.get('carrinho_id')
         end_time = datetime.now(timezone.utc).isoformat()
 
-        conn = get_db_connection()
-        
-        # Buscar etapa ativa
-        etapa = conn.execute(
-            'SELECT * FROM carrinho_etapas WHERE carrinho_id = ? AND operador = ? AND fim IS NULL',
-            (carrinho_id, operator)
-        ).fetchone()
-
-        if not etapa:
-            return jsonify({'error': 'Nenhum processo ativo encontrado'}), 404
+        def escrever(conn):
+            # Buscar etapa ativa
+            etapa = conn.execute(
+                'SELECT * FROM carrinho_etapas WHERE carrinho_id = ? AND operador = ? AND fim IS NULL',
+                (carrinho_id, operator)
+            ).fetchone()
 
-        # Calcular duração
-        start_time = datetime.fromisoformat(etapa['inicio'])
-        end_time_dt = datetime.fromisoformat(end_time)
-        duration = (end_time_dt - start_time).total_seconds()
+            if not etapa:
+                return {'error': 'Nenhum processo ativo encontrado'}, 404
 
-        # Finalizar etapa
-        conn.execute(
-            'UPDATE carrinho_etapas SET fim = ?, duracao = ? WHERE id = ?',
-            (end_time, duration, etapa['id'])
-        )
-
-        # Registrar no process_times
-        conn.execute(
-            'INSERT INTO process_times (model, operator, part, start_time, end_time, duration, carrinho_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
-            (model, operator, part, etapa['inicio'], end_time, duration, carrinho_id)
-        )
+            # Calcular duração
+            start_time = datetime.fromisoformat(etapa['inicio'])
+            end_time_dt = datetime.fromisoformat(end_time)
+            duration = (end_time_dt - start_time).total_seconds()
 
-        # Atualizar operador atual do carrinho
-        if operator != 'A6':
-            proximo_operador = get_next_operator(operator)
+            # Finalizar etapa
             conn.execute(
-                'UPDATE carrinhos SET operador_atual = ? WHERE id = ?',
-                (proximo_operador, carrinho_id)
+                'UPDATE carrinho_etapas SET fim = ?, duracao = ? WHERE id = ?',
+                (end_time, duration, etapa['id'])
             )
-        else:
-            # Finalizar carrinho
+
+            # Registrar no process_times
             conn.execute(
-                'UPDATE carrinhos SET estado = "finalizado", data_finalizacao = ? WHERE id = ?',
-                (end_time, carrinho_id)
+                'INSERT INTO process_times (model, operator, part, start_time, end_time, duration, carrinho_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (model, operator, part, etapa['inicio'], end_time, duration, carrinho_id)
             )
+            update_station_stats(conn, model, operator, part, duration)
+            update_throughput(conn, model, operator, end_time, duration)
+
+            bump_version(conn, ['carrinhos', 'carrinho_etapas', 'process_times'], model)
+            publish_event(conn, 'process.ended', model, {
+                'carrinho_id': carrinho_id,
+                'model': model,
+                'operator': operator,
+                'part': part,
+                'start_time': etapa['inicio'],
+                'end_time': end_time,
+                'duration': duration
+            })
 
-        conn.commit()
-        conn.close()
+            # Atualizar operador atual do carrinho
+            if operator != 'A6':
+                proximo_operador = get_next_operator(operator)
+                conn.execute(
+                    'UPDATE carrinhos SET operador_atual = ? WHERE id = ?',
+                    (proximo_operador, carrinho_id)
+                )
+                publish_event(conn, 'cart.advanced', model, {
+                    'carrinho_id': carrinho_id,
+                    'model': model,
+                    'operador_anterior': operator,
+                    'operador_atual': proximo_operador
+                })
+            else:
+                # Finalizar carrinho
+                conn.execute(
+                    'UPDATE carrinhos SET estado = "finalizado", data_finalizacao = ? WHERE id = ?',
+                    (end_time, carrinho_id)
+                )
+                publish_event(conn, 'cart.finished', model, {
+                    'carrinho_id': carrinho_id,
+                    'model': model,
+                    'data_finalizacao': end_time
+                })
 
-        return jsonify({
-            'message': 'Processo finalizado com sucesso',
-            'duration': duration,
-            'carrinho_id': carrinho_id,
-            'proximo_operador': get_next_operator(operator) if operator != 'A6' else None
-        }), 200
+            return {
+                'message': 'Processo finalizado com sucesso',
+                'duration': duration,
+                'carrinho_id': carrinho_id,
+                'proximo_operador': get_next_operator(operator) if operator != 'A6' else None
+            }, 200
+
+        body, status = write_queue.submit(escrever)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Endpoints de Monitoramento
 @app.route('/process/status', methods=['GET'])
+@versioned(['carrinhos', 'carrinho_etapas'], cache=True)
 def get_process_status():
     try:
         model = request.args.get('model')
@@ -520,10 +2055,11 @@ def get_process_status():
 
         # Buscar etapas ativas
         if model:
+            # CROSS JOIN fixa a ordem: parte das poucas etapas abertas, não de todos os carrinhos do modelo
             etapas_ativas = conn.execute(
                 '''SELECT ce.*, c.modelo, c.sequencia
                    FROM carrinho_etapas ce
-                   JOIN carrinhos c ON ce.carrinho_id = c.id
+                   CROSS JOIN carrinhos c ON ce.carrinho_id = c.id
                    WHERE c.modelo = ? AND ce.fim IS NULL
                    ORDER BY c.sequencia''',
                 (model,)
@@ -555,72 +2091,178 @@ def get_process_status():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/process/times', methods=['GET'])
+@versioned(['carrinhos', 'process_times'], cache=True)
 def get_process_times():
+    """Tempos de processo.
+
+    Sem parâmetros de paginação devolve a lista completa, como sempre. Com
+    after_id/limit/since/until devolve uma página em ordem de id:
+    {'items': [...], 'next_after_id': n, 'has_more': bool, 'max_id': n,
+    'generation': n}. generation muda a cada /reset ou restauração de
+    snapshot: o cliente que a vê mudar descarta o que já tinha.
+    since/until filtram por end_time e fields= limita as colunas. Com
+    since/until a ordem passa a ser (end_time, id), pelo índice de end_time,
+    e a página seguinte é pedida com after_end=next_after_end e
+    after_id=next_after_id.
+    """
     try:
         model = request.args.get('model')
+        try:
+            after_id = request.args.get('after_id')
+            after_id = int(after_id) if after_id is not None else None
+            limit = request.args.get('limit')
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            return jsonify({'error': 'Parâmetros de paginação inválidos'}), 400
+        since = request.args.get('since')
+        until = request.args.get('until')
+        after_end = request.args.get('after_end')
+        fields = request.args.get('fields')
+
+        if fields:
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+            invalidos = [field for field in fields if field not in PROCESS_TIMES_FIELDS]
+            if invalidos:
+                return jsonify({'error': f'Campos inválidos: {", ".join(invalidos)}'}), 400
+        else:
+            fields = PROCESS_TIMES_FIELDS
+
+        try:
+            since = parse_timestamp(since) if since else None
+            until = parse_timestamp(until) if until else None
+        except ValueError:
+            return jsonify({'error': 'Data inválida, use ISO 8601'}), 400
+
+        paginated = any(request.args.get(arg) is not None
+                        for arg in ('after_id', 'after_end', 'limit', 'since', 'until'))
+        por_fim = bool(since or until)
+        # Na ordem por end_time o cursor tem as duas chaves
+        if (after_end is not None and not por_fim) or (por_fim and after_id is not None and after_end is None):
+            return jsonify({'error': 'Com since/until use after_end e after_id juntos; sem eles, só after_id'}), 400
         conn = get_db_connection()
 
+        # Tempos de carrinhos arquivados também entram, intercalados na mesma ordem
+        if not paginated:
+            if model:
+                times = merged_history(conn, '''
+                    SELECT pt.*, c.sequencia
+                    FROM DB.process_times pt
+                    JOIN DB.carrinhos c ON pt.carrinho_id = c.id
+                    WHERE pt.model = ?
+                    ORDER BY c.sequencia, pt.operator
+                ''', (model,), key=lambda row: (row['sequencia'], row['operator']))
+            else:
+                times = merged_history(conn, '''
+                    SELECT pt.*, c.sequencia
+                    FROM DB.process_times pt
+                    JOIN DB.carrinhos c ON pt.carrinho_id = c.id
+                    ORDER BY pt.model, c.sequencia, pt.operator
+                ''', (), key=lambda row: (row['model'], row['sequencia'], row['operator']))
+            times = list(times)
+
+            conn.close()
+            return jsonify([{field: time[field] for field in fields} for time in times])
+
+        if limit is None:
+            limit = PROCESS_TIMES_PAGE_SIZE
+        if limit < 1 or (after_id is not None and after_id < 0):
+            conn.close()
+            return jsonify({'error': 'Parâmetros de paginação inválidos'}), 400
+        limit = min(limit, PROCESS_TIMES_MAX_PAGE_SIZE)
+
+        # Transação de leitura: página, max_id e geração do mesmo estado
+        conn.execute('BEGIN')
+        generation = conn.execute(
+            "SELECT versao FROM versoes WHERE tabela = 'reset' AND model = '*'").fetchone()
+        generation = generation[0] if generation else 0
+
+        # Paginação por chave: continua do último item recebido, sem OFFSET
+        conditions = []
+        params = []
+        if por_fim and after_end is not None:
+            conditions.append('(pt.end_time, pt.id) > (?, ?)')
+            params += [after_end, after_id or 0]
+        elif after_id is not None:
+            conditions.append('pt.id > ?')
+            params.append(after_id)
         if model:
-            times = conn.execute('''
-                SELECT pt.*, c.sequencia
-                FROM process_times pt
-                JOIN carrinhos c ON pt.carrinho_id = c.id
-                WHERE pt.model = ?
-                ORDER BY c.sequencia, pt.operator
-            ''', (model,)).fetchall()
+            conditions.append('pt.model = ?')
+            params.append(model)
+        if since:
+            conditions.append('pt.end_time >= ?')
+            params.append(since)
+        if until:
+            conditions.append('pt.end_time < ?')
+            params.append(until)
+
+        if por_fim:
+            ordem, chave = 'pt.end_time, pt.id', lambda row: (row['end_time'], row['id'])
         else:
-            times = conn.execute('''
-                SELECT pt.*, c.sequencia
-                FROM process_times pt
-                JOIN carrinhos c ON pt.carrinho_id = c.id
-                ORDER BY pt.model, c.sequencia, pt.operator
-            ''').fetchall()
-
-        times_list = [
-            {
-                'id': time['id'],
-                'model': time['model'],
-                'operator': time['operator'],
-                'part': time['part'],
-                'start_time': time['start_time'],
-                'end_time': time['end_time'],
-                'duration': time['duration'],
-                'carrinho_id': time['carrinho_id'],
-                'sequencia': time['sequencia']
-            }
-            for time in times
-        ]
-
+            ordem, chave = 'pt.id', lambda row: row['id']
+        times = list(itertools.islice(merged_history(conn, f'''
+            SELECT pt.*, c.sequencia
+            FROM DB.process_times pt
+            JOIN DB.carrinhos c ON pt.carrinho_id = c.id
+            WHERE {' AND '.join(conditions) or '1'}
+            ORDER BY {ordem}
+            LIMIT ?
+        ''', params + [limit + 1], key=chave), limit + 1))
+        max_id = conn.execute('''
+            SELECT MAX(id) FROM (
+                SELECT MAX(id) AS id FROM main.process_times
+                UNION ALL
+                SELECT MAX(id) FROM arquivo.process_times
+            )
+        ''').fetchone()[0] or 0
         conn.close()
-        return jsonify(times_list)
+
+        has_more = len(times) > limit
+        times = times[:limit]
+
+        page = {
+            'items': [{field: time[field] for field in fields} for time in times],
+            'next_after_id': times[-1]['id'] if times else (after_id or 0),
+            'has_more': has_more,
+            'max_id': max_id,
+            'generation': generation
+        }
+        if por_fim:
+            page['next_after_end'] = times[-1]['end_time'] if times else after_end
+        return jsonify(page)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/carrinhos', methods=['GET'])
+@versioned(['carrinhos', 'carrinho_etapas'], model_arg='modelo', cache=True)
 def get_carrinhos():
     try:
         modelo = request.args.get('modelo')
         conn = get_db_connection()
         
+        # Tempo total de cada carrinho somado na mesma consulta; os carrinhos
+        # arquivados entram intercalados na mesma ordem
         if modelo:
-            carrinhos = conn.execute(
-                'SELECT * FROM carrinhos WHERE modelo = ? ORDER BY sequencia',
-                (modelo,)
-            ).fetchall()
+            carrinhos = merged_history(conn,
+                '''SELECT c.*, COALESCE(SUM(ce.duracao), 0) as tempo_total
+                   FROM DB.carrinhos c
+                   LEFT JOIN DB.carrinho_etapas ce ON ce.carrinho_id = c.id
+                   WHERE c.modelo = ?
+                   GROUP BY c.id
+                   ORDER BY c.sequencia''',
+                (modelo,), key=lambda row: row['sequencia']
+            )
         else:
-            carrinhos = conn.execute(
-                'SELECT * FROM carrinhos ORDER BY modelo, sequencia'
-            ).fetchall()
-            
-        carrinhos_list = []
-        for carrinho in carrinhos:
-            # Calcular tempo total
-            tempo_total = conn.execute(
-                'SELECT SUM(duracao) as total FROM carrinho_etapas WHERE carrinho_id = ?',
-                (carrinho['id'],)
-            ).fetchone()
+            carrinhos = merged_history(conn,
+                '''SELECT c.*, COALESCE(SUM(ce.duracao), 0) as tempo_total
+                   FROM DB.carrinhos c
+                   LEFT JOIN DB.carrinho_etapas ce ON ce.carrinho_id = c.id
+                   GROUP BY c.id
+                   ORDER BY c.modelo, c.sequencia''',
+                (), key=lambda row: (row['modelo'], row['sequencia'])
+            )
             
-            carrinhos_list.append({
+        carrinhos_list = [
+            {
                 'id': carrinho['id'],
                 'modelo': carrinho['modelo'],
                 'estado': carrinho['estado'],
@@ -628,8 +2270,10 @@ def get_carrinhos():
                 'data_finalizacao': carrinho['data_finalizacao'],
                 'operador_atual': carrinho['operador_atual'],
                 'sequencia': carrinho['sequencia'],
-                'tempo_total': tempo_total['total'] or 0
-            })
+                'tempo_total': carrinho['tempo_total']
+            }
+            for carrinho in carrinhos
+        ]
             
         conn.close()
         return jsonify(carrinhos_list)
@@ -638,46 +2282,43 @@ def get_carrinhos():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/carrinhos/ativos', methods=['GET'])
+@versioned(['carrinhos', 'carrinho_etapas'], cache=True)
 def get_carrinhos_ativos():
     try:
         model = request.args.get('model')
         conn = get_db_connection()
         
-        if model:
-            carrinhos = conn.execute(
-                '''SELECT c.*, 
-                          (SELECT operador FROM carrinho_etapas WHERE carrinho_id = c.id AND fim IS NULL) as operador_ativo
-                   FROM carrinhos c 
-                   WHERE c.modelo = ? AND c.estado = 'em_producao'
-                   ORDER BY c.sequencia''',
-                (model,)
-            ).fetchall()
-        else:
-            carrinhos = conn.execute(
-                '''SELECT c.*, 
-                          (SELECT operador FROM carrinho_etapas WHERE carrinho_id = c.id AND fim IS NULL) as operador_ativo
-                   FROM carrinhos c 
-                   WHERE c.estado = 'em_producao'
-                   ORDER BY c.modelo, c.sequencia'''
-            ).fetchall()
-            
-        carrinhos_list = []
-        for carrinho in carrinhos:
-            # Contar etapas concluídas
-            etapas_concluidas = conn.execute(
-                'SELECT COUNT(*) as count FROM carrinho_etapas WHERE carrinho_id = ? AND fim IS NOT NULL',
-                (carrinho['id'],)
-            ).fetchone()
+        # Etapa ativa e etapas concluídas de cada carrinho saem de uma única
+        # agregação das etapas. MATERIALIZED separa antes os carrinhos em
+        # produção: sem isso o SQLite percorre todos os carrinhos na ordem
+        # do GROUP BY
+        filtro, params = ('modelo = ? AND ', (model,)) if model else ('', ())
+        carrinhos = conn.execute(
+            f'''WITH ativos AS MATERIALIZED (
+                   SELECT * FROM carrinhos WHERE {filtro}estado = 'em_producao'
+               )
+               SELECT ativos.*,
+                      MAX(CASE WHEN ce.fim IS NULL THEN ce.operador END) as operador_ativo,
+                      COUNT(ce.fim) as etapas_concluidas
+               FROM ativos
+               LEFT JOIN carrinho_etapas ce ON ce.carrinho_id = ativos.id
+               GROUP BY ativos.id
+               ORDER BY ativos.modelo, ativos.sequencia''',
+            params
+        ).fetchall()
             
-            carrinhos_list.append({
+        carrinhos_list = [
+            {
                 'id': carrinho['id'],
                 'modelo': carrinho['modelo'],
                 'estado': carrinho['estado'],
                 'sequencia': carrinho['sequencia'],
                 'operador_atual': carrinho['operador_atual'],
                 'operador_ativo': carrinho['operador_ativo'],
-                'etapas_concluidas': etapas_concluidas['count']
-            })
+                'etapas_concluidas': carrinho['etapas_concluidas']
+            }
+            for carrinho in carrinhos
+        ]
             
         conn.close()
         return jsonify(carrinhos_list)
@@ -685,9 +2326,412 @@ def get_carrinhos_ativos():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/stats/stations', methods=['GET'])
+@versioned(['process_times'])
+def get_station_stats():
+    """Média, desvio padrão, mínimo, máximo, p50 e p95 da duração por modelo/operador/peça.
+
+    Lê só a tabela station_stats (uma linha por posto), sem percorrer
+    process_times. Filtros opcionais: ?model= e ?operator=.
+    """
+    try:
+        model = request.args.get('model')
+        operator = request.args.get('operator')
+
+        conditions = []
+        params = []
+        if model:
+            conditions.append('model = ?')
+            params.append(model)
+        if operator:
+            conditions.append('operator = ?')
+            params.append(operator)
+
+        conn = get_db_connection()
+        rows = conn.execute(f'''
+            SELECT * FROM station_stats
+            WHERE {' AND '.join(conditions) or '1'}
+            ORDER BY model, operator, part
+        ''', params).fetchall()
+        conn.close()
+
+        return jsonify([format_station_stats(row) for row in rows])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def throughput_window():
+    """Balde atual quando o /stats/throughput usa a janela padrão (sem ?until=)"""
+    granularidade = request.args.get('granularity', 'minute')
+    if request.args.get('until') or granularidade not in THROUGHPUT_GRANULARITIES:
+        return None
+    return throughput_bucket(datetime.now(timezone.utc).isoformat(), granularidade)
+
+@app.route('/stats/throughput', methods=['GET'])
+@versioned(['process_times'], window=throughput_window)
+def get_throughput():
+    """Série de etapas concluídas e carrinhos finalizados por posto.
+
+    ?granularity=minute|hour (padrão minute), ?model=, ?operator= e a janela
+    ?since=/?until= (padrão: os últimos THROUGHPUT_DEFAULT_BUCKETS baldes).
+    Baldes sem nenhuma etapa concluída não aparecem na lista.
+    """
+    try:
+        granularidade = request.args.get('granularity', 'minute')
+        if granularidade not in THROUGHPUT_GRANULARITIES:
+            return jsonify({'error': f'Granularidade inválida, use {" ou ".join(THROUGHPUT_GRANULARITIES)}'}), 400
+        model = request.args.get('model')
+        operator = request.args.get('operator')
+
+        try:
+            until = request.args.get('until') or datetime.now(timezone.utc).isoformat()
+            until = throughput_bucket(until, granularidade)
+            since = request.args.get('since')
+            if since:
+                since = throughput_bucket(since, granularidade)
+            else:
+                tamanho = THROUGHPUT_GRANULARITIES[granularidade]
+                since = (datetime.fromisoformat(until)
+                         - timedelta(seconds=tamanho * (THROUGHPUT_DEFAULT_BUCKETS - 1))).isoformat()
+        except ValueError:
+            return jsonify({'error': 'Data inválida, use ISO 8601'}), 400
+
+        # until é inclusivo: o balde em andamento entra na série
+        conditions = ['granularidade = ?', 'bucket >= ?', 'bucket <= ?']
+        params = [granularidade, since, until]
+        if model:
+            conditions.append('model = ?')
+            params.append(model)
+        if operator:
+            conditions.append('operator = ?')
+            params.append(operator)
+
+        conn = get_db_connection()
+        rows = conn.execute(f'''
+            SELECT bucket, model, operator, etapas, carrinhos, duracao_total
+            FROM throughput
+            WHERE {' AND '.join(conditions)}
+            ORDER BY bucket, model, operator
+        ''', params).fetchall()
+        conn.close()
+
+        return jsonify({
+            'granularity': granularidade,
+            'since': since,
+            'until': until,
+            'buckets': [{
+                'bucket': row['bucket'],
+                'model': row['model'],
+                'operator': row['operator'],
+                'etapas': row['etapas'],
+                'carrinhos': row['carrinhos'],
+                'duracao_media': row['duracao_total'] / row['etapas']
+            } for row in rows]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def analysis_window():
+    """Fim da janela padrão do /analysis/bottleneck (sem ?until=): o próximo minuto cheio"""
+    if request.args.get('until'):
+        return None
+    segundos = datetime.now(timezone.utc).timestamp()
+    fim = (segundos // ANALYSIS_WINDOW_STEP + 1) * ANALYSIS_WINDOW_STEP
+    return datetime.fromtimestamp(fim, timezone.utc).isoformat()
+
+@app.route('/analysis/bottleneck', methods=['GET'])
+@versioned(['process_times', 'carrinho_etapas'], window=analysis_window)
+def get_bottleneck_analysis():
+    """Utilização, média e variância do ciclo por posto, espera entre postos e a restrição da linha.
+
+    ?model= (obrigatório) e a janela ?since=/?until= sobre o fim das etapas
+    (padrão: as ANALYSIS_DEFAULT_HOURS horas até o próximo minuto cheio). O
+    resultado fica em cache até a próxima escrita nas tabelas de produção ou
+    até a janela padrão andar.
+    """
+    if np is None:
+        return jsonify({'error': 'Análise indisponível: NumPy não está instalado'}), 503
+
+    try:
+        model = request.args.get('model')
+        if model not in VALID_MODELS:
+            return jsonify({'error': 'Modelo inválido'}), 400
+
+        try:
+            until = request.args.get('until')
+            until = parse_timestamp(until) if until else analysis_window()
+            since = request.args.get('since')
+            since = parse_timestamp(since) if since else (
+                datetime.fromisoformat(until) - timedelta(hours=ANALYSIS_DEFAULT_HOURS)).isoformat()
+        except ValueError:
+            return jsonify({'error': 'Data inválida, use ISO 8601'}), 400
+
+        # A chave tem a janela já resolvida e a versão dos dados (o ETag que o
+        # versioned já calculou): qualquer escrita, ou a janela padrão
+        # andando, invalida o cache
+        chave = (model, since, until, g.etag)
+        with analysis_cache_lock:
+            resultado = analysis_cache.get(chave)
+        if resultado is not None:
+            return jsonify(resultado)
+
+        conn = get_db_connection()
+        processos = load_columns(conn, '''
+            SELECT CAST(substr(operator, 2) AS INTEGER), duration, julianday(start_time), julianday(end_time)
+            FROM DB.process_times
+            WHERE model = ? AND end_time >= ? AND end_time < ?
+        ''', (model, since, until), 4)
+        etapas = load_columns(conn, '''
+            SELECT ce.carrinho_id, ce.sequencia, CAST(substr(ce.operador, 2) AS INTEGER),
+                   julianday(ce.inicio), julianday(ce.fim)
+            FROM DB.carrinho_etapas ce CROSS JOIN DB.carrinhos c
+            WHERE ce.carrinho_id = c.id AND c.modelo = ? AND ce.inicio >= ? AND ce.inicio < ?
+        ''', (model, since, until), 5)
+        conn.close()
+
+        resultado = {'model': model, 'since': since, 'until': until}
+        resultado.update(analyze_bottleneck(processos, etapas))
+
+        with analysis_cache_lock:
+            if len(analysis_cache) >= ANALYSIS_CACHE_SIZE:
+                analysis_cache.pop(next(iter(analysis_cache)))
+            analysis_cache[chave] = resultado
+        return jsonify(resultado)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/station/<model>/<operator>/snapshot', methods=['GET'])
+@versioned(['alerts', 'carrinhos', 'carrinho_etapas'])
+def get_station_snapshot(model, operator):
+    """Tudo que o tablet de uma estação precisa, lido numa única transação"""
+    try:
+        if model not in VALID_MODELS:
+            return jsonify({'error': 'Modelo inválido'}), 400
+        if operator not in VALID_OPERATORS:
+            return jsonify({'error': 'Operador inválido'}), 400
+
+        conn = get_db_connection()
+        # Transação de leitura: as três consultas enxergam o mesmo estado
+        conn.execute('BEGIN')
+
+        if operator == 'A1':
+            carrinhos_disponiveis = [{'tipo': 'novo'}]
+        else:
+            carrinhos_prontos = conn.execute('''
+                SELECT c.id, c.modelo, c.sequencia
+                FROM carrinhos c
+                WHERE c.modelo = ? AND c.estado = 'em_producao'
+                AND c.operador_atual = ?
+                AND NOT EXISTS (
+                    SELECT 1 FROM carrinho_etapas 
+                    WHERE carrinho_id = c.id AND operador = ? AND fim IS NULL
+                )
+            ''', (model, operator, operator)).fetchall()
+            carrinhos_disponiveis = [
+                {
+                    'id': carrinho['id'],
+                    'modelo': carrinho['modelo'],
+                    'sequencia': carrinho['sequencia']
+                }
+                for carrinho in carrinhos_prontos
+            ]
+
+        alerts = conn.execute(
+            'SELECT * FROM alerts WHERE model = ? AND operator = ? ORDER BY started_at DESC',
+            (model, operator)
+        ).fetchall()
+
+        # CROSS JOIN fixa a ordem: parte das poucas etapas abertas, não dos carrinhos
+        etapas_ativas = conn.execute(
+            '''SELECT ce.*, c.modelo, c.sequencia
+               FROM carrinho_etapas ce
+               CROSS JOIN carrinhos c ON ce.carrinho_id = c.id
+               WHERE ce.operador = ? AND ce.fim IS NULL AND c.modelo = ?
+               ORDER BY c.sequencia''',
+            (operator, model)
+        ).fetchall()
+
+        conn.commit()
+        conn.close()
+
+        return jsonify({
+            'model': model,
+            'operator': operator,
+            'carrinhos_disponiveis': carrinhos_disponiveis,
+            'quantidade': len(carrinhos_disponiveis),
+            'pode_criar': operator == 'A1',
+            'alerts': [
+                {
+                    'id': alert['id'],
+                    'model': alert['model'],
+                    'operator': alert['operator'],
+                    'part': alert['part'],
+                    'started_at': alert['started_at']
+                }
+                for alert in alerts
+            ],
+            'processos_ativos': [
+                {
+                    'carrinho_id': etapa['carrinho_id'],
+                    'model': etapa['modelo'],
+                    'operator': etapa['operador'],
+                    'part': etapa['parte'],
+                    'is_active': True,
+                    'start_time': etapa['inicio'],
+                    'sequencia': etapa['sequencia']
+                }
+                for etapa in etapas_ativas
+            ]
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export/process_times', methods=['GET'])
+def export_process_times():
+    """Exporta os tempos de processo em NDJSON (padrão) ou CSV (?format=csv).
+
+    Filtros: ?model=, ?since= e ?until= (end_time). A ordem é a do índice
+    usado, para o SQLite não precisar ordenar o resultado inteiro antes de
+    enviar a primeira linha: por id, ou por end_time quando há filtro de data.
+    """
+    try:
+        model = request.args.get('model')
+        since, until = export_time_filters()
+    except ValueError:
+        return jsonify({'error': 'Data inválida, use ISO 8601'}), 400
+
+    conditions = []
+    params = []
+    if model:
+        conditions.append('pt.model = ?')
+        params.append(model)
+    if since:
+        conditions.append('pt.end_time >= ?')
+        params.append(since)
+    if until:
+        conditions.append('pt.end_time < ?')
+        params.append(until)
+    if since or until:
+        order, order_columns = 'pt.end_time, pt.id', ['end_time', 'id']
+    else:
+        order, order_columns = 'pt.id', ['id']
+
+    columns = PROCESS_TIMES_FIELDS
+    sql = f'''
+        SELECT pt.id, pt.model, pt.operator, pt.part, pt.start_time, pt.end_time,
+               pt.duration, pt.carrinho_id, c.sequencia
+        FROM DB.process_times pt
+        LEFT JOIN DB.carrinhos c ON pt.carrinho_id = c.id
+        WHERE {' AND '.join(conditions) or '1'}
+        ORDER BY {order}
+    '''
+    return export_response('process_times', sql, params, columns, order_columns)
+
+@app.route('/export/carrinho_etapas', methods=['GET'])
+def export_carrinho_etapas():
+    """Exporta as etapas dos carrinhos em NDJSON (padrão) ou CSV (?format=csv).
+
+    Filtros: ?model=, ?since= e ?until= (início da etapa). Sem filtro de data
+    a ordem é por carrinho e etapa; com filtro, por início da etapa.
+    """
+    try:
+        model = request.args.get('model')
+        since, until = export_time_filters()
+    except ValueError:
+        return jsonify({'error': 'Data inválida, use ISO 8601'}), 400
+
+    conditions = ['ce.carrinho_id = c.id']
+    params = []
+    if model:
+        conditions.append('c.modelo = ?')
+        params.append(model)
+    if since:
+        conditions.append('ce.inicio >= ?')
+        params.append(since)
+    if until:
+        conditions.append('ce.inicio < ?')
+        params.append(until)
+
+    if since or until:
+        tables = 'DB.carrinho_etapas ce CROSS JOIN DB.carrinhos c'
+        order, order_columns = 'ce.inicio, ce.id', ['inicio', 'id']
+    elif model:
+        tables = 'DB.carrinhos c CROSS JOIN DB.carrinho_etapas ce'
+        order, order_columns = 'c.sequencia, c.id, ce.sequencia', ['carrinho_sequencia', 'carrinho_id', 'sequencia']
+    else:
+        tables = 'DB.carrinho_etapas ce CROSS JOIN DB.carrinhos c'
+        order, order_columns = 'ce.id', ['id']
+
+    columns = ['id', 'carrinho_id', 'modelo', 'carrinho_sequencia', 'operador', 'parte',
+               'inicio', 'fim', 'duracao', 'status', 'sequencia']
+    sql = f'''
+        SELECT ce.id, ce.carrinho_id, c.modelo, c.sequencia, ce.operador, ce.parte,
+               ce.inicio, ce.fim, ce.duracao, ce.status, ce.sequencia
+        FROM {tables}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {order}
+    '''
+    return export_response('carrinho_etapas', sql, params, columns, order_columns)
+
+@app.route('/stream', methods=['GET'])
+def stream_events():
+    """Eventos de alertas, processos e carrinhos via Server-Sent Events.
+
+    Filtros: ?model=313&topics=alert,process,cart. Reconexões retomam a partir
+    do cabeçalho Last-Event-ID (ou ?last_event_id=) enviado pelo EventSource.
+    """
+    try:
+        model = request.args.get('model')
+        topics = {t.strip() for t in request.args.get('topics', '').split(',') if t.strip()}
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+        if last_event_id:
+            after_id = int(last_event_id)
+        else:
+            # Cliente novo recebe apenas o que acontecer daqui em diante
+            conn = get_db_connection()
+            after_id = conn.execute('SELECT MAX(id) FROM eventos').fetchone()[0] or 0
+            conn.close()
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID inválido'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    def generate(after_id):
+        yield f'retry: 3000\nid: {after_id}\n\n'
+        inicio = time.monotonic()
+        ultimo_envio = inicio
+
+        while time.monotonic() - inicio < STREAM_MAX_SECONDS:
+            eventos, after_id = fetch_events(after_id, model, topics)
+            for evento in eventos:
+                yield format_sse(evento)
+            if eventos:
+                ultimo_envio = time.monotonic()
+                continue
+
+            if time.monotonic() - ultimo_envio >= STREAM_KEEPALIVE_SECONDS:
+                yield ': keepalive\n\n'
+                ultimo_envio = time.monotonic()
+
+            # Escritas deste processo acordam o stream na hora; as de outros
+            # workers aparecem na próxima consulta
+            with stream_condition:
+                stream_condition.wait(STREAM_POLL_SECONDS)
+
+    return Response(
+        stream_with_context(generate(after_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'})
+    return jsonify({'status': 'healthy', 'response_cache': response_cache.stats()})
 
 if __name__ == '__main__':
     init_db()
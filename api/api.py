@@ -3,11 +3,12 @@
 
 
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, has_app_context
 from flask_cors import CORS
 import sqlite3
 from datetime import datetime, timezone
 import os
+import threading
 
 app = Flask(__name__)
 CORS(app)
@@ -16,6 +17,13 @@ DATABASE = 'alerts.db'
 VALID_OPERATORS = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6']
 VALID_MODELS = ['313', '314']
 
+# Ajustes do SQLite, lidos uma vez na inicialização
+SQLITE_POOL_SIZE = int(os.environ.get('MDC_SQLITE_POOL_SIZE', 8))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('MDC_SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('MDC_SQLITE_CACHE_KB', 16384))
+SQLITE_MMAP_SIZE = int(os.environ.get('MDC_SQLITE_MMAP_BYTES', 64 * 1024 * 1024))
+SQLITE_STATEMENT_CACHE = int(os.environ.get('MDC_SQLITE_STATEMENT_CACHE', 256))
+
 def init_db():
     with sqlite3.connect(DATABASE) as conn:
         conn.execute('''
@@ -91,14 +99,116 @@ def init_db():
                 FOREIGN KEY (carrinho_id) REFERENCES carrinhos(id)
             )
         ''')
+
+        # Índices das consultas das rotas
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_alerts_model ON alerts (model, started_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_process_times_latest ON process_times (model, operator, end_time)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_carrinhos_modelo ON carrinhos (modelo, data_criacao)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_etapas_carrinho ON carrinho_etapas (carrinho_id, inicio)')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_etapas_abertas
+            ON carrinho_etapas (carrinho_id)
+            WHERE fim IS NULL
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_retrabalhos_carrinho ON retrabalhos (carrinho_id, status)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_retrabalhos_status ON retrabalhos (status, data_solicitacao)')
         
         conn.commit()
 
+# Pool de conexões SQLite
+class PooledConnection(sqlite3.Connection):
+    """Conexão do pool: close() devolve a conexão ao pool em vez de fechá-la"""
+
+    pool = None
+    emprestimo = None  # número do empréstimo atual; None quando está no pool
+
+    def close(self):
+        if self.emprestimo is None:
+            return
+        self.emprestimo = None
+        if self.in_transaction:
+            self.rollback()
+        self.pool.release(self)
+
+    def fechar_definitivamente(self):
+        sqlite3.Connection.close(self)
+
+class ConnectionPool:
+    """Mantém conexões abertas e configuradas, reaproveitadas entre requisições"""
+
+    def __init__(self, database, max_size):
+        self.database = database
+        self.max_size = max_size
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.idle = []
+        self.emprestimos = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE,
+            factory=PooledConnection
+        )
+        conn.pool = self
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn)
+        return conn
+
+    def acquire(self):
+        with self.lock:
+            # Workers criados por fork não podem herdar conexões do processo pai
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.idle = []
+            conn = self.idle.pop() if self.idle else None
+            self.emprestimos += 1
+            emprestimo = self.emprestimos
+        if conn is None:
+            conn = self._connect()
+        conn.emprestimo = emprestimo
+        return conn
+
+    def release(self, conn):
+        with self.lock:
+            if self.pid == os.getpid() and len(self.idle) < self.max_size:
+                self.idle.append(conn)
+                return
+        conn.fechar_definitivamente()
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.fechar_definitivamente()
+
+def configure_connection(conn):
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)}')
+    conn.execute(f'PRAGMA cache_size = -{int(SQLITE_CACHE_SIZE_KB)}')
+    conn.execute(f'PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+db_pool = ConnectionPool(DATABASE, SQLITE_POOL_SIZE)
+
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.acquire()
+    # Garante a devolução ao pool mesmo em rotas que retornam sem fechar
+    if has_app_context():
+        g.setdefault('db_connections', []).append((conn, conn.emprestimo))
     return conn
 
+@app.teardown_appcontext
+def release_db_connections(exc):
+    # Só devolve o que a requisição ainda tem: depois do close() da rota o
+    # pool pode ter emprestado a mesma conexão a outro thread
+    for conn, emprestimo in g.pop('db_connections', []):
+        if conn.emprestimo == emprestimo:
+            conn.close()
+
 def validate_alert_data(data):
     if not data or 'model' not in data or 'operator' not in data or 'part' not in data:
         return False, "Dados incompletos."
@@ -396,18 +506,21 @@ def get_process_times():
         conn = get_db_connection()
 
         if model:
-            times = conn.execute('''
+            # Parte da lista de postos: o último tempo de cada um é uma busca
+            # no índice, sem percorrer o histórico inteiro do modelo
+            operadores = ', '.join('(?)' for _ in VALID_OPERATORS)
+            times = conn.execute(f'''
+                WITH operadores (operator) AS (VALUES {operadores})
                 SELECT pt.*
-                FROM process_times pt
-                INNER JOIN (
-                    SELECT operator, MAX(end_time) as max_end_time
-                    FROM process_times
-                    WHERE model = ? AND end_time IS NOT NULL
-                    GROUP BY operator
-                ) latest ON pt.operator = latest.operator AND pt.end_time = latest.max_end_time
-                WHERE pt.model = ?
+                FROM operadores
+                CROSS JOIN process_times pt
+                WHERE pt.model = ? AND pt.operator = operadores.operator
+                  AND pt.end_time = (
+                      SELECT MAX(end_time) FROM process_times
+                      WHERE model = ? AND operator = operadores.operator
+                  )
                 ORDER BY pt.operator
-            ''', (model, model)).fetchall()
+            ''', (*VALID_OPERATORS, model, model)).fetchall()
         else:
             times = conn.execute('''
                 SELECT pt.*
@@ -514,50 +627,55 @@ def listar_carrinhos():
         modelo = request.args.get('modelo')
         conn = get_db_connection()
         
+        # Etapa atual (a última registrada) e tempo total de cada carrinho
+        # saem de uma única consulta agrupada
         if modelo:
             carrinhos = conn.execute(
-                'SELECT * FROM carrinhos WHERE modelo = ? ORDER BY data_criacao DESC',
+                '''SELECT t.*, e.operador, e.parte, e.inicio, e.fim, e.status
+                   FROM (
+                       SELECT c.*, MAX(ce.id) as ultima_etapa_id,
+                              COALESCE(SUM(ce.duracao), 0) as tempo_total
+                       FROM carrinhos c
+                       LEFT JOIN carrinho_etapas ce ON ce.carrinho_id = c.id
+                       WHERE c.modelo = ?
+                       GROUP BY c.id
+                   ) t
+                   LEFT JOIN carrinho_etapas e ON e.id = t.ultima_etapa_id
+                   ORDER BY t.data_criacao DESC''',
                 (modelo,)
             ).fetchall()
         else:
             carrinhos = conn.execute(
-                'SELECT * FROM carrinhos ORDER BY data_criacao DESC'
+                '''SELECT t.*, e.operador, e.parte, e.inicio, e.fim, e.status
+                   FROM (
+                       SELECT c.*, MAX(ce.id) as ultima_etapa_id,
+                              COALESCE(SUM(ce.duracao), 0) as tempo_total
+                       FROM carrinhos c
+                       LEFT JOIN carrinho_etapas ce ON ce.carrinho_id = c.id
+                       GROUP BY c.id
+                   ) t
+                   LEFT JOIN carrinho_etapas e ON e.id = t.ultima_etapa_id
+                   ORDER BY t.data_criacao DESC'''
             ).fetchall()
             
-        carrinhos_list = []
-        for carrinho in carrinhos:
-            # Buscar etapa atual
-            etapa_atual = conn.execute(
-                '''SELECT operador, parte, inicio, fim, duracao, status 
-                   FROM carrinho_etapas 
-                   WHERE carrinho_id = ? 
-                   ORDER BY id DESC LIMIT 1''',
-                (carrinho['id'],)
-            ).fetchone()
-            
-            # Calcular tempo total
-            tempo_total = conn.execute(
-                '''SELECT SUM(duracao) as total 
-                   FROM carrinho_etapas 
-                   WHERE carrinho_id = ? AND duracao IS NOT NULL''',
-                (carrinho['id'],)
-            ).fetchone()
-            
-            carrinhos_list.append({
+        carrinhos_list = [
+            {
                 'id': carrinho['id'],
                 'modelo': carrinho['modelo'],
                 'estado': carrinho['estado'],
                 'data_criacao': carrinho['data_criacao'],
                 'data_finalizacao': carrinho['data_finalizacao'],
                 'etapa_atual': {
-                    'operador': etapa_atual['operador'] if etapa_atual else None,
-                    'parte': etapa_atual['parte'] if etapa_atual else None,
-                    'inicio': etapa_atual['inicio'] if etapa_atual else None,
-                    'fim': etapa_atual['fim'] if etapa_atual else None,
-                    'status': etapa_atual['status'] if etapa_atual else None
+                    'operador': carrinho['operador'],
+                    'parte': carrinho['parte'],
+                    'inicio': carrinho['inicio'],
+                    'fim': carrinho['fim'],
+                    'status': carrinho['status']
                 },
-                'tempo_total': tempo_total['total'] if tempo_total and tempo_total['total'] else 0
-            })
+                'tempo_total': carrinho['tempo_total']
+            }
+            for carrinho in carrinhos
+        ]
             
         conn.close()
         return jsonify(carrinhos_list)
@@ -0,0 +1,51 @@
+# Arquivamento de carrinhos finalizados
+#
+# Move os carrinhos finalizados há mais de --dias dias, com suas etapas e
+# tempos de processo, do alerts.db para o banco de arquivo anexado
+# (alerts_arquivo.db ou MDC_ARCHIVE_DATABASE). As rotas de histórico leem
+# as duas bases, então nada some para quem consulta; as tabelas da linha
+# ficam só com o trabalho recente. Pode rodar com a API no ar (por exemplo
+# numa tarefa agendada): cada lote é uma transação curta.
+#
+# Uso: python arquivar.py [caminho/do/alerts.db] [--dias 7] [--lote 500] [--api caminho/da/api.py]
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from verificar_planos import API_PADRAO, carregar_api
+
+def main():
+    parser = argparse.ArgumentParser(description='Move carrinhos finalizados antigos para o banco de arquivo')
+    parser.add_argument('banco', nargs='?', default='alerts.db')
+    parser.add_argument('--dias', type=float, help='idade mínima desde a finalização (padrão: MDC_ARCHIVE_AFTER_DAYS)')
+    parser.add_argument('--lote', type=int, help='carrinhos por transação')
+    parser.add_argument('--api', default=API_PADRAO)
+    args = parser.parse_args()
+
+    api = carregar_api(args.api)
+    api.DATABASE = args.banco
+    api.init_db()
+
+    dias = api.ARCHIVE_AFTER_DAYS if args.dias is None else args.dias
+    limite = (datetime.now(timezone.utc) - timedelta(days=dias)).isoformat()
+
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(args.banco, timeout=api.SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    try:
+        conn.execute('ATTACH DATABASE ? AS arquivo', (api.archive_path(args.banco),))
+        conn.execute(f'PRAGMA busy_timeout = {int(api.SQLITE_BUSY_TIMEOUT_MS)}')
+        arquivados = api.archive_finished_carts(conn, limite, args.lote or api.ARCHIVE_BATCH_SIZE)
+        restantes = conn.execute('SELECT COUNT(*) FROM main.carrinhos').fetchone()[0]
+        no_arquivo = conn.execute('SELECT COUNT(*) FROM arquivo.carrinhos').fetchone()[0]
+    finally:
+        conn.close()
+
+    print(f'{arquivados} carrinhos finalizados antes de {limite} arquivados '
+          f'({restantes} na linha, {no_arquivo} no arquivo, {time.perf_counter() - inicio:.1f} s)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
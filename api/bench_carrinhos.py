@@ -0,0 +1,95 @@
+# Benchmark das listagens de carrinhos
+#
+# Mede /carrinhos e /carrinhos/ativos em bancos com quantidades crescentes
+# de carrinhos, contando também quantos SELECTs cada requisição executa.
+# O número é fixo por rota (a versão do ETag, a listagem e, no /carrinhos,
+# o banco de arquivo) e não pode crescer com o banco: sem consultas por
+# carrinho. Termina com código 1 se crescer. O cache de respostas fica
+# desligado para cada chamada ir ao banco. Com a api.py, que não tem o
+# /carrinhos/ativos, só o /carrinhos é medido.
+#
+# Uso: python bench_carrinhos.py [caminho/da/api.py] [--tamanhos 100 1000 10000 100000] [--repeticoes 5]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from verificar_planos import API_PADRAO, carregar_api, popular_banco, usar_banco
+
+ROTAS = [
+    '/carrinhos/ativos?model=313',
+    '/carrinhos/ativos',
+    '/carrinhos?modelo=313',
+    '/carrinhos',
+]
+
+def contar_sql(api, cliente, rota):
+    """Quantos comandos SQL uma chamada da rota executa"""
+    executados = []
+    configurar_original = api.configure_connection
+
+    def configurar_com_rastreio(conn):
+        configurar_original(conn)
+        conn.set_trace_callback(executados.append)
+
+    api.db_pool.clear()
+    api.configure_connection = configurar_com_rastreio
+    try:
+        cliente.get(rota)
+    finally:
+        api.configure_connection = configurar_original
+        api.db_pool.clear()
+    return sum(1 for sql in executados if sql.lstrip().upper().startswith(('SELECT', 'WITH')))
+
+def medir(cliente, rota, repeticoes):
+    cliente.get(rota)  # aquece o cache de páginas
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resposta = cliente.get(rota)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), len(resposta.get_json())
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência das listagens de carrinhos por tamanho do banco')
+    parser.add_argument('api', nargs='?', default=API_PADRAO)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='total de carrinhos no banco (metade para cada modelo)')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    api = carregar_api(args.api)
+    if hasattr(api, 'response_cache'):
+        api.response_cache.max_size = 0
+    cliente = api.app.test_client()
+    existentes = api.app.url_map.bind('localhost')
+    rotas = [rota for rota in ROTAS if existentes.test(rota.split('?')[0], 'GET')]
+    selects_por_rota = {}
+    problemas = []
+    print(f"{'carrinhos':>10} {'rota':<30} {'linhas':>8} {'SELECTs':>8} {'mediana ms':>11} {'ms/1k linhas':>13}")
+
+    for tamanho in args.tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho_db = os.path.join(pasta, 'alerts.db')
+            usar_banco(api, caminho_db)
+            popular_banco(caminho_db, tamanho // 2)
+
+            for rota in rotas:
+                selects = contar_sql(api, cliente, rota)
+                esperado = selects_por_rota.setdefault(rota, selects)
+                if selects != esperado:
+                    problemas.append(f'{rota}: {selects} SELECTs com {tamanho} carrinhos, {esperado} no menor banco')
+                mediana, linhas = medir(cliente, rota, args.repeticoes)
+                por_mil = mediana / linhas * 1000 if linhas else 0
+                print(f'{tamanho:>10} {rota:<30} {linhas:>8} {selects:>8} {mediana:>11.2f} {por_mil:>13.2f}')
+            api.db_pool.clear()
+
+    for problema in problemas:
+        print('FALHA', problema)
+    return 1 if problemas else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# Benchmark da serialização JSON e do gzip das respostas
+#
+# Mede /process/times com ~50 mil linhas para cada serializador disponível
+# (json da biblioteca padrão e orjson) com e sem gzip: tempo de CPU e tempo
+# total por requisição, tempo só da serialização e bytes enviados. O cache
+# de respostas fica desligado para cada chamada refazer o trabalho todo.
+#
+# Uso: python bench_json.py [caminho/da/api.py] [--linhas 50000] [--repeticoes 5]
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from verificar_planos import API_PADRAO, carregar_api, popular_banco, usar_banco
+
+ROTA = '/process/times'
+
+def medir(cliente, cabecalhos, repeticoes):
+    """Medianas de CPU e tempo total (ms) e o tamanho da resposta"""
+    cliente.get(ROTA, headers=cabecalhos)  # aquece o cache de páginas
+    cpu, total = [], []
+    for _ in range(repeticoes):
+        inicio_cpu, inicio = time.process_time(), time.perf_counter()
+        resposta = cliente.get(ROTA, headers=cabecalhos)
+        cpu.append((time.process_time() - inicio_cpu) * 1000)
+        total.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(cpu), statistics.median(total), len(resposta.get_data())
+
+def medir_serializacao(api, linhas, repeticoes):
+    """Mediana do tempo de CPU (ms) de jsonify sobre as linhas já carregadas"""
+    tempos = []
+    with api.app.app_context():
+        for _ in range(repeticoes):
+            inicio = time.process_time()
+            api.app.json.response(linhas).get_data()
+            tempos.append((time.process_time() - inicio) * 1000)
+    return statistics.median(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serializador JSON e gzip em uma resposta grande do /process/times')
+    parser.add_argument('api', nargs='?', default=API_PADRAO)
+    parser.add_argument('--linhas', type=int, default=50000, help='linhas aproximadas em process_times')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    api = carregar_api(args.api)
+    api.response_cache.max_size = 0
+    serializadores = ['json'] + (['orjson'] if api.orjson is not None else [])
+    if api.orjson is None:
+        print('orjson não está instalado: só a biblioteca padrão será medida')
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_db = os.path.join(pasta, 'alerts.db')
+        usar_banco(api, caminho_db)
+        # Cada carrinho finalizado gera seis linhas; seis por modelo ficam em produção
+        popular_banco(caminho_db, math.ceil(args.linhas / 12) + 6)
+        cliente = api.app.test_client()
+        linhas = json.loads(cliente.get(ROTA).get_data())
+        print(f'{ROTA}: {len(linhas)} linhas')
+        print(f"{'serializador':<13} {'encoding':<9} {'CPU ms':>9} {'total ms':>9} {'jsonify ms':>11} {'bytes':>11}")
+
+        for nome in serializadores:
+            api.use_json_serializer(nome)
+            serializacao = medir_serializacao(api, linhas, args.repeticoes)
+            for encoding in ['identity', 'gzip']:
+                cpu, total, tamanho = medir(cliente, {'Accept-Encoding': encoding}, args.repeticoes)
+                print(f'{nome:<13} {encoding:<9} {cpu:>9.1f} {total:>9.1f} {serializacao:>11.1f} {tamanho:>11}')
+        api.db_pool.clear()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
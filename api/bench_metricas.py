@@ -0,0 +1,74 @@
+# Custo da instrumentação do /metrics
+#
+# Mede as mesmas rotas com MDC_METRICS ligado e desligado, alternando os
+# dois modos a cada chamada para o ruído da máquina afetar os dois igual, e
+# mostra a diferença por requisição. O cache de respostas fica desligado
+# para cada chamada ir ao banco.
+#
+# Uso: python bench_metricas.py [caminho/da/api.py] [--carrinhos 2000] [--repeticoes 300]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from verificar_planos import API_PADRAO, carregar_api, popular_banco, usar_banco
+
+ROTAS = [
+    '/health',
+    '/alerts?model=313',
+    '/process/status?model=313',
+    '/carrinhos/ativos?model=313',
+    '/station/313/A2/snapshot',
+    '/process/times?model=313&after_id=0&limit=500',
+    '/carrinhos?modelo=313',
+]
+
+def medir(api, chamada, repeticoes):
+    """Medianas (µs) sem e com métricas, alternando o modo a cada chamada"""
+    tempos = {False: [], True: []}
+    for _ in range(repeticoes):
+        for ligado in (False, True):
+            api.METRICS_ENABLED = ligado
+            inicio = time.perf_counter()
+            chamada()
+            tempos[ligado].append((time.perf_counter() - inicio) * 1e6)
+    api.METRICS_ENABLED = True
+    return statistics.median(tempos[False]), statistics.median(tempos[True])
+
+def ciclo_alerta(cliente):
+    alerta = {'model': '314', 'operator': 'A3', 'part': 'Bench'}
+    cliente.post('/alerts', json=alerta)
+    cliente.post('/alerts/stop', json=alerta)
+
+def main():
+    parser = argparse.ArgumentParser(description='Sobrecarga das métricas por rota')
+    parser.add_argument('api', nargs='?', default=API_PADRAO)
+    parser.add_argument('--carrinhos', type=int, default=2000, help='carrinhos por modelo no banco de teste')
+    parser.add_argument('--repeticoes', type=int, default=300)
+    args = parser.parse_args()
+
+    api = carregar_api(args.api)
+    api.response_cache.max_size = 0
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_db = os.path.join(pasta, 'alerts.db')
+        usar_banco(api, caminho_db)
+        popular_banco(caminho_db, args.carrinhos)
+        cliente = api.app.test_client()
+
+        medidas = {}
+        for rota in ROTAS:
+            medidas[rota] = medir(api, lambda: cliente.get(rota), args.repeticoes)
+        medidas['POST /alerts + /alerts/stop'] = medir(api, lambda: ciclo_alerta(cliente), args.repeticoes)
+        api.db_pool.clear()
+
+    print(f"{'rota':<48} {'sem µs':>9} {'com µs':>9} {'diferença':>10}")
+    for rota, (sem, com) in medidas.items():
+        print(f'{rota:<48} {sem:>9.1f} {com:>9.1f} {(com - sem) / sem:>+9.1%}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
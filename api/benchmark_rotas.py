@@ -0,0 +1,308 @@
+# Benchmark das rotas da API em bancos de tamanhos crescentes
+#
+# Gera bancos alerts.db realistas com 1 mil, 100 mil e 1 milhão de etapas
+# (guardados em --dados e reaproveitados nas execuções seguintes). Cada rota
+# é medida de dois jeitos: pelo cliente de testes do Flask, que mostra o
+# custo da rota em si, e por um servidor HTTP com threads e vários clientes
+# simultâneos, que inclui a disputa pelo banco. O resultado (p50/p95/p99 em
+# ms e requisições por segundo) vai para um JSON; com --comparar, as rotas
+# que ficaram mais lentas que o arquivo anterior são apontadas e o comando
+# termina com código 1. O cache de respostas fica desligado, para cada
+# chamada ir ao banco; --com-cache mede com ele ligado.
+#
+# Uso: python benchmark_rotas.py [--etapas 1000 100000 1000000] [--repeticoes 200]
+#                                [--clientes 8] [--saida resultado.json]
+#                                [--comparar anterior.json] [--tolerancia 0.2] [--com-cache]
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.serving import make_server
+
+from verificar_planos import API_PADRAO, carregar_api, popular_banco, usar_banco
+
+PASTA_DADOS = os.path.join(tempfile.gettempdir(), 'mdc_bench_dados')
+
+class ClienteTeste:
+    """Chamadas pelo cliente de testes do Flask, sem rede"""
+
+    def __init__(self, app):
+        self.cliente = app.test_client()
+
+    def get(self, rota):
+        resposta = self.cliente.get(rota)
+        return resposta.status_code, resposta.data
+
+    def post(self, rota, dados):
+        resposta = self.cliente.post(rota, json=dados)
+        return resposta.status_code, resposta.get_json()
+
+class ClienteHTTP:
+    """Chamadas HTTP de verdade ao servidor de benchmark"""
+
+    def __init__(self, porta):
+        self.conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+
+    def _enviar(self, metodo, rota, corpo=None):
+        cabecalhos = {'Content-Type': 'application/json'} if corpo is not None else {}
+        self.conexao.request(metodo, rota, body=corpo, headers=cabecalhos)
+        resposta = self.conexao.getresponse()
+        return resposta.status, resposta.read()
+
+    def get(self, rota):
+        return self._enviar('GET', rota)
+
+    def post(self, rota, dados):
+        status, corpo = self._enviar('POST', rota, json.dumps(dados))
+        return status, json.loads(corpo) if corpo else None
+
+    def fechar(self):
+        self.conexao.close()
+
+# Cenários: recebem o cliente e um número único da chamada e devolvem
+# (segundos da parte medida, status HTTP)
+def leitura(rota):
+    def executar(cliente, numero):
+        inicio = time.perf_counter()
+        status, _ = cliente.get(rota)
+        return time.perf_counter() - inicio, status
+    return executar
+
+def criar_alerta(cliente, numero):
+    alerta = {'model': '313', 'operator': 'A2', 'part': f'Bench {numero}'}
+    inicio = time.perf_counter()
+    status, _ = cliente.post('/alerts', alerta)
+    duracao = time.perf_counter() - inicio
+    cliente.post('/alerts/stop', alerta)
+    return duracao, status
+
+def iniciar_processo(cliente, numero):
+    inicio = time.perf_counter()
+    status, _ = cliente.post('/process/start', {'model': '313', 'operator': 'A1', 'part': 'Eixos'})
+    return time.perf_counter() - inicio, status
+
+def finalizar_processo(cliente, numero):
+    status, dados = cliente.post('/process/start', {'model': '313', 'operator': 'A1', 'part': 'Eixos'})
+    if status != 201:
+        return 0.0, status
+    inicio = time.perf_counter()
+    status, _ = cliente.post('/process/end', {'model': '313', 'operator': 'A1', 'part': 'Eixos',
+                                              'carrinho_id': dados['carrinho_id']})
+    return time.perf_counter() - inicio, status
+
+def cenarios():
+    uma_hora = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat().replace('+', '%2B')
+    # O nome identifica a rota entre execuções (a data do since muda a cada uma)
+    rotas = [
+        '/health',
+        '/alerts?model=313',
+        '/carrinhos/disponiveis/A1?model=313',
+        '/carrinhos/disponiveis/A3?model=313',
+        '/process/status?model=313',
+        '/process/times?model=313&after_id=0&limit=500',
+        ('/process/times?model=313&since=<1h>', f'/process/times?model=313&since={uma_hora}'),
+        '/carrinhos/ativos?model=313',
+        '/station/313/A3/snapshot',
+        '/stats/stations?model=313',
+        '/stats/throughput?model=313',
+        '/analysis/bottleneck?model=313',
+        ('/export/process_times?model=313&since=<1h>', f'/export/process_times?model=313&since={uma_hora}'),
+    ]
+    # Leituras primeiro: as escritas aumentam o banco durante a medição
+    rotas = [rota if isinstance(rota, tuple) else (rota, rota) for rota in rotas]
+    return ([(f'GET {nome}', leitura(rota)) for nome, rota in rotas] + [
+        ('POST /alerts', criar_alerta),
+        ('POST /process/start', iniciar_processo),
+        ('POST /process/end', finalizar_processo),
+    ])
+
+def preparar_banco(api, pasta, etapas):
+    """Caminho de um alerts.db com aproximadamente `etapas` etapas, gerado uma vez só"""
+    caminho = os.path.join(pasta, f'alerts_{etapas}.db')
+    if os.path.exists(caminho):
+        return caminho
+
+    os.makedirs(pasta, exist_ok=True)
+    temporario = caminho + '.gerando'
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    print(f'gerando {caminho}...', file=sys.stderr)
+    usar_banco(api, temporario)
+    # Dois modelos, seis etapas por carrinho
+    popular_banco(temporario, max(etapas // 12, 1))
+    conn = sqlite3.connect(temporario)
+    agora = datetime.now(timezone.utc).isoformat()
+    conn.executemany(
+        'INSERT INTO alerts (model, operator, part, started_at) VALUES (?, ?, ?, ?)',
+        [(modelo, operador, 'Peça', agora) for modelo in ['313', '314'] for operador in ['A2', 'A5']]
+    )
+    conn.commit()
+    conn.close()
+    # Estatísticas e série de vazão a partir do histórico gerado
+    api.db_pool.clear()
+    api.init_db()
+    api.db_pool.clear()
+    os.replace(temporario, caminho)
+    return caminho
+
+def resumir(latencias, erros, segundos):
+    percentis = statistics.quantiles(latencias, n=100, method='inclusive') if len(latencias) > 1 else latencias * 99
+    return {
+        'n': len(latencias),
+        'erros': erros,
+        'p50_ms': round(percentis[49] * 1000, 3),
+        'p95_ms': round(percentis[94] * 1000, 3),
+        'p99_ms': round(percentis[98] * 1000, 3),
+        'rps': round(len(latencias) / segundos, 1) if segundos else None,
+    }
+
+def medir(criar_cliente, executar, repeticoes, clientes):
+    """Roda o cenário em `clientes` threads; devolve o resumo das latências"""
+    latencias = []
+    erros = [0]
+    trava = threading.Lock()
+    contador = iter(range(repeticoes))
+
+    def trabalhador():
+        cliente = criar_cliente()
+        while True:
+            with trava:
+                numero = next(contador, None)
+            if numero is None:
+                break
+            duracao, status = executar(cliente, numero)
+            with trava:
+                if status >= 400:
+                    erros[0] += 1
+                else:
+                    latencias.append(duracao)
+        if hasattr(cliente, 'fechar'):
+            cliente.fechar()
+
+    executar(criar_cliente(), repeticoes)  # aquecimento
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador) for _ in range(clientes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resumir(latencias or [0.0], erros[0], time.perf_counter() - inicio)
+
+def medir_tamanho(api, banco, etapas, args):
+    resultados = []
+    for modo in ['test_client', 'servidor']:
+        with tempfile.TemporaryDirectory() as pasta:
+            copia = os.path.join(pasta, 'alerts.db')
+            shutil.copyfile(banco, copia)
+            usar_banco(api, copia)
+
+            servidor = None
+            if modo == 'servidor':
+                servidor = make_server('127.0.0.1', 0, api.app, threaded=True)
+                threading.Thread(target=servidor.serve_forever, daemon=True).start()
+                criar_cliente = lambda: ClienteHTTP(servidor.server_port)
+                clientes = args.clientes
+            else:
+                criar_cliente = lambda: ClienteTeste(api.app)
+                clientes = 1
+
+            try:
+                for nome, executar in cenarios():
+                    resumo = medir(criar_cliente, executar, args.repeticoes, clientes)
+                    resumo.update({'etapas': etapas, 'modo': modo, 'rota': nome, 'clientes': clientes})
+                    resultados.append(resumo)
+                    print(f"{etapas:>9} {modo:<12} {nome:<58} {resumo['p50_ms']:>9.2f} "
+                          f"{resumo['p95_ms']:>9.2f} {resumo['p99_ms']:>9.2f} {resumo['rps']:>9} {resumo['erros']:>5}")
+            finally:
+                if servidor:
+                    servidor.shutdown()
+                    servidor.server_close()
+                api.db_pool.clear()
+    return resultados
+
+def versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def comparar(resultados, caminho, tolerancia, com_cache):
+    """Rotas cujo p50 ou p95 piorou mais que `tolerancia` em relação ao arquivo anterior"""
+    with open(caminho) as arquivo:
+        dados = json.load(arquivo)
+    if dados.get('cache', False) != com_cache:
+        print(f'AVISO {caminho} foi medido com o cache de respostas {"ligado" if dados.get("cache") else "desligado"}')
+    anterior = {(r['etapas'], r['modo'], r['rota']): r for r in dados['resultados']}
+
+    regressoes = []
+    for atual in resultados:
+        antes = anterior.get((atual['etapas'], atual['modo'], atual['rota']))
+        if not antes:
+            continue
+        for metrica in ['p50_ms', 'p95_ms']:
+            if antes[metrica] and atual[metrica] > antes[metrica] * (1 + tolerancia):
+                regressoes.append((atual, metrica, antes[metrica]))
+
+    for atual, metrica, valor_anterior in regressoes:
+        print(f"REGRESSÃO {atual['etapas']} {atual['modo']} {atual['rota']}: "
+              f"{metrica} {valor_anterior:.2f} -> {atual[metrica]:.2f}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência e vazão das rotas da API por tamanho do banco')
+    parser.add_argument('--api', default=API_PADRAO)
+    parser.add_argument('--etapas', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help='etapas no banco gerado (dois modelos, seis etapas por carrinho)')
+    parser.add_argument('--repeticoes', type=int, default=200, help='chamadas medidas por rota')
+    parser.add_argument('--clientes', type=int, default=8, help='clientes simultâneos no modo servidor')
+    parser.add_argument('--dados', default=PASTA_DADOS, help='onde guardar os bancos gerados')
+    parser.add_argument('--saida', default='benchmark_rotas.json')
+    parser.add_argument('--comparar', help='resultado anterior para apontar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='piora aceita no p50/p95 (0.2 = 20%%)')
+    parser.add_argument('--com-cache', action='store_true', help='mede com o cache de respostas ligado')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    api = carregar_api(args.api)
+    # Com o cache as rotas repetidas viram acertos e a regressão no banco não aparece
+    if hasattr(api, 'response_cache') and not args.com_cache:
+        api.response_cache.max_size = 0
+
+    print(f"{'etapas':>9} {'modo':<12} {'rota':<58} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'erros':>5}")
+    resultados = []
+    for etapas in args.etapas:
+        banco = preparar_banco(api, args.dados, etapas)
+        resultados += medir_tamanho(api, banco, etapas, args)
+
+    with open(args.saida, 'w') as arquivo:
+        json.dump({
+            'commit': versao_codigo(),
+            'data': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'repeticoes': args.repeticoes,
+            'cache': args.com_cache,
+            'resultados': resultados,
+        }, arquivo, indent=2)
+    print(f'resultados gravados em {args.saida}')
+
+    if args.comparar and comparar(resultados, args.comparar, args.tolerancia, args.com_cache):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
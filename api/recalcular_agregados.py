@@ -0,0 +1,50 @@
+# Recalcula as tabelas agregadas a partir do histórico
+#
+# station_stats e throughput são mantidas pelo /process/end; este comando
+# as refaz do zero a partir de process_times (depois de importar dados,
+# corrigir registros à mão ou mudar os baldes de vazão). Pode rodar com a
+# API no ar: a reconstrução é uma única transação e invalida os ETags.
+#
+# Uso: python recalcular_agregados.py [caminho/do/alerts.db] [--api caminho/da/api.py]
+
+import argparse
+import sqlite3
+import sys
+import time
+
+from verificar_planos import API_PADRAO, carregar_api
+
+def main():
+    parser = argparse.ArgumentParser(description='Recalcula station_stats e throughput a partir de process_times')
+    parser.add_argument('banco', nargs='?', default='alerts.db')
+    parser.add_argument('--api', default=API_PADRAO)
+    args = parser.parse_args()
+
+    api = carregar_api(args.api)
+    api.DATABASE = args.banco
+    api.init_db()
+
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(args.banco, timeout=api.SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        # Os agregados contam também os carrinhos já movidos para o arquivo
+        conn.execute('ATTACH DATABASE ? AS arquivo', (api.archive_path(args.banco),))
+        conn.execute('BEGIN IMMEDIATE')
+        api.rebuild_station_stats(conn)
+        api.rebuild_throughput(conn)
+        api.bump_version(conn, ['reset'], None)
+        conn.commit()
+
+        etapas = conn.execute('SELECT (SELECT COUNT(*) FROM main.process_times)'
+                              ' + (SELECT COUNT(*) FROM arquivo.process_times)').fetchone()[0]
+        postos = conn.execute('SELECT COUNT(*) FROM station_stats').fetchone()[0]
+        baldes = conn.execute('SELECT COUNT(*) FROM throughput').fetchone()[0]
+    finally:
+        conn.close()
+
+    print(f'{etapas} etapas -> {postos} postos em station_stats, {baldes} baldes em throughput '
+          f'({time.perf_counter() - inicio:.1f} s)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
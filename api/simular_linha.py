@@ -0,0 +1,293 @@
+# Simulador de carga de um turno de produção
+#
+# Reproduz o comportamento da linha contra um servidor local: o A1 cria
+# carrinhos pelo /process/start, cada posto A2-A6 pega carrinhos em
+# /carrinhos/disponiveis/<operador> e conclui a etapa no /process/end,
+# alertas são abertos e fechados, e cada tablet e painel consulta a API no
+# seu intervalo real. Todos os tempos são divididos por --escala (60 = um
+# minuto do turno por segundo de simulação).
+#
+# Ao final mostra a vazão (etapas e carrinhos por minuto de turno), a taxa
+# de erros, quantas respostas tiveram "database is locked" e os percentis
+# de latência por rota.
+#
+# Uso: python simular_linha.py [--linhas 2] [--modelos 313 314] [--duracao 60]
+#                              [--ciclo-medio 55] [--ciclo-desvio 15] [--escala 60]
+#                              [--url http://host:porta] [--saida resultado.json]
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+from werkzeug.serving import make_server
+
+from verificar_planos import API_PADRAO, OPERADORES, carregar_api, usar_banco
+
+# Intervalos de consulta das páginas, em segundos de turno
+INTERVALO_TABLET = 3
+INTERVALO_PAINEL = 3
+INTERVALO_PAINEL_PRODUCAO = 10
+
+class Metricas:
+    """Latências e erros de todas as threads, agrupados por rota"""
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.rotas = {}
+        self.etapas = 0
+        self.carrinhos = 0
+        self.conflitos = 0
+
+    def registrar(self, metodo, rota, segundos, status, travado):
+        # /carrinhos/disponiveis/A3 e /carrinhos/disponiveis/A4 contam como a mesma rota
+        caminho = re.sub(r'/A[1-6]\b', '/<operador>', re.sub(r'/(313|314)/', '/<model>/', rota.split('?')[0]))
+        nome = f'{metodo} {caminho}'
+        with self.trava:
+            dados = self.rotas.setdefault(nome, {'latencias': [], 'erros': 0, 'travados': 0, 'status': {}})
+            dados['latencias'].append(segundos)
+            dados['status'][status] = dados['status'].get(status, 0) + 1
+            if status == 0 or status >= 500:
+                dados['erros'] += 1
+            if travado:
+                dados['travados'] += 1
+
+    def contar(self, campo):
+        with self.trava:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+class Cliente:
+    """Conexão HTTP de uma thread, registrando cada chamada nas métricas"""
+
+    def __init__(self, host, porta, metricas):
+        self.host = host
+        self.porta = porta
+        self.metricas = metricas
+        self.conexao = http.client.HTTPConnection(host, porta, timeout=30)
+
+    def chamar(self, metodo, rota, dados=None):
+        corpo = json.dumps(dados) if dados is not None else None
+        cabecalhos = {'Content-Type': 'application/json'} if corpo else {}
+        inicio = time.perf_counter()
+        try:
+            self.conexao.request(metodo, rota, body=corpo, headers=cabecalhos)
+            resposta = self.conexao.getresponse()
+            status, texto = resposta.status, resposta.read()
+        except (OSError, http.client.HTTPException):
+            self.conexao.close()
+            self.conexao = http.client.HTTPConnection(self.host, self.porta, timeout=30)
+            status, texto = 0, b''
+        self.metricas.registrar(metodo, rota, time.perf_counter() - inicio, status, b'database is locked' in texto)
+        try:
+            return status, json.loads(texto) if texto else None
+        except ValueError:
+            return status, None
+
+class Simulacao:
+    def __init__(self, args, host, porta):
+        self.args = args
+        self.host = host
+        self.porta = porta
+        self.metricas = Metricas()
+        self.fim = time.monotonic() + args.duracao
+        self.parar = threading.Event()
+
+    def esperar(self, segundos_turno):
+        """Dorme o equivalente a segundos_turno; False quando a simulação acabou"""
+        restante = self.fim - time.monotonic()
+        if restante <= 0:
+            return False
+        return not self.parar.wait(min(segundos_turno / self.args.escala, restante))
+
+    def ciclo(self):
+        return max(random.gauss(self.args.ciclo_medio, self.args.ciclo_desvio), 1.0)
+
+    def posto(self, modelo, operador):
+        cliente = Cliente(self.host, self.porta, self.metricas)
+        parte = f'Peça {operador}'
+        while time.monotonic() < self.fim:
+            carrinho_id = None
+            if operador != 'A1':
+                status, dados = cliente.chamar('GET', f'/carrinhos/disponiveis/{operador}?model={modelo}')
+                disponiveis = (dados or {}).get('carrinhos_disponiveis') or []
+                if not disponiveis:
+                    # Ninguém na fila: espera a próxima leitura de RFID
+                    if not self.esperar(60 / self.args.leituras_por_minuto):
+                        break
+                    continue
+                # Com várias linhas, cada uma tenta um carrinho diferente
+                carrinho_id = random.choice(disponiveis)['id']
+
+            inicio = {'model': modelo, 'operator': operador, 'part': parte}
+            if carrinho_id:
+                inicio['carrinho_id'] = carrinho_id
+            status, dados = cliente.chamar('POST', '/process/start', inicio)
+            if status != 201:
+                if status == 404:
+                    self.metricas.contar('conflitos')
+                if not self.esperar(60 / self.args.leituras_por_minuto):
+                    break
+                continue
+
+            alerta = None
+            if random.random() < self.args.chance_alerta:
+                alerta = {'model': modelo, 'operator': operador, 'part': parte}
+                cliente.chamar('POST', '/alerts', alerta)
+
+            self.esperar(self.ciclo())
+            if alerta:
+                cliente.chamar('POST', '/alerts/stop', alerta)
+
+            status, _ = cliente.chamar('POST', '/process/end', {
+                'model': modelo, 'operator': operador, 'part': parte, 'carrinho_id': dados['carrinho_id']})
+            if status == 200:
+                self.metricas.contar('etapas')
+                if operador == 'A6':
+                    self.metricas.contar('carrinhos')
+            elif status == 404:
+                self.metricas.contar('conflitos')
+
+    def consultar(self, rotas, intervalo):
+        """Página que consulta as rotas a cada intervalo, como os tablets e painéis"""
+        cliente = Cliente(self.host, self.porta, self.metricas)
+        # Os tablets não ligam todos no mesmo instante
+        if not self.esperar(random.uniform(0, intervalo)):
+            return
+        while True:
+            for rota in rotas:
+                cliente.chamar('GET', rota)
+            if not self.esperar(intervalo):
+                break
+
+    def threads(self):
+        alvos = []
+        for _ in range(self.args.linhas):
+            for modelo in self.args.modelos:
+                for operador in OPERADORES:
+                    alvos.append((self.posto, (modelo, operador)))
+                    alvos.append((self.consultar, ([f'/station/{modelo}/{operador}/snapshot'], INTERVALO_TABLET)))
+        for _ in range(self.args.paineis):
+            alvos.append((self.consultar, (['/alerts'], INTERVALO_PAINEL)))
+            for modelo in self.args.modelos:
+                alvos.append((self.consultar, ([f'/process/times?model={modelo}&after_id=0&limit=500',
+                                                 f'/carrinhos?modelo={modelo}'], INTERVALO_PAINEL_PRODUCAO)))
+        return [threading.Thread(target=alvo, args=argumentos, daemon=True) for alvo, argumentos in alvos]
+
+    def executar(self):
+        threads = self.threads()
+        inicio = time.monotonic()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.parar.set()
+            for thread in threads:
+                thread.join()
+        return time.monotonic() - inicio
+
+def percentil(valores, q):
+    return statistics.quantiles(valores, n=100, method='inclusive')[q - 1] if len(valores) > 1 else valores[0]
+
+def relatorio(metricas, segundos, escala):
+    minutos_turno = segundos * escala / 60
+    total = sum(len(dados['latencias']) for dados in metricas.rotas.values())
+    erros = sum(dados['erros'] for dados in metricas.rotas.values())
+    travados = sum(dados['travados'] for dados in metricas.rotas.values())
+    resumo = {
+        'segundos': round(segundos, 1),
+        'minutos_de_turno': round(minutos_turno, 1),
+        'requisicoes': total,
+        'requisicoes_por_segundo': round(total / segundos, 1),
+        'etapas_por_minuto': round(metricas.etapas / minutos_turno, 2),
+        'carrinhos_por_minuto': round(metricas.carrinhos / minutos_turno, 2),
+        'erros': erros,
+        'taxa_de_erros': round(erros / total, 4) if total else 0.0,
+        'database_is_locked': travados,
+        'conflitos': metricas.conflitos,
+        'rotas': {}
+    }
+    for nome, dados in sorted(metricas.rotas.items()):
+        latencias = dados['latencias']
+        resumo['rotas'][nome] = {
+            'n': len(latencias),
+            'erros': dados['erros'],
+            'database_is_locked': dados['travados'],
+            'status': {str(status): n for status, n in sorted(dados['status'].items())},
+            'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+            'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+            'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+        }
+    return resumo
+
+def imprimir(resumo):
+    print(f"{resumo['requisicoes']} requisições em {resumo['segundos']} s "
+          f"({resumo['requisicoes_por_segundo']} req/s, {resumo['minutos_de_turno']} min de turno)")
+    print(f"vazão: {resumo['etapas_por_minuto']} etapas/min, {resumo['carrinhos_por_minuto']} carrinhos/min")
+    print(f"erros: {resumo['erros']} ({resumo['taxa_de_erros']:.2%}), database is locked: "
+          f"{resumo['database_is_locked']}, conflitos entre linhas: {resumo['conflitos']}")
+    print(f"{'rota':<43} {'n':>7} {'erros':>6} {'locked':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for nome, dados in resumo['rotas'].items():
+        print(f"{nome:<43} {dados['n']:>7} {dados['erros']:>6} {dados['database_is_locked']:>7} "
+              f"{dados['p50_ms']:>9.2f} {dados['p95_ms']:>9.2f} {dados['p99_ms']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Simula um turno da linha de produção contra a API')
+    parser.add_argument('--url', help='API já no ar; sem isso sobe um servidor local com banco temporário')
+    parser.add_argument('--api', default=API_PADRAO)
+    parser.add_argument('--linhas', type=int, default=2, help='linhas completas (A1-A6) por modelo')
+    parser.add_argument('--modelos', nargs='+', default=['313', '314'])
+    parser.add_argument('--paineis', type=int, default=2, help='painéis de logística/produção abertos')
+    parser.add_argument('--duracao', type=float, default=60, help='segundos reais de simulação')
+    parser.add_argument('--ciclo-medio', type=float, default=55, help='tempo médio de etapa (s de turno)')
+    parser.add_argument('--ciclo-desvio', type=float, default=15, help='desvio padrão do tempo de etapa')
+    parser.add_argument('--leituras-por-minuto', type=float, default=12,
+                        help='tentativas por minuto de um posto sem carrinho na fila')
+    parser.add_argument('--chance-alerta', type=float, default=0.1, help='probabilidade de alerta por etapa')
+    parser.add_argument('--escala', type=float, default=60, help='segundos de turno por segundo real')
+    parser.add_argument('--saida', help='grava o resumo em JSON')
+    args = parser.parse_args()
+
+    servidor = None
+    pasta = None
+    if args.url:
+        endereco = urlparse(args.url)
+        host, porta = endereco.hostname, endereco.port or 80
+    else:
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        api = carregar_api(args.api)
+        pasta = tempfile.TemporaryDirectory()
+        usar_banco(api, os.path.join(pasta.name, 'alerts.db'))
+        servidor = make_server('127.0.0.1', 0, api.app, threaded=True)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        host, porta = '127.0.0.1', servidor.server_port
+
+    try:
+        simulacao = Simulacao(args, host, porta)
+        segundos = simulacao.executar()
+    finally:
+        if servidor:
+            servidor.shutdown()
+            servidor.server_close()
+            api.db_pool.clear()
+            pasta.cleanup()
+
+    resumo = relatorio(simulacao.metricas, segundos, args.escala)
+    imprimir(resumo)
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(resumo, arquivo, indent=2)
+    return 1 if resumo['erros'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# Teste de carga da numeração dos carrinhos
+#
+# Dispara milhares de /process/start do A1 (e /carrinhos/novo) em paralelo,
+# de vários processos e threads sobre o mesmo banco, e confere que as
+# sequências de cada modelo saem únicas e sem buracos. Termina com código 1
+# se encontrar repetição, buraco ou requisição com erro.
+#
+# Uso: python stress_sequencias.py [caminho/da/api.py] [--inicios 4000] [--processos 4] [--threads 16]
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from verificar_planos import API_PADRAO, carregar_api, usar_banco
+
+MODELOS = ['313', '314']
+
+def disparar(args):
+    """Executa `quantidade` inícios em um processo; devolve os códigos de resposta"""
+    caminho_api, caminho_db, quantidade, threads, deslocamento = args
+    api = carregar_api(caminho_api)
+    usar_banco(api, caminho_db)
+
+    def iniciar(indice):
+        cliente = api.app.test_client()
+        modelo = MODELOS[indice % len(MODELOS)]
+        # Um em cada cinco pela rota de criação direta, o resto pelo A1
+        if indice % 5 == 0:
+            resposta = cliente.post('/carrinhos/novo', json={'modelo': modelo})
+        else:
+            resposta = cliente.post('/process/start', json={'model': modelo, 'operator': 'A1', 'part': 'Eixos'})
+        return resposta.status_code
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(iniciar, range(deslocamento, deslocamento + quantidade)))
+
+def conferir(caminho_db):
+    """Problemas encontrados na numeração de cada modelo"""
+    conn = sqlite3.connect(caminho_db)
+    com_contador = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sequencias'").fetchone()
+    problemas = []
+    for modelo in MODELOS:
+        sequencias = [row[0] for row in conn.execute(
+            'SELECT sequencia FROM carrinhos WHERE modelo = ? ORDER BY sequencia', (modelo,))]
+        repetidas = [seq for seq, vezes in Counter(sequencias).items() if vezes > 1]
+        if repetidas:
+            problemas.append(f'{modelo}: {len(repetidas)} sequências repetidas, ex. {repetidas[:5]}')
+        if sequencias and sorted(set(sequencias)) != list(range(1, sequencias[-1] + 1)):
+            faltando = sorted(set(range(1, sequencias[-1] + 1)) - set(sequencias))
+            problemas.append(f'{modelo}: {len(faltando)} buracos, ex. {faltando[:5]}')
+        if com_contador and sequencias:
+            ultima = conn.execute('SELECT ultima FROM sequencias WHERE modelo = ?', (modelo,)).fetchone()
+            if not ultima or ultima[0] != sequencias[-1]:
+                problemas.append(f'{modelo}: contador em {ultima and ultima[0]}, última sequência {sequencias[-1]}')
+        print(f'  modelo {modelo}: {len(sequencias)} carrinhos, sequências 1..{sequencias[-1] if sequencias else 0}')
+    conn.close()
+    return problemas
+
+def main():
+    parser = argparse.ArgumentParser(description='Inícios simultâneos do A1 e unicidade das sequências')
+    parser.add_argument('api', nargs='?', default=API_PADRAO)
+    parser.add_argument('--inicios', type=int, default=4000, help='total de carrinhos criados')
+    parser.add_argument('--processos', type=int, default=4, help='processos da API (como workers do servidor)')
+    parser.add_argument('--threads', type=int, default=16, help='requisições simultâneas por processo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_db = os.path.join(pasta, 'alerts.db')
+        usar_banco(carregar_api(args.api), caminho_db)
+
+        por_processo = -(-args.inicios // args.processos)
+        tarefas = [(args.api, caminho_db, min(por_processo, args.inicios - i * por_processo), args.threads,
+                    i * por_processo) for i in range(args.processos) if args.inicios > i * por_processo]
+
+        inicio = time.perf_counter()
+        with multiprocessing.Pool(len(tarefas)) as pool:
+            codigos = Counter(codigo for lote in pool.map(disparar, tarefas) for codigo in lote)
+        duracao = time.perf_counter() - inicio
+
+        print(f'{sum(codigos.values())} inícios em {duracao:.2f} s '
+              f'({sum(codigos.values()) / duracao:.0f}/s, {args.processos} processos x {args.threads} threads)')
+        print(f'  respostas: {dict(sorted(codigos.items()))}')
+        problemas = conferir(caminho_db)
+        if set(codigos) - {201}:
+            problemas.append('requisições com erro')
+
+    for problema in problemas:
+        print('FALHA', problema)
+    if not problemas:
+        print('ok: sequências únicas e sem buracos')
+    return 1 if problemas else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,337 @@
+# Verificação dos planos de consulta da API
+#
+# Cria um banco temporário populado com histórico, chama todas as rotas
+# pelo cliente de testes do Flask registrando cada SQL executado e roda
+# EXPLAIN QUERY PLAN em cada um. Termina com código 1 se alguma consulta
+# filtrada fizer varredura completa de tabela (SCAN sem índice) ou percorrer
+# todo o histórico de um modelo para depois filtrar o resto.
+#
+# Uso: python verificar_planos.py [caminho/da/api.py] [--carrinhos N]
+
+import argparse
+import importlib.util
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.exceptions import HTTPException
+
+API_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api (14).py')
+OPERADORES = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6']
+
+# Tabelas que podem ser varridas sem problema: internas do SQLite ou com
+# uma linha por posto, cujo tamanho não cresce com o histórico
+TABELAS_PERMITIDAS = {'sqlite_sequence', 'station_stats'}
+
+# Tabelas que crescem com o histórico: um índice só por modelo nelas percorre
+# todos os carrinhos que o modelo já teve
+TABELAS_HISTORICO = {'carrinhos', 'carrinho_etapas', 'process_times'}
+
+def carregar_api(caminho):
+    spec = importlib.util.spec_from_file_location('mdc_api', caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules['mdc_api'] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def usar_banco(api, caminho_db):
+    """Aponta a API para outro arquivo de banco"""
+    api.db_pool.clear()
+    api.DATABASE = caminho_db
+    api.db_pool = api.ConnectionPool(caminho_db, api.SQLITE_POOL_SIZE)
+    api.init_db()
+    # As respostas em cache eram do banco anterior
+    if hasattr(api, 'response_cache'):
+        api.response_cache.invalidate(['reset'], None)
+
+def popular_banco(caminho_db, carrinhos_por_modelo):
+    """Gera histórico: carrinhos finalizados e alguns ainda em produção"""
+    conn = sqlite3.connect(caminho_db)
+    inicio_base = datetime.now(timezone.utc) - timedelta(days=7)
+    # Um carrinho novo a cada intervalo, para o histórico ocupar a última semana
+    intervalo = timedelta(days=7) / max(carrinhos_por_modelo, 1)
+    carrinhos = []
+    etapas = []
+    tempos = []
+    proximo_id = 1
+
+    for modelo in ['313', '314']:
+        for sequencia in range(1, carrinhos_por_modelo + 1):
+            carrinho_id = proximo_id
+            proximo_id += 1
+            # Os últimos carrinhos de cada modelo continuam na linha
+            em_producao = sequencia > carrinhos_por_modelo - 6
+            etapas_feitas = random.randint(1, 5) if em_producao else 6
+            instante = inicio_base + intervalo * (sequencia - 1)
+
+            for indice in range(etapas_feitas):
+                operador = OPERADORES[indice]
+                duracao = random.uniform(20, 90)
+                inicio = instante.isoformat()
+                instante += timedelta(seconds=duracao)
+                aberta = em_producao and indice == etapas_feitas - 1
+                fim = None if aberta else instante.isoformat()
+                etapas.append((carrinho_id, operador, 'Peça', inicio, fim,
+                               None if aberta else duracao, indice + 1))
+                if not aberta:
+                    tempos.append((modelo, operador, 'Peça', inicio, fim, duracao, carrinho_id))
+
+            if em_producao:
+                carrinhos.append((carrinho_id, modelo, 'em_producao', inicio_base.isoformat(), None,
+                                  OPERADORES[etapas_feitas - 1], sequencia))
+            else:
+                carrinhos.append((carrinho_id, modelo, 'finalizado', inicio_base.isoformat(),
+                                  instante.isoformat(), 'A6', sequencia))
+
+    inserir(conn, 'carrinhos', ['id', 'modelo', 'estado', 'data_criacao', 'data_finalizacao', 'operador_atual',
+                                'sequencia'], carrinhos)
+    inserir(conn, 'carrinho_etapas', ['carrinho_id', 'operador', 'parte', 'inicio', 'fim', 'duracao', 'sequencia'],
+            etapas)
+    inserir(conn, 'process_times', ['model', 'operator', 'part', 'start_time', 'end_time', 'duration', 'carrinho_id'],
+            tempos)
+    # Os carrinhos entram direto no banco: acerta os contadores de sequência da API
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sequencias'").fetchone():
+        conn.executemany('INSERT OR REPLACE INTO sequencias (modelo, ultima) VALUES (?, ?)',
+                         [(modelo, carrinhos_por_modelo) for modelo in ['313', '314']])
+    conn.commit()
+    conn.close()
+
+def inserir(conn, tabela, colunas, linhas):
+    """INSERT só com as colunas que a tabela tem: versões antigas da API têm menos colunas"""
+    existentes = {coluna[1] for coluna in conn.execute(f'PRAGMA table_info({tabela})')}
+    indices = [i for i, coluna in enumerate(colunas) if coluna in existentes]
+    conn.executemany(
+        f"INSERT INTO {tabela} ({', '.join(colunas[i] for i in indices)}) "
+        f"VALUES ({', '.join('?' * len(indices))})",
+        [[linha[i] for i in indices] for linha in linhas])
+
+class ClienteVerificado:
+    """Cliente de testes que anota as chamadas sem resposta de sucesso.
+
+    Uma rota que falha antes da consulta sumiria do relatório dos planos
+    sem ninguém perceber; assim ela aparece como falha. Rotas que a API
+    verificada não tem (versões anteriores) são puladas e contadas à parte.
+    """
+
+    SUCESSO = {200, 201, 304}
+
+    def __init__(self, cliente, app):
+        self.cliente = cliente
+        self.rotas = app.url_map.bind('localhost')
+        self.erros = []
+        self.ausentes = set()
+
+    def _chamar(self, metodo, rota, **kwargs):
+        try:
+            self.rotas.match(rota.split('?')[0], method=metodo.upper())
+        except HTTPException:
+            self.ausentes.add(f'{metodo.upper()} {rota.split("?")[0]}')
+            return None
+        resposta = getattr(self.cliente, metodo)(rota, **kwargs)
+        if resposta.status_code not in self.SUCESSO:
+            consulta = kwargs.get('query_string')
+            self.erros.append(f"{metodo.upper()} {rota}{f' {consulta}' if consulta else ''}: "
+                              f"{resposta.status_code} {resposta.get_data(as_text=True)[:200]}")
+        return resposta
+
+    def get(self, rota, **kwargs):
+        return self._chamar('get', rota, **kwargs)
+
+    def post(self, rota, **kwargs):
+        return self._chamar('post', rota, **kwargs)
+
+    def delete(self, rota, **kwargs):
+        return self._chamar('delete', rota, **kwargs)
+
+def chamar_rotas(cliente):
+    """Exercita todas as rotas da API, na ordem de um turno normal"""
+    alerta = {'model': '313', 'operator': 'A2', 'part': 'Chassi'}
+    cliente.get('/alerts')
+    cliente.get('/alerts?model=313')
+    cliente.post('/alerts', json=alerta)
+    cliente.post('/alerts/stop', json=alerta)
+
+    cliente.post('/carrinhos/novo', json={'modelo': '313'})
+    cliente.get('/carrinhos/disponiveis/A1?model=313')
+    cliente.get('/carrinhos/disponiveis/A2?model=313')
+
+    resposta = cliente.post('/process/start', json={'model': '313', 'operator': 'A1', 'part': 'Eixos'})
+    carrinho_id = resposta.get_json().get('carrinho_id')
+    resposta = cliente.post('/process/end', json={'model': '313', 'operator': 'A1', 'part': 'Eixos',
+                                                  'carrinho_id': carrinho_id})
+    cliente.get('/station/313/A1/snapshot')
+    cliente.get('/station/313/A2/snapshot')
+    # A api.py já inicia o posto seguinte ao finalizar uma etapa
+    if 'next_operator' not in resposta.get_json():
+        cliente.post('/process/start', json={'model': '313', 'operator': 'A2', 'part': 'Chassi',
+                                             'carrinho_id': carrinho_id})
+    cliente.post('/process/end', json={'model': '313', 'operator': 'A2', 'part': 'Chassi',
+                                       'carrinho_id': carrinho_id})
+
+    for modelo in ['', '313']:
+        cliente.get(f'/process/status?model={modelo}' if modelo else '/process/status')
+        cliente.get(f'/process/times?model={modelo}' if modelo else '/process/times')
+        cliente.get(f'/carrinhos?modelo={modelo}' if modelo else '/carrinhos')
+        cliente.get(f'/carrinhos/ativos?model={modelo}' if modelo else '/carrinhos/ativos')
+
+    # Páginas do /process/times: por id e por intervalo de tempo
+    desde = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    cliente.get('/process/times', query_string={'model': '313', 'after_id': 100, 'limit': 50})
+    cliente.get('/process/times', query_string={'after_id': 100, 'limit': 50})
+    cliente.get('/process/times', query_string={'model': '313', 'since': desde, 'fields': 'id,duration'})
+    cliente.get('/process/times', query_string={'since': desde, 'until': datetime.now(timezone.utc).isoformat()})
+    cliente.get('/process/times', query_string={'since': desde, 'limit': 50})
+    cliente.get('/process/times', query_string={'since': desde, 'after_end': desde, 'after_id': 100, 'limit': 50})
+
+    cliente.get('/stats/stations')
+    cliente.get('/stats/stations?model=313')
+    cliente.get('/stats/stations?operator=A3')
+    cliente.get('/stats/throughput')
+    cliente.get('/stats/throughput', query_string={'model': '313', 'granularity': 'hour', 'since': desde})
+    cliente.get('/stats/throughput', query_string={'operator': 'A6'})
+    cliente.get('/analysis/bottleneck', query_string={'model': '313', 'since': desde})
+
+    # Exportações filtradas (sem filtro são varreduras completas por definição)
+    cliente.get('/export/process_times', query_string={'model': '313'})
+    cliente.get('/export/process_times', query_string={'since': desde, 'format': 'csv'})
+    cliente.get('/export/carrinho_etapas', query_string={'model': '313'})
+    cliente.get('/export/carrinho_etapas', query_string={'model': '313', 'since': desde})
+
+    # Rotas da api.py: carrinho avançado etapa a etapa e retrabalho
+    resposta = cliente.post('/carrinhos/iniciar', json={'modelo': '313'})
+    if resposta is not None:
+        carrinho_id = resposta.get_json()['carrinho_id']
+        cliente.get(f'/carrinhos/{carrinho_id}')
+        cliente.post(f'/carrinhos/{carrinho_id}/avancar', json={'operador': 'A2', 'parte': 'Chassi'})
+        resposta = cliente.post('/retrabalho', json={'carrinho_id': carrinho_id, 'operador_solicitante': 'A3',
+                                                     'operador_alvo': 'A2', 'parte': 'Chassi', 'motivo': 'teste'})
+        cliente.get('/retrabalhos')
+        cliente.post(f"/retrabalho/{resposta.get_json()['retrabalho_id']}/resolver")
+    resposta = cliente.post('/alerts', json=alerta)
+    if resposta.status_code == 201 and resposta.get_json().get('id'):
+        cliente.delete(f"/alerts/{resposta.get_json()['id']}")
+
+    cliente.get('/health')
+    cliente.post('/reset')
+
+def coletar_sql(api, cliente):
+    """Executa as rotas registrando todo SQL de dados enviado ao SQLite"""
+    executados = []
+    configurar_original = api.configure_connection
+
+    def configurar_com_rastreio(conn):
+        configurar_original(conn)
+        conn.set_trace_callback(executados.append)
+
+    api.db_pool.clear()
+    api.configure_connection = configurar_com_rastreio
+    try:
+        # Arquiva parte do histórico: as rotas passam a ler as duas bases
+        if hasattr(api, 'archive_finished_carts'):
+            conn = api.db_pool.acquire()
+            api.archive_finished_carts(conn, (datetime.now(timezone.utc) - timedelta(days=3)).isoformat())
+            conn.close()
+        chamar_rotas(cliente)
+    finally:
+        api.configure_connection = configurar_original
+        api.db_pool.clear()
+
+    # Agrupa o mesmo comando com parâmetros diferentes
+    vistos = {}
+    for sql in executados:
+        comando = sql.strip()
+        if not re.match(r'(WITH|SELECT|INSERT|UPDATE|DELETE)\b', comando, re.IGNORECASE):
+            continue
+        chave = re.sub(r"'[^']*'|\b\d+(\.\d+)?\b", '?', ' '.join(comando.split()))
+        vistos.setdefault(chave, comando)
+    return list(vistos.values())
+
+def indices_historico(conn):
+    """Índices não parciais das tabelas de histórico, nas duas bases.
+
+    Um índice parcial (como o das etapas abertas) só tem as linhas em
+    andamento e não cresce com o histórico.
+    """
+    bases = ['main'] + [linha[1] for linha in conn.execute('PRAGMA database_list') if linha[1] == 'arquivo']
+    indices = set()
+    for base in bases:
+        for nome, tabela, sql in conn.execute(f"SELECT name, tbl_name, sql FROM {base}.sqlite_master WHERE type = 'index'"):
+            if tabela in TABELAS_HISTORICO and not (sql and re.search(r'\bWHERE\b', sql, re.IGNORECASE)):
+                indices.add(nome)
+    return indices
+
+def filtros_alem_do_modelo(sql):
+    """Condições do WHERE que não são o modelo nem a ligação entre tabelas"""
+    where = re.search(r'\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)', sql, re.IGNORECASE | re.DOTALL)
+    if not where:
+        return []
+    return [condicao.strip() for condicao in re.split(r'\bAND\b', where.group(1), flags=re.IGNORECASE)
+            if not re.fullmatch(r"\s*(\w+\.)?model[o]?\s*=\s*('[^']*'|\?)\s*", condicao)
+            and not re.fullmatch(r'\s*\w+\.\w+\s*=\s*\w+\.\w+\s*', condicao)]
+
+def varreduras(conn, sql, indices):
+    """Linhas do plano que varrem uma tabela inteira sem índice, ou todo o histórico de um modelo"""
+    plano = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    # Subconsultas e CTEs materializadas não são tabelas do banco
+    derivadas = {encontrado.group(1) for encontrado in
+                 (re.match(r'(?:MATERIALIZE|CO-ROUTINE) (\w+)', linha[3]) for linha in plano) if encontrado}
+    problemas = []
+    for linha in plano:
+        detalhe = linha[3]
+        encontrado = re.match(r'SCAN (\w+)(?: AS \w+)?$', detalhe)
+        if encontrado and encontrado.group(1) not in TABELAS_PERMITIDAS | derivadas:
+            problemas.append(detalhe)
+        # Listar o modelo inteiro é o que a rota pede; percorrê-lo para filtrar outra coisa, não
+        encontrado = re.match(r'SEARCH \w+ USING (?:COVERING )?INDEX (\w+) \((?:model|modelo)=\?\)$', detalhe)
+        if encontrado and encontrado.group(1) in indices and filtros_alem_do_modelo(sql):
+            problemas.append(f'{detalhe} (percorre o modelo inteiro)')
+    return plano, problemas
+
+def main():
+    parser = argparse.ArgumentParser(description='Confere os planos de consulta de todas as rotas da API')
+    parser.add_argument('api', nargs='?', default=API_PADRAO)
+    parser.add_argument('--carrinhos', type=int, default=2000, help='carrinhos por modelo no banco de teste')
+    parser.add_argument('-v', '--verbose', action='store_true', help='mostra o plano de todas as consultas')
+    args = parser.parse_args()
+
+    api = carregar_api(args.api)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_db = os.path.join(pasta, 'alerts.db')
+        usar_banco(api, caminho_db)
+        popular_banco(caminho_db, args.carrinhos)
+
+        cliente = ClienteVerificado(api.app.test_client(), api.app)
+        comandos = coletar_sql(api, cliente)
+
+        falhas = 0
+        conn = sqlite3.connect(caminho_db)
+        if hasattr(api, 'archive_path'):
+            conn.execute('ATTACH DATABASE ? AS arquivo', (api.archive_path(caminho_db),))
+        indices = indices_historico(conn)
+        for sql in comandos:
+            plano, problemas = varreduras(conn, sql, indices)
+            # Listagens completas, sem filtro, são varreduras por definição
+            if problemas and not re.search(r'\bWHERE\b', sql, re.IGNORECASE):
+                problemas = []
+            if problemas:
+                falhas += 1
+            if problemas or args.verbose:
+                print('FALHA' if problemas else 'ok', ' '.join(sql.split()))
+                for linha in plano:
+                    print('    ', linha[3])
+        conn.close()
+        api.db_pool.clear()
+
+    for erro in cliente.erros:
+        print('FALHA', erro)
+    print(f'{len(comandos)} consultas verificadas, {falhas} com varredura, '
+          f'{len(cliente.erros)} chamadas com erro'
+          + (f', {len(cliente.ausentes)} rotas que esta API não tem' if cliente.ausentes else ''))
+    return 1 if falhas or cliente.erros else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# Custo da animação da tela inicial do quiosque
+#
+# Abre a tela inicial de verdade (precisa de display) e roda a animação por
+# alguns segundos de duas formas: a antiga, que apagava o canvas e recriava
+# 400 linhas do gradiente e as três ondas a cada quadro, e a atual do
+# main.py, que só move as linhas já criadas. Mostra o tempo de cada quadro
+# (cálculo + redesenho), os quadros por segundo e o uso de CPU do processo.
+#
+# Uso: python bench_animacao.py [--segundos 10]
+
+import argparse
+import math
+import statistics
+import sys
+import time
+import tkinter as tk
+
+import main as quiosque
+
+def quadro_antigo(canvas, offset):
+    """A versão anterior do draw_wave_animation, para comparação"""
+    canvas.delete("all")
+    width, height = 400, 100
+    for i in range(width):
+        r = int(236 - (236 - 52) * i / width)
+        g = int(240 - (240 - 152) * i / width)
+        b = int(241 - (241 - 219) * i / width)
+        canvas.create_line(i, 0, i, height, fill=f'#{r:02x}{g:02x}{b:02x}')
+    points1, points2, points3 = [], [], []
+    for x in range(0, width, 5):
+        points1 += [x, height/2 + 15 * math.sin((x + offset) * 0.05)]
+        points2 += [x, height/2 + 10 * math.cos((x + offset) * 0.08 + 0.5) + 8]
+        points3 += [x, height/2 + 8 * math.sin((x + offset) * 0.07 + 1.0) - 8]
+    canvas.create_line(points1, fill="#3498db", smooth=True, width=3)
+    canvas.create_line(points2, fill="#2980b9", smooth=True, width=2)
+    canvas.create_line(points3, fill="#1abc9c", smooth=True, width=2)
+    canvas.update_idletasks()
+
+def medir_antiga(root, segundos):
+    tempos = []
+    offset = 0
+    proximo = None
+    def quadro():
+        nonlocal offset, proximo
+        inicio = time.perf_counter()
+        quadro_antigo(quiosque.wave_canvas, offset)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        offset += 2
+        proximo = root.after(30, quadro)
+    proximo = root.after(0, quadro)
+    resultado = rodar(root, segundos, tempos)
+    root.after_cancel(proximo)
+    return resultado
+
+def medir_atual(root, segundos):
+    quiosque.tempos_quadro.clear()
+    quiosque.start_wave_animation()
+    resultado = rodar(root, segundos, quiosque.tempos_quadro)
+    quiosque.stop_wave_animation()
+    return resultado
+
+def rodar(root, segundos, tempos):
+    """Roda o loop do Tk por `segundos`; devolve (tempos, fps, % de CPU)"""
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    root.after(int(segundos * 1000), root.quit)
+    root.mainloop()
+    duracao = time.perf_counter() - inicio
+    return list(tempos), len(tempos) / duracao, (time.process_time() - inicio_cpu) / duracao * 100
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de quadro da animação da tela inicial')
+    parser.add_argument('--segundos', type=float, default=10)
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f'bench_animacao.py precisa de display: {e}')
+        return 1
+    quiosque.root = root
+    quiosque.WAVE_REPORT_S = float('inf')
+    quiosque.setup_main_screen()
+    quiosque.stop_wave_animation()
+    root.update()
+
+    antiga = medir_antiga(root, args.segundos)
+    for widget in root.winfo_children():
+        widget.destroy()
+    quiosque.cancel_pending_callbacks()
+    quiosque.setup_main_screen()
+    quiosque.stop_wave_animation()
+    atual = medir_atual(root, args.segundos)
+    root.destroy()
+
+    print(f"{'versão':<8} {'quadro p50 ms':>14} {'p95 ms':>8} {'fps':>6} {'CPU %':>7}")
+    for nome, (tempos, fps, cpu) in [('antiga', antiga), ('atual', atual)]:
+        tempos = sorted(tempos)
+        print(f'{nome:<8} {statistics.median(tempos):>14.2f} {tempos[int(len(tempos) * 0.95)]:>8.2f} '
+              f'{fps:>6.1f} {cpu:>7.1f}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
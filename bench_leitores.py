@@ -0,0 +1,87 @@
+# Vazão da thread serial com vários leitores RFID
+#
+# Cria uma porta simulada por leitor (pseudo-terminal do simulador_rfid, só
+# Linux/macOS), aponta o LEITORES_RFID do main.py para elas e usa a mesma thread de leitura do quiosque. Cada
+# leitor simulado envia cartões únicos em rajadas; no fim mostra cartões por
+# segundo, quantos chegaram de cada leitor e a latência entre a escrita no
+# terminal e o cartão na fila do Tk. Com --intervalo 0 os leitores escrevem
+# o mais rápido possível e a latência passa a medir a fila acumulada.
+#
+# Uso: python bench_leitores.py [--leitores 12] [--cartoes 2000] [--intervalo 0.002]
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+import main as quiosque
+from simulador_rfid import PortaSimulada
+
+def enviar(indice, porta, cartoes, intervalo, enviados):
+    """Escreve os cartões do leitor `indice`, guardando o instante de cada escrita"""
+    for seq in range(cartoes):
+        rfid = f'{indice:02X}{seq:06X}'
+        enviados[rfid] = time.perf_counter()
+        porta.escrever(f'{rfid}\r\n'.encode())
+        if intervalo:
+            time.sleep(intervalo)
+
+def main():
+    parser = argparse.ArgumentParser(description='Cartões por segundo com vários leitores na mesma thread')
+    parser.add_argument('--leitores', type=int, default=12)
+    parser.add_argument('--cartoes', type=int, default=2000, help='cartões enviados por leitor')
+    parser.add_argument('--intervalo', type=float, default=0.002, help='segundos entre cartões de um leitor (0 = sem pausa)')
+    args = parser.parse_args()
+
+    if os.name != 'posix':
+        print('bench_leitores.py precisa de pseudo-terminais (Linux/macOS)')
+        return 1
+
+    portas = [PortaSimulada() for _ in range(args.leitores)]
+    quiosque.LEITORES_RFID = {f'L{i:02d}': porta.caminho for i, porta in enumerate(portas)}
+    if not quiosque.init_serial():
+        return 1
+    leitor_thread = threading.Thread(target=quiosque.serial_thread_function, daemon=True)
+    leitor_thread.start()
+
+    enviados = {}
+    total = args.leitores * args.cartoes
+    inicio = time.perf_counter()
+    escritores = [threading.Thread(target=enviar, args=(i, porta, args.cartoes, args.intervalo, enviados))
+                  for i, porta in enumerate(portas)]
+    for escritor in escritores:
+        escritor.start()
+
+    por_leitor, latencias = {}, []
+    prazo = time.perf_counter() + 30
+    while len(latencias) < total and time.perf_counter() < prazo:
+        try:
+            leitor_id, rfid, lido_em = quiosque.fila_rfid.get(timeout=1)
+        except quiosque.queue.Empty:
+            continue
+        por_leitor[leitor_id] = por_leitor.get(leitor_id, 0) + 1
+        latencias.append((lido_em - enviados[rfid]) * 1000)
+    duracao = time.perf_counter() - inicio
+
+    quiosque.running = False
+    for escritor in escritores:
+        escritor.join()
+    leitor_thread.join()
+    for leitor in quiosque.leitores:
+        quiosque.fechar_leitor(leitor)
+    for porta in portas:
+        porta.fechar()
+
+    latencias.sort()
+    print(f'{len(latencias)}/{total} cartões de {args.leitores} leitores em {duracao:.2f} s '
+          f'({len(latencias) / duracao:.0f} cartões/s)')
+    print(f'  por leitor: {min(por_leitor.values(), default=0)}..{max(por_leitor.values(), default=0)}')
+    if latencias:
+        print(f'  escrita -> fila: p50 {statistics.median(latencias):.2f} ms, '
+              f'p99 {latencias[int(len(latencias) * 0.99) - 1]:.2f} ms, máx {latencias[-1]:.2f} ms')
+    return 0 if len(latencias) == total else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# Tempo de reconexão do leitor RFID do quiosque
+#
+# Simula um adaptador USB (pseudo-terminal do simulador_rfid, só
+# Linux/macOS) que some e volta várias vezes, às vezes com outro nome de
+# porta, como a COM que muda de número no Windows. A lista de portas do
+# sistema é trocada por uma falsa que mostra o adaptador com VID/PID fixos
+# enquanto ele está "plugado". Começa com o leitor fora (o quiosque tem que
+# abrir assim mesmo) e mede, a cada volta, o tempo até o leitor estar
+# conectado de novo e até um cartão chegar à fila.
+#
+# Uso: python bench_reconexao.py [--ciclos 10]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import main as quiosque
+from simulador_rfid import PortaSimulada
+
+VID, PID = 0x1A86, 0x7523  # CH340, o adaptador dos leitores
+
+def esperar(condicao, prazo=5):
+    """Segundos até a condição valer (None se passou do prazo)"""
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < prazo:
+        if condicao():
+            return time.perf_counter() - inicio
+        time.sleep(0.001)
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconexão do leitor RFID depois de desplugar')
+    parser.add_argument('--ciclos', type=int, default=10)
+    args = parser.parse_args()
+
+    if os.name != 'posix':
+        print('bench_reconexao.py precisa de pseudo-terminais (Linux/macOS)')
+        return 1
+
+    plugadas = []
+    quiosque.list_ports = SimpleNamespace(comports=lambda: list(plugadas))
+    quiosque.LEITORES_RFID = {'A1': f'usb:{VID:04X}:{PID:04X}'}
+    if quiosque.init_serial():
+        print('FALHA: o leitor abriu sem estar plugado')
+        return 1
+    leitor = quiosque.leitores[0]
+    thread = threading.Thread(target=quiosque.serial_thread_function, daemon=True)
+    thread.start()
+
+    sorteio = random.Random(1)
+    reconexoes, cartoes, portas_usadas, ocupadas = [], [], set(), []
+    porta = None
+    for ciclo in range(args.ciclos + 1):
+        if porta:
+            # Desplugar: a leitura falha e o adaptador some da lista
+            plugadas.clear()
+            porta.fechar()
+            if esperar(lambda: leitor['estado'] == 'reconectando') is None:
+                print(f'FALHA ciclo {ciclo}: desconexão não percebida')
+                return 1
+            time.sleep(sorteio.uniform(0.1, 1.5))
+            if ciclo % 2:
+                ocupadas.append(PortaSimulada())  # a próxima porta volta com outro nome
+
+        porta = PortaSimulada()
+        portas_usadas.add(porta.caminho)
+        plugadas.append(SimpleNamespace(device=porta.caminho, vid=VID, pid=PID, serial_number=None))
+        tempo = esperar(lambda: leitor['estado'] == 'conectado' and leitor['dispositivo'] == porta.caminho)
+        if tempo is None:
+            print(f'FALHA ciclo {ciclo}: não reconectou em 5 s')
+            return 1
+        reconexoes.append(tempo * 1000)
+
+        rfid = f'{ciclo:08X}'
+        enviado = time.perf_counter()
+        porta.escrever(f'{rfid}\r\n'.encode())
+        while True:
+            leitor_id, recebido, lido_em = quiosque.fila_rfid.get(timeout=2)
+            if recebido == rfid:
+                cartoes.append((lido_em - enviado) * 1000)
+                break
+
+    quiosque.running = False
+    thread.join()
+    quiosque.fechar_leitor(leitor)
+    porta.fechar()
+    for ocupada in ocupadas:
+        ocupada.fechar()
+
+    print(f'{args.ciclos} desconexões, {len(portas_usadas)} nomes de porta diferentes')
+    print(f'  até conectar: p50 {statistics.median(reconexoes):.0f} ms, máx {max(reconexoes):.0f} ms')
+    print(f'  cartão logo depois: p50 {statistics.median(cartoes):.2f} ms, máx {max(cartoes):.2f} ms')
+    return 0 if max(reconexoes) < 1000 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# Benchmark do caminho do cartão no quiosque, do toque ao process_rfid
+#
+# Reproduz toques sintéticos (ou gravados) em portas simuladas e roda o
+# mesmo código do quiosque: a thread serial, a fila e o processar_fila_rfid
+# chamado a cada RFID_POLL_MS como no loop do Tk (sem janela). Mostra:
+#   - vazão do parser (extrair_linhas + rfid_valido) sobre os mesmos bytes;
+#   - cartões perdidos, duplicados aceitos e lixo que passou como cartão;
+#   - latência do toque (fim da linha na porta) até o process_rfid.
+# Termina com código 1 se houver perda, duplicado aceito ou lixo aceito.
+#
+# Uso: python bench_rfid.py [--leitores 1] [--toques 1000] [--taxa 100] [--modo pty|loop]
+#                           [--salvar toques.txt | --toques-gravados toques.txt]
+
+import argparse
+import contextlib
+import heapq
+import os
+import statistics
+import sys
+import time
+
+import main as quiosque
+import simulador_rfid
+
+class LoopTk:
+    """O suficiente do root do Tk para o processar_fila_rfid rodar sem janela"""
+
+    def __init__(self):
+        self.agendados = []
+        self.contador = 0
+
+    def after(self, ms, funcao):
+        self.contador += 1
+        heapq.heappush(self.agendados, (time.perf_counter() + ms / 1000, self.contador, funcao))
+
+    def update_idletasks(self):
+        pass
+
+    def rodar_ate(self, fim):
+        while self.agendados and time.perf_counter() < fim:
+            quando, _, funcao = heapq.heappop(self.agendados)
+            espera = quando - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            funcao()
+
+def vazao_parser(roteiros, repeticoes=5):
+    """Linhas por segundo e MB/s do parser sobre as escritas do roteiro"""
+    pedacos = [dados for escritas in roteiros for _, _, _, dados in escritas]
+    total_bytes = sum(len(dados) for dados in pedacos)
+    melhor, linhas = float('inf'), 0
+    for _ in range(repeticoes):
+        buffer = bytearray()
+        inicio = time.perf_counter()
+        linhas = 0
+        for dados in pedacos:
+            for linha in quiosque.extrair_linhas(buffer, dados):
+                quiosque.rfid_valido(linha)
+                linhas += 1
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return linhas / melhor, total_bytes / melhor / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Toques simulados até o process_rfid do quiosque')
+    parser.add_argument('--leitores', type=int, default=1)
+    parser.add_argument('--toques', type=int, default=1000, help='toques por leitor')
+    parser.add_argument('--taxa', type=float, default=100, help='toques por segundo por leitor')
+    parser.add_argument('--modo', choices=['pty', 'loop'], default='pty' if os.name == 'posix' else 'loop')
+    parser.add_argument('--malformados', type=float, default=0.05, help='fração de linhas de lixo')
+    parser.add_argument('--parciais', type=float, default=0.1, help='fração de linhas em pedaços')
+    parser.add_argument('--duplicados', type=float, default=0.05, help='fração de rajadas do mesmo cartão')
+    parser.add_argument('--salvar', help='grava os toques gerados (do primeiro leitor) neste arquivo')
+    parser.add_argument('--toques-gravados', help='reproduz este arquivo em todos os leitores')
+    args = parser.parse_args()
+
+    if args.toques_gravados:
+        gravados = simulador_rfid.carregar_toques(args.toques_gravados)
+        roteiros = [gravados] * args.leitores
+    else:
+        roteiros = [simulador_rfid.gerar_toques(args.toques, args.taxa, indice, args.malformados,
+                                                args.parciais, args.duplicados, semente=indice + 1)
+                    for indice in range(args.leitores)]
+    if args.salvar:
+        simulador_rfid.salvar_toques(args.salvar, roteiros[0])
+
+    linhas_s, mb_s = vazao_parser(roteiros)
+
+    portas = [simulador_rfid.PortaSimulada(args.modo) for _ in range(args.leitores)]
+    quiosque.LEITORES_RFID = {f'L{i:02d}': porta.caminho for i, porta in enumerate(portas)}
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        if not quiosque.init_serial():
+            return 1
+    for porta, leitor in zip(portas, quiosque.leitores):
+        porta.ligar(leitor)
+
+    # Cada chamada do process_rfid é anotada; aceita é a que entrou no cache de repetidos
+    chamadas, aceitos = [], []
+    process_rfid = quiosque.process_rfid
+    def anotar(rfid_data, leitor_id):
+        agora = time.perf_counter()
+        antes = time.time()
+        process_rfid(rfid_data, leitor_id)
+        chamadas.append(rfid_data)
+        if quiosque.leituras_recentes.get(leitor_id, {}).get(rfid_data, float('-inf')) >= antes:
+            aceitos.append((leitor_id, rfid_data, agora))
+    quiosque.process_rfid = anotar
+    quiosque.root = LoopTk()
+
+    enviados = {}
+    duracao_roteiro = max(escritas[-1][0] for escritas in roteiros if escritas)
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        leitor_thread = quiosque.threading.Thread(target=quiosque.serial_thread_function, daemon=True)
+        leitor_thread.start()
+        quiosque.processar_fila_rfid()
+        escritores = simulador_rfid.iniciar_reproducao(portas, roteiros, enviados)
+        inicio = time.perf_counter()
+        quiosque.root.rodar_ate(inicio + duracao_roteiro + 0.5)
+        duracao = time.perf_counter() - inicio
+
+        quiosque.running = False
+        for escritor in escritores:
+            escritor.join()
+        leitor_thread.join()
+        for leitor in quiosque.leitores:
+            quiosque.fechar_leitor(leitor)
+    for porta in portas:
+        porta.fechar()
+
+    # Nos arquivos gravados todos os leitores mandam os mesmos cartões
+    esperados = {(f'L{i:02d}', rfid) for i, escritas in enumerate(roteiros) for _, _, rfid, _ in escritas if rfid}
+    vistos = [(leitor_id, rfid) for leitor_id, rfid, _ in aceitos]
+    perdidos = esperados - set(vistos)
+    duplicados = len(vistos) - len(set(vistos))
+    lixo = [rfid for leitor_id, rfid in vistos if (leitor_id, rfid) not in esperados]
+    latencias = sorted((agora - enviados[rfid]) * 1000 for _, rfid, agora in aceitos if rfid in enviados)
+    tipos = {}
+    for escritas in roteiros:
+        for _, tipo, _, _ in escritas:
+            tipos[tipo] = tipos.get(tipo, 0) + 1
+
+    print(f'{len(esperados)} cartões de {args.leitores} leitor(es) em {duracao:.2f} s ({args.modo}); '
+          f'escritas: {dict(sorted(tipos.items()))}')
+    print(f'  parser: {linhas_s:,.0f} linhas/s ({mb_s:.1f} MB/s)')
+    print(f'  process_rfid: {len(chamadas)} chamadas, {len(aceitos)} aceitas, '
+          f'{len(chamadas) - len(aceitos)} repetições filtradas ({len(aceitos) / duracao:.0f} aceitas/s)')
+    print(f'  perdidos: {len(perdidos)}, duplicados aceitos: {duplicados}, lixo aceito: {len(lixo)}')
+    if latencias:
+        print(f'  toque -> process_rfid: p50 {statistics.median(latencias):.2f} ms, '
+              f'p95 {latencias[int(len(latencias) * 0.95) - 1]:.2f} ms, '
+              f'p99 {latencias[int(len(latencias) * 0.99) - 1]:.2f} ms, máx {latencias[-1]:.2f} ms')
+    for leitor_id, rfid in sorted(perdidos)[:5]:
+        print(f'  FALHA perdido: {rfid} no {leitor_id}')
+    for rfid in lixo[:5]:
+        print(f'  FALHA lixo aceito: {rfid!r}')
+    return 1 if perdidos or duplicados or lixo else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
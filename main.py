@@ -6,6 +6,11 @@ import csv
 from datetime import datetime
 import math
 import threading
+import queue
+import selectors
+import statistics
+from collections import deque
+from serial.tools import list_ports
 from PIL import Image, ImageTk
 import os
 import json
@@ -15,6 +20,29 @@ import atexit
 # ---------------- CONFIGURAÇÕES ----------------
 PORTA_SERIAL = 'COM6'  
 BAUD_RATE = 9600
+SERIAL_TIMEOUT = 0.5  # a leitura volta assim que chega um byte; o timeout só serve para notar o fim do programa
+RFID_BUFFER_SIZE = 256  # bytes guardados à espera do fim da linha (o resto é lixo da serial)
+RFID_POLL_MS = 10  # intervalo em que o loop do Tk esvazia a fila de cartões
+RFID_POLL_INTERVAL = 0.005  # sondagem das portas sem fileno() (Windows) quando há mais de uma
+RFID_DEDUP_TTL = 2  # segundos em que o mesmo cartão no mesmo leitor é ignorado
+RFID_RECONEXAO_MIN = 0.05  # primeira nova tentativa depois de perder um leitor (s)
+RFID_RECONEXAO_MAX = 0.5  # teto do backoff: com o leitor de volta, reconecta em menos de 1 s
+WAVE_FRAME_MS = 30  # intervalo entre quadros da animação da tela inicial (~33 fps)
+WAVE_FRAME_MS_MAX = 100  # teto quando o PC não dá conta (10 fps)
+WAVE_CPU_MAX = 0.25  # fração máxima do intervalo que um quadro pode gastar
+WAVE_HIDDEN_MS = 500  # com a janela minimizada só confere de novo a cada meio segundo
+WAVE_REPORT_S = 60  # intervalo do resumo de tempo de quadro no console
+
+# Leitores RFID: estação -> porta. MDC_RFID_LEITORES="A1=COM6,A2=COM7" atende
+# vários postos no mesmo PC; sem a variável, um leitor na PORTA_SERIAL. A porta
+# também pode ser "usb:VID:PID" (ex.: usb:1A86:7523) para achar o adaptador
+# qualquer que seja o número da COM
+LEITORES_RFID = {PORTA_SERIAL: PORTA_SERIAL}
+if os.environ.get('MDC_RFID_LEITORES'):
+    LEITORES_RFID = {}
+    for item in os.environ['MDC_RFID_LEITORES'].split(','):
+        estacao, _, porta = item.strip().rpartition('=')
+        LEITORES_RFID[estacao or porta] = porta
 
 # IDs cadastrados
 operadores = {
@@ -71,12 +99,20 @@ area_var = None
 peca_var = None
 quantidade_entry = None
 form_frame = None
-ultimo_rfid_lido = None
-ultimo_tempo_leitura = 0
+leituras_recentes = {}  # leitor -> {cartão: instante da última leitura aceita}
 bloquear_leitura = False
-wave_offset = 0  # Para animação
-ser = None
+wave_offset = 0.0  # Para animação (avança WAVE_VELOCIDADE por segundo)
+wave_items = []  # linhas das ondas no canvas, criadas uma vez por tela
+wave_callback = None  # próximo quadro agendado
+wave_intervalo_ms = WAVE_FRAME_MS  # intervalo atual, ajustado pelo custo dos quadros
+wave_ultimo_quadro = None
+wave_relatorio_em = 0
+tempos_quadro = deque(maxlen=300)  # ms gastos por quadro (cálculo + desenho)
+leitores = []  # um dict por leitor: id, porta, ser e buffer (bytes ainda sem fim de linha)
 serial_thread = None
+fila_rfid = queue.Queue()  # (leitor, cartão, instante da leitura) da thread serial para o Tk
+fila_estados = queue.Queue()  # avisos de conexão dos leitores para o status (None = estado atual)
+latencias_rfid = deque(maxlen=200)  # ms entre a leitura e o cartão na tela
 running = True
 last_activity_time = time.time()
 wave_animation_active = False
@@ -94,6 +130,30 @@ pending_callbacks = {}  # Para gerenciar callbacks agendados
 # Dicionário para manter referências das imagens (evita garbage collection)
 IMAGES = {}
 
+# Ondas da tela inicial: (amplitude, frequência, fase, deslocamento vertical, cor, espessura)
+WAVE_WIDTH, WAVE_HEIGHT, WAVE_STEP = 400, 100, 5
+WAVE_VELOCIDADE = 2 / 0.030  # unidades por segundo (antes: 2 por quadro de 30 ms)
+ONDAS = [
+    (15, 0.05, 0.0, 0, "#3498db", 3),
+    (10, 0.08, 0.5 + math.pi / 2, 8, "#2980b9", 2),  # o cosseno da versão anterior
+    (8, 0.07, 1.0, -8, "#1abc9c", 2),
+]
+WAVE_XS = list(range(0, WAVE_WIDTH, WAVE_STEP))
+
+def tabela_onda(amplitude, frequencia, fase, deslocamento):
+    """Alturas da onda para cada posição inteira, calculadas uma vez.
+
+    O período é arredondado para um número inteiro de posições, então a
+    tabela dá a volta sem emenda: cada quadro só fatia a lista.
+    """
+    periodo = round(2 * math.pi / frequencia)
+    k = 2 * math.pi / periodo
+    valores = [WAVE_HEIGHT / 2 + deslocamento + amplitude * math.sin(k * n + fase)
+               for n in range(periodo + WAVE_WIDTH)]
+    return periodo, valores
+
+TABELAS_ONDA = [tabela_onda(*onda[:4]) for onda in ONDAS]
+
 # ---------------- FUNÇÕES DE ESTOQUE ----------------
 
 def carregar_estoque():
@@ -664,15 +724,14 @@ def salvar_configuracao_admin(area_entry, quant_entry, min_entry, tree):
 
 def voltar_tela_inicial():
     """Volta para a tela inicial de login"""
-    global bloquear_leitura, ultimo_rfid_lido, ultimo_tempo_leitura, current_user, current_user_role, current_model
+    global bloquear_leitura, current_user, current_user_role, current_model
     
     # Resetar todas as variáveis de sessão
     current_user = None
     current_user_role = None
     current_model = None
     bloquear_leitura = False
-    ultimo_rfid_lido = None
-    ultimo_tempo_leitura = 0
+    leituras_recentes.clear()
     
     # Cancelar todos os callbacks pendentes
     cancel_pending_callbacks()
@@ -689,60 +748,96 @@ def voltar_tela_inicial():
 
 # ---------------- FUNÇÕES DE ANIMAÇÃO E GUI ----------------
 
+def imagem_gradiente():
+    """Fundo gradiente da animação, renderizado uma vez e reaproveitado"""
+    if 'onda_fundo' not in IMAGES:
+        linha = Image.new('RGB', (WAVE_WIDTH, 1))
+        linha.putdata([(int(236 - (236 - 52) * i / WAVE_WIDTH),
+                        int(240 - (240 - 152) * i / WAVE_WIDTH),
+                        int(241 - (241 - 219) * i / WAVE_WIDTH)) for i in range(WAVE_WIDTH)])
+        IMAGES['onda_fundo'] = ImageTk.PhotoImage(linha.resize((WAVE_WIDTH, WAVE_HEIGHT), Image.NEAREST))
+    return IMAGES['onda_fundo']
+
+def criar_itens_onda():
+    """Cria o fundo e as linhas das ondas no canvas; os quadros só movem as linhas"""
+    global wave_items
+    wave_canvas.create_image(0, 0, image=imagem_gradiente(), anchor='nw')
+    wave_items = [wave_canvas.create_line(0, 0, 0, 0, fill=cor, smooth=True, width=espessura)
+                  for _, _, _, _, cor, espessura in ONDAS]
+
 def draw_wave_animation():
-    """Desenha a animação de onda"""
-    global wave_offset, wave_animation_active
+    """Desenha um quadro da animação de onda"""
+    global wave_offset, wave_callback, wave_ultimo_quadro
     
-    if not wave_animation_active or not wave_canvas:
-        if running:
-            schedule_callback(100, draw_wave_animation)
+    wave_callback = None
+    if not wave_animation_active or not running or not wave_canvas or not wave_canvas.winfo_exists():
         return
     
-    wave_canvas.delete("all")
-    width, height = 400, 100
-    
-    # Fundo gradiente
-    for i in range(width):
-        r = int(236 - (236 - 52) * i / width)
-        g = int(240 - (240 - 152) * i / width)
-        b = int(241 - (241 - 219) * i / width)
-        color = f'#{r:02x}{g:02x}{b:02x}'
-        wave_canvas.create_line(i, 0, i, height, fill=color)
-    
-    # Ondas animadas
-    points1 = []
-    points2 = []
-    points3 = []
-    for x in range(0, width, 5):
-        y1 = height/2 + 15 * math.sin((x + wave_offset) * 0.05)
-        y2 = height/2 + 10 * math.cos((x + wave_offset) * 0.08 + 0.5) + 8
-        y3 = height/2 + 8 * math.sin((x + wave_offset) * 0.07 + 1.0) - 8
-        points1.append(x)
-        points1.append(y1)
-        points2.append(x)
-        points2.append(y2)
-        points3.append(x)
-        points3.append(y3)
-    
-    if len(points1) > 2:
-        wave_canvas.create_line(points1, fill="#3498db", smooth=True, width=3)
-        wave_canvas.create_line(points2, fill="#2980b9", smooth=True, width=2)
-        wave_canvas.create_line(points3, fill="#1abc9c", smooth=True, width=2)
-    
-    wave_offset += 2
-    if wave_animation_active and running:
-        schedule_callback(30, draw_wave_animation)
+    if not wave_canvas.winfo_viewable():
+        # Janela minimizada: não desenha nada, só confere de novo mais tarde
+        wave_ultimo_quadro = None
+        wave_callback = schedule_callback(WAVE_HIDDEN_MS, draw_wave_animation)
+        return
+    
+    inicio = time.perf_counter()
+    atraso = 0
+    if wave_ultimo_quadro is not None:
+        # A velocidade não depende do fps: avança pelo tempo que passou
+        decorrido = inicio - wave_ultimo_quadro
+        wave_offset += decorrido * WAVE_VELOCIDADE
+        atraso = decorrido * 1000 - wave_intervalo_ms
+    wave_ultimo_quadro = inicio
+    
+    posicao = int(wave_offset)
+    for item, (periodo, valores) in zip(wave_items, TABELAS_ONDA):
+        i = posicao % periodo
+        ys = valores[i:i + WAVE_WIDTH:WAVE_STEP]
+        wave_canvas.coords(item, [v for ponto in zip(WAVE_XS, ys) for v in ponto])
+    
+    # Desenha agora para o tempo do quadro incluir o redesenho do canvas
+    wave_canvas.update_idletasks()
+    custo = (time.perf_counter() - inicio) * 1000
+    registrar_quadro(custo)
+    ajustar_fps(atraso, custo)
+    wave_callback = schedule_callback(int(wave_intervalo_ms), draw_wave_animation)
+
+def ajustar_fps(atraso, custo):
+    """Diminui o fps quando os quadros atrasam ou pesam; volta aos poucos ao WAVE_FRAME_MS"""
+    global wave_intervalo_ms
+    minimo = max(WAVE_FRAME_MS, custo / WAVE_CPU_MAX)
+    if atraso > wave_intervalo_ms / 2:
+        wave_intervalo_ms = wave_intervalo_ms * 1.5
+    else:
+        wave_intervalo_ms = wave_intervalo_ms - 1
+    wave_intervalo_ms = min(max(wave_intervalo_ms, minimo), WAVE_FRAME_MS_MAX)
+
+def registrar_quadro(custo):
+    """Guarda o tempo do quadro e mostra um resumo a cada WAVE_REPORT_S segundos"""
+    global wave_relatorio_em
+    tempos_quadro.append(custo)
+    agora = time.time()
+    if agora - wave_relatorio_em >= WAVE_REPORT_S:
+        wave_relatorio_em = agora
+        ordenados = sorted(tempos_quadro)
+        print(f"Animação: quadro em {statistics.median(ordenados):.2f} ms "
+              f"(p95 {ordenados[int(len(ordenados) * 0.95)]:.2f} ms), "
+              f"{1000 / wave_intervalo_ms:.0f} fps")
 
 def start_wave_animation():
-    """Inicia a animação das ondas"""
-    global wave_animation_active
+    """Inicia a animação das ondas (uma só sequência de quadros por vez)"""
+    global wave_animation_active, wave_ultimo_quadro
+    if wave_callback:
+        cancel_callback(wave_callback)
     wave_animation_active = True
+    wave_ultimo_quadro = None
     draw_wave_animation()
 
 def stop_wave_animation():
     """Para a animação das ondas"""
     global wave_animation_active
     wave_animation_active = False
+    if wave_callback:
+        cancel_callback(wave_callback)
 
 def setup_main_screen():
     """Configura a tela inicial"""
@@ -762,14 +857,15 @@ def setup_main_screen():
              font=("Arial", 12), bg='white', fg='#7f8c8d').pack(pady=(5, 0))
     
     # Canvas para animação
-    wave_canvas = tk.Canvas(main_frame, width=400, height=100, bg='white', highlightthickness=0)
+    wave_canvas = tk.Canvas(main_frame, width=WAVE_WIDTH, height=WAVE_HEIGHT, bg='white', highlightthickness=0)
     wave_canvas.pack(pady=20)
+    criar_itens_onda()
     
     # Status
     status_frame = tk.Frame(main_frame, bg='white')
     status_frame.pack(pady=20)
     
-    status_label = tk.Label(status_frame, text="RFID leitor iniciado", 
+    status_label = tk.Label(status_frame, text=texto_estado_leitores(), 
                            font=("Arial", 10), bg='white', fg='#34495e')
     status_label.pack()
     
@@ -779,115 +875,328 @@ def setup_main_screen():
 # ---------------- FUNÇÕES DE SERIAL/RFID ----------------
 
 def init_serial():
-    """Inicializa a comunicação serial"""
-    global ser
+    """Abre as portas de todos os leitores; True se ao menos uma conectou.
+
+    Os que não abrirem ficam com a reconexão agendada na thread serial; os
+    com a porta mal configurada são avisados no console e ficam de fora.
+    """
+    global leitores
+    leitores = []
+    for estacao, porta in LEITORES_RFID.items():
+        try:
+            usb = usb_configurado(porta)
+        except ValueError as e:
+            print(f"Configuração inválida do leitor {estacao} ({porta}): {e}")
+            continue
+        leitores.append({'id': estacao, 'porta': porta, 'ser': None, 'buffer': bytearray(),
+                         'dispositivo': None, 'usb': usb, 'estado': 'iniciando',
+                         'espera': RFID_RECONEXAO_MIN, 'proxima_tentativa': 0})
+    for leitor in leitores:
+        abrir_leitor(leitor)
+    return any(leitor['ser'] for leitor in leitores)
+
+def usb_configurado(porta):
+    """(VID, PID) de uma porta escrita como "usb:VID:PID", senão None.
+
+    Levanta ValueError se o VID e o PID não forem dois números hexadecimais.
+    """
+    if not porta.lower().startswith('usb:'):
+        return None
+    partes = porta.split(':')
+    if len(partes) != 3 or not all(0 < len(parte) <= 4 and all(c in '0123456789abcdefABCDEF' for c in parte)
+                                   for parte in partes[1:]):
+        raise ValueError("esperado usb:VID:PID em hexadecimal, como usb:1A86:7523")
+    return (int(partes[1], 16), int(partes[2], 16), None)
+
+def identificar_usb(dispositivo):
+    """(VID, PID, número de série) do adaptador USB da porta, se houver"""
+    for info in list_ports.comports():
+        if info.device == dispositivo and info.vid is not None:
+            return (info.vid, info.pid, info.serial_number)
+    return None
+
+def localizar_porta(leitor):
+    """Porta a abrir; None se o adaptador USB do leitor não está na lista do sistema.
+
+    Quando o USB volta com outro número de COM, a porta é achada pelo VID/PID
+    (e número de série, se o adaptador tiver), sem pegar a de outro leitor.
+    """
+    if not leitor['usb']:
+        return leitor['porta']
+    vid, pid, serie = leitor['usb']
+    em_uso = {outro['dispositivo'] for outro in leitores if outro['ser'] and outro is not leitor}
+    candidatos = [info.device for info in list_ports.comports()
+                  if info.vid == vid and info.pid == pid and (serie is None or info.serial_number == serie)
+                  and info.device not in em_uso]
+    if leitor['dispositivo'] in candidatos:
+        return leitor['dispositivo']
+    return candidatos[0] if candidatos else None
+
+def abrir_leitor(leitor):
+    """Abre a porta serial de um leitor (aceita também URLs do pyserial, como loop:// e socket://).
+
+    Se falhar, agenda a próxima tentativa com backoff exponencial.
+    """
+    dispositivo = localizar_porta(leitor)
     try:
-        ser = serial.Serial(PORTA_SERIAL, BAUD_RATE, timeout=0.1)
-        print(f"Conectado à porta serial {PORTA_SERIAL}")
-        return True
-    except serial.SerialException as e:
-        print(f"Erro ao conectar na porta serial {PORTA_SERIAL}: {e}")
+        if dispositivo is None:
+            raise serial.SerialException(f"adaptador USB {leitor['porta']} não encontrado")
+        leitor['ser'] = serial.serial_for_url(dispositivo, BAUD_RATE, timeout=SERIAL_TIMEOUT)
+    except (serial.SerialException, ValueError) as e:
+        if leitor['estado'] != 'reconectando':
+            print(f"Erro ao conectar na porta serial {dispositivo or leitor['porta']}: {e}")
+            mudar_estado(leitor, 'reconectando')
+        leitor['proxima_tentativa'] = time.monotonic() + leitor['espera']
+        leitor['espera'] = min(leitor['espera'] * 2, RFID_RECONEXAO_MAX)
         return False
-
-def read_serial():
-    """Lê dados da porta serial de forma não-bloqueante"""
-    global ultimo_rfid_lido, ultimo_tempo_leitura, bloquear_leitura
     
+    if dispositivo != leitor['dispositivo'] and leitor['dispositivo']:
+        print(f"Leitor {leitor['id']} mudou de {leitor['dispositivo']} para {dispositivo}")
+    leitor['dispositivo'] = dispositivo
+    if not leitor['usb']:
+        leitor['usb'] = identificar_usb(dispositivo)
+    leitor['buffer'].clear()
+    leitor['espera'] = RFID_RECONEXAO_MIN
+    print(f"Leitor {leitor['id']} conectado à porta serial {dispositivo}")
+    mudar_estado(leitor, 'conectado')
+    return True
+
+def mudar_estado(leitor, estado):
+    """Registra a mudança de estado do leitor e avisa a tela"""
+    anterior, leitor['estado'] = leitor['estado'], estado
+    if estado == 'conectado' and anterior == 'reconectando':
+        fila_estados.put(f"Leitor RFID {leitor['id']} reconectado")
+    elif estado == 'reconectando':
+        fila_estados.put(None)
+
+def texto_estado_leitores():
+    """Texto do status da tela inicial conforme a conexão dos leitores"""
+    fora = [leitor['id'] for leitor in leitores if leitor['estado'] == 'reconectando']
+    if not leitores:
+        return "Nenhum leitor RFID configurado"
+    if not fora:
+        return "RFID leitor iniciado" if len(leitores) == 1 else f"{len(leitores)} leitores RFID conectados"
+    if len(leitores) == 1:
+        return "Leitor RFID desconectado - tentando reconectar..."
+    return f"Leitor RFID {', '.join(fora)} desconectado - tentando reconectar..."
+
+def fechar_leitor(leitor):
+    if leitor['ser']:
+        try:
+            leitor['ser'].close()
+        except Exception:
+            pass
+        leitor['ser'] = None
+
+def rfid_valido(data):
+    """Filtra dados inválidos ou vazios: o leitor manda o ID em hexadecimal maiúsculo"""
+    return len(data) >= 8 and all(c in '0123456789ABCDEF' for c in data)
+
+def extrair_linhas(buffer, dados):
+    """Junta os bytes recebidos ao buffer e devolve as linhas completas.
+
+    O que sobra depois do último fim de linha fica no buffer para a próxima
+    leitura, limitado a RFID_BUFFER_SIZE bytes.
+    """
+    buffer += dados
+    *linhas, resto = bytes(buffer).replace(b'\r', b'\n').split(b'\n')
+    buffer[:] = resto[-RFID_BUFFER_SIZE:]
+    return [linha.decode('ascii', errors='ignore').strip() for linha in linhas]
+
+def read_serial(leitor):
+    """Lê os bytes disponíveis no leitor e devolve os cartões válidos das linhas completas"""
+    ser = leitor['ser']
     if not ser or not ser.is_open:
-        return None
+        return []
     
     try:
-        # Lê uma linha com timeout curto para evitar bloqueio
-        data = ser.readline().decode('utf-8', errors='ignore').strip()
+        # Com o leitor pronto, in_waiting já tem os bytes; senão bloqueia até o
+        # primeiro byte (ou SERIAL_TIMEOUT) e pega o que mais já chegou
+        dados = ser.read(ser.in_waiting or 1)
+        if not dados:
+            return []
+        if ser.in_waiting:
+            dados += ser.read(ser.in_waiting)
         
-        # Filtra dados inválidos ou vazios
-        if not data or len(data) < 8 or not all(c in '0123456789ABCDEF' for c in data):
-            return None
-            
-        return data
+        return [data for data in extrair_linhas(leitor['buffer'], dados) if rfid_valido(data)]
         
     except serial.SerialException as e:
-        print(f"Erro na leitura serial: {e}")
-        return None
-    except UnicodeDecodeError:
-        return None
+        print(f"Erro na leitura serial do leitor {leitor['id']}: {e}")
+        raise
 
-def process_rfid(rfid_data):
-    """Processa o dado RFID lido"""
-    global ultimo_rfid_lido, ultimo_tempo_leitura, bloquear_leitura
-    
+def leitura_repetida(leitor_id, rfid_data, agora):
+    """Cache por leitor: o mesmo cartão no mesmo leitor dentro de RFID_DEDUP_TTL é repetição"""
+    recentes = leituras_recentes.setdefault(leitor_id, {})
+    if agora - recentes.get(rfid_data, float('-inf')) < RFID_DEDUP_TTL:
+        return True
+    # Descarta as entradas vencidas antes de guardar a nova
+    for cartao in [cartao for cartao, instante in recentes.items() if agora - instante >= RFID_DEDUP_TTL]:
+        del recentes[cartao]
+    recentes[rfid_data] = agora
+    return False
+
+def process_rfid(rfid_data, leitor_id=PORTA_SERIAL):
+    """Processa o dado RFID lido (no loop do Tk)"""
     # Verifica se está bloqueado ou se é leitura duplicada
-    current_time = time.time()
-    if (bloquear_leitura or 
-        (ultimo_rfid_lido == rfid_data and current_time - ultimo_tempo_leitura < 2)):
+    if bloquear_leitura or leitura_repetida(leitor_id, rfid_data, time.time()):
         return
     
-    ultimo_rfid_lido = rfid_data
-    ultimo_tempo_leitura = current_time
+    print(f"Cartão lido no leitor {leitor_id}: {rfid_data}")
     
-    print(f"Cartão lido: {rfid_data}")
-    
-    # Atualiza a interface na thread principal
-    root.after(0, lambda: update_status(f"Cartão lido: {rfid_data}"))
+    update_status(f"Cartão lido ({leitor_id}): {rfid_data}")
     
     # Verifica se é um operador
     if rfid_data in operadores:
-        nome = operadores[rfid_data]
-        root.after(0, lambda: mostrar_selecao_modelo(nome, "operador"))
+        mostrar_selecao_modelo(operadores[rfid_data], "operador")
         return
     
     # Verifica se é um administrador
     if rfid_data in administradores:
-        nome = administradores[rfid_data]
-        root.after(0, lambda: mostrar_selecao_modelo(nome, "admin"))
+        mostrar_selecao_modelo(administradores[rfid_data], "admin")
         return
     
     # Cartão não reconhecido
-    root.after(0, lambda: update_status(f"Cartão não reconhecido: {rfid_data}"))
+    update_status(f"Cartão não reconhecido ({leitor_id}): {rfid_data}")
+
+def processar_fila_rfid():
+    """Entrega à interface os cartões que a thread serial colocou na fila.
+
+    Roda no loop do Tk a cada RFID_POLL_MS: a thread serial nunca mexe nos
+    widgets, só na fila. O reagendamento fica no finally para um erro ao
+    tratar um cartão não parar a entrega dos próximos.
+    """
+    try:
+        while True:
+            update_status(fila_estados.get_nowait() or texto_estado_leitores())
+    except queue.Empty:
+        pass
+    
+    try:
+        while True:
+            leitor_id, rfid_data, lido_em = fila_rfid.get_nowait()
+            process_rfid(rfid_data, leitor_id)
+            # Desenha agora para medir até o cartão aparecer na tela
+            root.update_idletasks()
+            registrar_latencia(lido_em)
+    except queue.Empty:
+        pass
+    finally:
+        if running:
+            root.after(RFID_POLL_MS, processar_fila_rfid)
+
+def registrar_latencia(lido_em):
+    """Guarda o tempo entre a leitura na serial e a tela atualizada"""
+    latencia = (time.perf_counter() - lido_em) * 1000
+    latencias_rfid.append(latencia)
+    print(f"Cartão na tela em {latencia:.1f} ms "
+          f"(mediana das últimas {len(latencias_rfid)}: {statistics.median(latencias_rfid):.1f} ms)")
 
 def update_status(message):
-    """Atualiza o status na interface"""
-    if status_label:
+    """Atualiza o status na interface (se a tela inicial ainda existe)"""
+    if status_label and status_label.winfo_exists():
         status_label.config(text=message)
 
+def registrar_leitor(seletor, sondados, leitor):
+    """Põe o leitor no seletor; portas sem fileno() (Windows) ficam na lista de sondagem"""
+    try:
+        seletor.register(leitor['ser'].fileno(), selectors.EVENT_READ, leitor)
+    except (AttributeError, OSError, ValueError):
+        sondados.append(leitor)
+
+def remover_leitor(seletor, sondados, leitor):
+    if leitor in sondados:
+        sondados.remove(leitor)
+    else:
+        for chave in list(seletor.get_map().values()):
+            if chave.data is leitor:
+                seletor.unregister(chave.fileobj)
+    fechar_leitor(leitor)
+
+def tem_bytes(leitor):
+    try:
+        return leitor['ser'].in_waiting > 0
+    except Exception:
+        return True  # porta com erro: a leitura mostra o erro e derruba o leitor
+
+def aguardar_leitores(seletor, sondados, limite):
+    """Espera até algum leitor ter bytes e devolve os que estão prontos.
+
+    `limite` é o tempo até a próxima reconexão agendada (None se não há).
+    """
+    if not seletor.get_map():
+        if len(sondados) == 1 and limite is None:
+            # Um leitor só: o próprio read(1) bloqueia até chegar algo
+            return sondados
+        time.sleep(min(RFID_POLL_INTERVAL if sondados else 1, 1 if limite is None else limite))
+        return [leitor for leitor in sondados if tem_bytes(leitor)]
+    
+    espera = RFID_POLL_INTERVAL if sondados else SERIAL_TIMEOUT
+    eventos = seletor.select(espera if limite is None else min(espera, limite))
+    return [chave.data for chave, _ in eventos] + [leitor for leitor in sondados if tem_bytes(leitor)]
+
+def reconectar_leitores(seletor, sondados):
+    """Tenta reabrir os leitores desconectados cuja vez chegou; devolve o tempo até a próxima tentativa"""
+    agora = time.monotonic()
+    proxima = None
+    for leitor in leitores:
+        if leitor['ser']:
+            continue
+        if leitor['proxima_tentativa'] <= agora and abrir_leitor(leitor):
+            registrar_leitor(seletor, sondados, leitor)
+            continue
+        falta = max(leitor['proxima_tentativa'] - agora, 0)
+        proxima = falta if proxima is None else min(proxima, falta)
+    return proxima
+
 def serial_thread_function():
-    """Thread para leitura contínua da serial"""
+    """Thread única que atende todos os leitores pelo seletor"""
     global running
     
     print("Thread serial iniciada")
     
+    seletor = selectors.DefaultSelector()
+    sondados = []
+    for leitor in leitores:
+        if leitor['ser']:
+            registrar_leitor(seletor, sondados, leitor)
+    
     while running:
         try:
-            if not ser or not ser.is_open:
-                time.sleep(1)
-                continue
-                
-            # Lê dados da serial
-            rfid_data = read_serial()
-            
-            if rfid_data:
-                process_rfid(rfid_data)
-                
-            # Pequena pausa para não sobrecarregar a CPU
-            time.sleep(0.05)
-            
+            limite = reconectar_leitores(seletor, sondados)
+            prontos = aguardar_leitores(seletor, sondados, limite)
         except Exception as e:
             print(f"Erro na thread serial: {e}")
             time.sleep(1)
+            continue
+        
+        # Cada cartão vai para a fila com o leitor e o instante da leitura
+        for leitor in prontos:
+            try:
+                for rfid_data in read_serial(leitor):
+                    fila_rfid.put((leitor['id'], rfid_data, time.perf_counter()))
+            except Exception as e:
+                print(f"Leitor {leitor['id']} desconectado: {e}")
+                remover_leitor(seletor, sondados, leitor)
+                # Reconecta já na próxima volta; se falhar, entra no backoff
+                leitor['proxima_tentativa'] = time.monotonic()
+                mudar_estado(leitor, 'reconectando')
+    
+    seletor.close()
 
 # ---------------- INICIALIZAÇÃO E FINALIZAÇÃO ----------------
 
 def cleanup():
     """Limpeza ao finalizar o programa"""
-    global running, ser
+    global running
     
     print("Finalizando programa...")
     running = False
     
-    # Fechar porta serial
-    if ser and ser.is_open:
-        ser.close()
-        print("Porta serial fechada")
+    # Fechar portas seriais
+    for leitor in leitores:
+        if leitor['ser']:
+            fechar_leitor(leitor)
+            print(f"Porta serial {leitor['porta']} fechada")
     
     # Salvar estoque
     salvar_estoque()
@@ -895,18 +1204,20 @@ def cleanup():
 
 def main():
     """Função principal"""
-    global ser, serial_thread, running
+    global serial_thread, running
     
     # Carregar estoque
     carregar_estoque()
     
-    # Inicializar serial
+    # Inicializar serial; sem leitor o quiosque abre assim mesmo e a thread
+    # serial fica tentando reconectar
     if not init_serial():
-        messagebox.showerror("Erro", f"Não foi possível conectar na porta serial {PORTA_SERIAL}")
-        return
+        portas = ", ".join(LEITORES_RFID.values())
+        print(f"Nenhum leitor conectado ({portas}); tentando reconectar em segundo plano")
     
     # Configurar interface
     setup_main_screen()
+    processar_fila_rfid()
     
     # Iniciar thread serial
     serial_thread = threading.Thread(target=serial_thread_function, daemon=True)
@@ -0,0 +1,135 @@
+# Simulador de leitores RFID para o quiosque (main.py)
+#
+# Cada PortaSimulada é um pseudo-terminal (Linux/macOS) cujo caminho vai no
+# LEITORES_RFID, ou um loop:// do pyserial ligado direto ao leitor (qualquer
+# sistema). Os toques são gerados com uma taxa fixa e misturam linhas
+# normais, linhas entregues em pedaços, rajadas do mesmo cartão e lixo, ou
+# são lidos de um arquivo gravado antes.
+#
+# Arquivo de toques: uma linha por escrita, "instante;tipo;rfid;dados", com
+# o instante em segundos desde o início, o rfid esperado (vazio para lixo) e
+# os dados com escapes do Python (ex.: AB12CD34\r\n).
+
+import codecs
+import os
+import random
+import threading
+import time
+
+import serial
+
+TERMINADORES = [b'\r\n', b'\r\n', b'\r\n', b'\n', b'\r']  # os leitores mandam \r\n quase sempre
+MALFORMADOS = [
+    b'ab12cd34',          # minúsculas
+    b'12AB',              # curto demais
+    b'ERR',
+    b'',                  # linha vazia
+    b'\xff\xfe\x00\x81',  # ruído da serial
+    b'AB12CD3G',          # caractere fora do hexadecimal
+    b'Z' * 300,           # linha maior que o RFID_BUFFER_SIZE
+]
+
+class PortaSimulada:
+    """Lado do "leitor" de uma porta serial falsa"""
+
+    def __init__(self, modo='pty'):
+        self.modo = modo
+        if modo == 'pty':
+            import tty
+            self.mestre, self.escravo = os.openpty()
+            tty.setraw(self.escravo)
+            self.caminho = os.ttyname(self.escravo)
+        else:
+            self.loop = serial.serial_for_url('loop://', timeout=0.5)
+            self.caminho = 'loop://'
+
+    def ligar(self, leitor):
+        """No modo loop:// o quiosque lê do mesmo objeto em que o simulador escreve"""
+        if self.modo != 'pty':
+            leitor['ser'] = self.loop
+
+    def escrever(self, dados):
+        if self.modo == 'pty':
+            os.write(self.mestre, dados)
+        else:
+            self.loop.write(dados)
+
+    def fechar(self):
+        if self.modo == 'pty':
+            os.close(self.mestre)
+            os.close(self.escravo)
+        else:
+            self.loop.close()
+
+def gerar_toques(quantidade, taxa, prefixo=0, malformados=0.05, parciais=0.1, duplicados=0.05, semente=1):
+    """Escritas (instante, tipo, rfid, dados) de `quantidade` toques a `taxa` toques/s.
+
+    Cada toque válido usa um cartão novo, então o quiosque deve aceitar cada
+    rfid esperado exatamente uma vez; o prefixo separa os cartões de leitores
+    diferentes. Um leitor só começa uma linha depois de terminar a anterior,
+    então pedaços e rajadas atrasam os toques seguintes.
+    """
+    sorteio = random.Random(semente)
+    escritas = []
+    livre_em = 0
+    for seq in range(quantidade):
+        instante = max(seq / taxa, livre_em)
+        rfid = f'{prefixo:02X}{seq:06X}'
+        linha = rfid.encode() + sorteio.choice(TERMINADORES)
+        tipo = sorteio.random()
+        if tipo < malformados:
+            escritas.append((instante, 'malformado', None, sorteio.choice(MALFORMADOS) + b'\r\n'))
+        elif tipo < malformados + parciais:
+            # A linha chega em dois ou três pedaços, alguns ms entre eles
+            cortes = sorted(sorteio.sample(range(1, len(linha)), sorteio.randint(1, 2)))
+            pedacos = [linha[i:j] for i, j in zip([0] + cortes, cortes + [len(linha)])]
+            for i, pedaco in enumerate(pedacos):
+                escritas.append((instante + i * 0.003, 'parcial', rfid, pedaco))
+        elif tipo < malformados + parciais + duplicados:
+            # Cartão parado em cima do leitor: a mesma linha várias vezes seguidas
+            for i in range(sorteio.randint(3, 8)):
+                escritas.append((instante + i * 0.02, 'duplicado', rfid, linha))
+        else:
+            escritas.append((instante, 'normal', rfid, linha))
+        livre_em = escritas[-1][0]
+    return escritas
+
+def salvar_toques(caminho, escritas):
+    with open(caminho, 'w', encoding='ascii') as arquivo:
+        for instante, tipo, rfid, dados in escritas:
+            texto = codecs.escape_encode(dados)[0].decode('ascii').replace(';', '\\x3b')
+            arquivo.write(f'{instante:.6f};{tipo};{rfid or ""};{texto}\n')
+
+def carregar_toques(caminho):
+    escritas = []
+    with open(caminho, encoding='ascii') as arquivo:
+        for linha in arquivo:
+            if not linha.strip() or linha.startswith('#'):
+                continue
+            instante, tipo, rfid, texto = linha.rstrip('\n').split(';', 3)
+            escritas.append((float(instante), tipo, rfid or None, codecs.escape_decode(texto)[0]))
+    return escritas
+
+def reproduzir(porta, escritas, enviados, inicio=None):
+    """Escreve os toques no horário de cada um.
+
+    Em `enviados` fica, para cada rfid, o instante (perf_counter) da escrita
+    que completou a primeira linha dele: é o "toque" da latência.
+    """
+    inicio = time.perf_counter() if inicio is None else inicio
+    for instante, tipo, rfid, dados in escritas:
+        espera = inicio + instante - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        if rfid and rfid not in enviados and (b'\n' in dados or b'\r' in dados):
+            enviados[rfid] = time.perf_counter()
+        porta.escrever(dados)
+
+def iniciar_reproducao(portas, roteiros, enviados):
+    """Uma thread por porta, todas com o mesmo instante zero"""
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=reproduzir, args=(porta, escritas, enviados, inicio), daemon=True)
+               for porta, escritas in zip(portas, roteiros)]
+    for thread in threads:
+        thread.start()
+    return threads